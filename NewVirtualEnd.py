@@ -3,8 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
+from contextlib import asynccontextmanager
 import asyncio
 import json
+import time
+import uuid
 
 from llmos_core.Program import BaseProgram
 from llmos_core.Program.context_program import ContextProgram
@@ -13,59 +16,371 @@ from llmos_core.Program.chatProgram import ChatProgram
 from llmos_core.ui import WindowConfig
 from llmos_core.ui.uitranform import update_backend_state_from_program
 from llmos_core.config_manager import ConfigManager
+from llmos_core.llmos_util.response_cache import get_response_cache
 from llmos_core.schema import ToolCallResult
 from pathlib import Path
 
-app = FastAPI()
+# 程序映射
+PROGRAM_CLASSES = {
+    "ALFworld": ALFworldProgram,
+    "Context": ContextProgram,
+    "Chat": ChatProgram
+}
 
-# 允许跨域
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# 会话配置
+DEFAULT_SESSION_ID = "default"      # 未指定 session_id 的请求使用默认会话（兼容单用户前端）
+DEFAULT_PROGRAM_NAME = "ALFworld"   # 默认启动 ALFworld
+SESSION_TTL_SECONDS = 30 * 60       # 无订阅者且空闲超过该时间的会话会被回收
+SESSION_SWEEP_INTERVAL = 60         # 过期检查周期（秒）
+MAX_SESSIONS = 64
+
+# 启动配置
+WARMUP_RETRY_AFTER = 2              # 预热未完成时 503 响应的 Retry-After（秒）
+# 预热期间也可以访问的接口（其余 /api 接口返回 503）。
+# 会话与程序管理接口始终可用，预热失败（例如未安装 alfworld）时可以切换到其他程序恢复
+WARMUP_EXEMPT_PATHS = {"/api/health/live", "/api/health/ready", "/api/models", "/",
+                       "/api/sessions", "/api/program/set"}
+WARMUP_EXEMPT_PREFIXES = ("/api/session/",)
+
+# SSE 配置
+SUBSCRIBER_QUEUE_SIZE = 8           # 每个订阅者最多积压的帧数，超出后只保留最新一帧
+SSE_HEARTBEAT_INTERVAL = 15         # 无数据时发送心跳的间隔（秒），同时用于检测断开的连接
+SSE_HEARTBEAT_FRAME = b": heartbeat\n\n"
+
+
+def _encode_sse(data: Dict[str, Any]) -> bytes:
+    """SSE 消息帧：id 为状态版本号，data 为 JSON（每次广播只编码一次）"""
+    return f"id: {data['version']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class SSEFrame:
+    """一次广播的增量帧，payload 为编码好的字节，被所有订阅者共享"""
+    __slots__ = ("version", "base_version", "payload")
+
+    def __init__(self, delta: Dict[str, Any]):
+        self.version = delta["version"]
+        self.base_version = delta["base_version"]
+        self.payload = _encode_sse(delta)
+
+
+class SSESubscriber:
+    """一个 SSE 连接：有界队列 + 已送达的版本号"""
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.version = 0
+        self.dropped = 0
+
+    def offer(self, frame: SSEFrame):
+        """非阻塞投递；客户端跟不上时丢弃积压的帧，只保留最新一帧（之后会因版本不连续触发全量同步）"""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    def next_payload(self, frame: SSEFrame, state: "BackendState") -> Optional[bytes]:
+        """
+        把广播帧转换为要发给该连接的字节：
+        已包含在之前发送的状态中的帧返回 None；版本不连续（例如积压帧被丢弃）时改为当前的全量帧
+        """
+        if frame.version <= self.version:
+            return None
+        if frame.base_version != self.version:
+            self.version = state.version
+            return state.get_full_frame()
+        self.version = frame.version
+        return frame.payload
 
-# 全局程序实例
-# 默认启动 ALFworld
-program: BaseProgram | None = ALFworldProgram()
-update_backend_state_from_program(program)
 
 class BackendState:
-    """后端状态管理器"""
-    def __init__(self):
+    """后端状态管理器（每个会话一份：独立的程序实例、窗口状态与 SSE 订阅者）"""
+    def __init__(self, session_id: str, program: BaseProgram | None = None, program_name: str = DEFAULT_PROGRAM_NAME):
+        self.session_id = session_id
+        self.program: BaseProgram | None = program
+        self.program_name = program_name
         self.window_configs: List[WindowConfig] = []
-        self.subscribers: List[asyncio.Queue] = []
-        self.cache: Dict[str, Any] = {}
+        self.subscribers: List[SSESubscriber] = []
+        # 版本化的窗口状态：每次有窗口变化版本号 +1，SSE 只推送变化的窗口
+        self.version = 0
+        self._windows: Dict[str, Dict[str, Any]] = {}  # windowId -> 已推送的窗口配置
+        self._order: List[str] = []
+        self._full_frame: Optional[tuple] = None  # (version, 编码好的全量帧)
         self.use_cache: bool = True
+        # 模型回复缓存：相同状态下的请求直接复用回复（见 llmos_util.response_cache）。
+        # 默认关闭，否则交互会话在相同状态下会悄悄重放旧的采样结果；通过 /api/llm/config 开启
+        self.response_cache: bool = False
+        self.stream: bool = False  # 流式调用模型，Syscall 边生成边执行
+        # 同一会话内的模型回合 / 程序切换串行执行
+        self.lock = asyncio.Lock()
+        self.created_at = time.time()
+        self.last_active = self.created_at
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def discard(self):
+        """会话被移除：删除程序按会话持久化的状态（如 LLMOS_HEAP_DB 中的堆），并释放资源（ALFWorld 环境归还环境池）"""
+        if self.program:
+            self.program.discard_session()
+
+    def is_expired(self, now: float, ttl: float) -> bool:
+        return not self.subscribers and now - self.last_active > ttl
 
     def get_full_state(self) -> Dict[str, Any]:
+        """当前版本的完整状态（用于新连接或版本不一致时的全量同步）"""
+        return {
+            "type": "full",
+            "version": self.version,
+            "windows": [self._windows[window_id] for window_id in self._order],
+        }
+
+    def get_full_frame(self) -> bytes:
+        """当前版本的全量帧，每个版本只编码一次"""
+        if self._full_frame is None or self._full_frame[0] != self.version:
+            self._full_frame = (self.version, _encode_sse(self.get_full_state()))
+        return self._full_frame[1]
+
+    def commit_state(self) -> Optional[Dict[str, Any]]:
+        """
+        重新采集窗口配置并与上一版本比较。
+        有变化时版本号 +1，返回按窗口整体替换的增量：
+            {"type": "delta", "version", "base_version", "changed": [...], "removed": [...], "order": [...]}
+        没有任何变化时返回 None。
+        """
         self.update_windowConfig()
-        return {"windows": [config.model_dump() for config in self.window_configs]}
+        windows = {config.windowId: config.model_dump() for config in self.window_configs}
+        order = [config.windowId for config in self.window_configs]
+
+        changed = [window for window_id, window in windows.items() if self._windows.get(window_id) != window]
+        removed = [window_id for window_id in self._windows if window_id not in windows]
+        if not changed and not removed and order == self._order:
+            return None
+
+        self.version += 1
+        self._windows = windows
+        self._order = order
+        return {
+            "type": "delta",
+            "version": self.version,
+            "base_version": self.version - 1,
+            "changed": changed,
+            "removed": removed,
+            "order": order,
+        }
+
+    def publish(self):
+        """采集最新状态并把增量投递给所有订阅者（需在事件循环线程中调用）"""
+        delta = self.commit_state()
+        if delta is None:
+            return
+        # 只序列化一次，所有订阅者共享同一份字节
+        frame = SSEFrame(delta)
+        for subscriber in self.subscribers:
+            subscriber.offer(frame)
 
     async def broadcast_update(self):
-        full_state = self.get_full_state()
-        for queue in self.subscribers:
-            await queue.put(full_state)
+        self.publish()
 
     def update_windowConfig(self):
-        self.window_configs = update_backend_state_from_program(program)
+        self.window_configs = update_backend_state_from_program(self.program)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "program": self.program_name,
+            "subscribers": len(self.subscribers),
+            "created_at": self.created_at,
+            "last_active": self.last_active,
+        }
+
+
+class SessionRegistry:
+    """会话注册表：负责会话的创建、查找与过期回收"""
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, BackendState] = {}
+
+    def get(self, session_id: str) -> Optional[BackendState]:
+        state = self.sessions.get(session_id)
+        if state:
+            state.touch()
+        return state
+
+    def add(self, state: BackendState) -> BackendState:
+        self.sessions[state.session_id] = state
+        return state
+
+    async def create(self, program_name: str, session_id: Optional[str] = None) -> BackendState:
+        """创建新会话，程序在线程中构造，避免阻塞事件循环"""
+        if len(self.sessions) >= self.max_sessions:
+            await self.expire()
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError(f"Too many sessions (max {self.max_sessions})")
+        prog_class = PROGRAM_CLASSES[program_name]
+        session_id = session_id or uuid.uuid4().hex
+        program = await asyncio.to_thread(prog_class)
+        await asyncio.to_thread(program.bind_session, session_id)
+        state = BackendState(session_id, program, program_name)
+        state.commit_state()
+        return self.add(state)
+
+    async def remove(self, session_id: str) -> Optional[BackendState]:
+        """移出注册表后等待会话上进行中的回合结束，再在线程中释放资源（含 sqlite 删除等阻塞操作）"""
+        state = self.sessions.pop(session_id, None)
+        if state:
+            async with state.lock:
+                await asyncio.to_thread(state.discard)
+        return state
+
+    async def expire(self, now: Optional[float] = None) -> List[str]:
+        """回收空闲会话（默认会话永不过期）"""
+        now = now or time.time()
+        expired = [
+            sid for sid, state in self.sessions.items()
+            if sid != DEFAULT_SESSION_ID and state.is_expired(now, self.ttl)
+        ]
+        for sid in expired:
+            await self.remove(sid)
+            print(f"[session] expired {sid}")
+        return expired
+
+
+class ServerReadiness:
+    """服务预热状态：默认程序（含 ALFWorld 环境）在后台构建完成前，依赖程序的接口返回 503"""
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
 
-# 全局状态实例
-backend_state = BackendState()
+    def mark_ready(self):
+        self.ready = True
+        self.error = None
+        self.ready_at = time.time()
 
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "uptime": time.time() - self.started_at,
+            "warmup_seconds": self.ready_at - self.started_at if self.ready_at else None,
+        }
+
+
+session_registry = SessionRegistry()
+readiness = ServerReadiness()
+
+
+def _start_env_pool():
+    # 导入环境池会导入 alfworld，同样放在后台完成
+    from llmos_core.Prompts.Windows.ALFworldWindow.env_pool import get_env_pool
+    get_env_pool().start()
+
+
+async def _warm_up():
+    """后台构建默认会话，完成后服务才标记为就绪"""
+    try:
+        await session_registry.create(DEFAULT_PROGRAM_NAME, session_id=DEFAULT_SESSION_ID)
+        # 默认程序构建完毕后再预热环境池，避免与默认程序争抢 CPU
+        await asyncio.to_thread(_start_env_pool)
+        readiness.mark_ready()
+        print(f"[startup] ready in {readiness.ready_at - readiness.started_at:.1f}s")
+    except Exception as e:
+        readiness.error = f"{type(e).__name__}: {e}"
+        print(f"[startup] warm-up failed: {readiness.error}")
+
+
+async def _sweep_sessions():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        await session_registry.expire()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 立即开始接受请求；默认程序与 ALFWorld 环境池在后台预热
+    warmup = asyncio.create_task(_warm_up())
+    sweeper = asyncio.create_task(_sweep_sessions())
+    yield
+    warmup.cancel()
+    sweeper.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def _requires_ready(request: Request) -> bool:
+    path = request.url.path
+    if request.method == "OPTIONS" or path in WARMUP_EXEMPT_PATHS or path.startswith(WARMUP_EXEMPT_PREFIXES):
+        return False
+    if readiness.error:
+        # 预热失败只影响默认会话，显式创建的其他会话照常使用
+        return request.query_params.get("session_id", DEFAULT_SESSION_ID) == DEFAULT_SESSION_ID
+    return True
+
+
+@app.middleware("http")
+async def require_ready(request: Request, call_next):
+    """
+    预热完成前，依赖程序的接口返回 503 并提示稍后重试。
+    预热失败是终止状态：返回 503 但不带 Retry-After，需通过 /api/program/set 换一个程序重建默认会话
+    """
+    if not readiness.ready and _requires_ready(request):
+        if readiness.error:
+            return JSONResponse(
+                content={"message": "Warm-up failed, choose another program with /api/program/set",
+                         "status": "failed", **readiness.describe()},
+                status_code=503,
+            )
+        return JSONResponse(
+            content={"message": "Server is warming up", "status": "warming_up", **readiness.describe()},
+            status_code=503,
+            headers={"Retry-After": str(WARMUP_RETRY_AFTER)},
+        )
+    return await call_next(request)
+
+
+# 允许跨域（在 require_ready 之后注册，位于最外层，503 响应同样带有 CORS 头）
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@app.get("/api/health/live")
+async def health_live():
+    """存活探针：进程能响应即可"""
+    return {"status": "ok"}
+
+
+@app.get("/api/health/ready")
+async def health_ready():
+    """就绪探针：默认程序构建完成后返回 200"""
+    if readiness.ready:
+        return {"status": "ready", **readiness.describe()}
+    if readiness.error:
+        return JSONResponse(content={"status": "failed", **readiness.describe()}, status_code=503)
+    return JSONResponse(
+        content={"status": "warming_up", **readiness.describe()},
+        status_code=503,
+        headers={"Retry-After": str(WARMUP_RETRY_AFTER)},
+    )
+
+
+def _session_not_found(session_id: str) -> JSONResponse:
+    return JSONResponse(content={"message": f"Session '{session_id}' not found"}, status_code=404)
 
-# 程序映射
-PROGRAM_CLASSES = {
-    "ALFworld": ALFworldProgram,
-    "Context": ContextProgram,
-    "Chat": ChatProgram
-}
 
 class ProgramSetRequest(BaseModel):
     program_name: str
 
+class SessionCreateRequest(BaseModel):
+    program_name: str = DEFAULT_PROGRAM_NAME
+
 class UpdateModel(BaseModel):
     modelName: str
 
@@ -107,54 +422,107 @@ async def get_models():
         return JSONResponse(content={"message": f"Error loading models: {str(e)}"}, status_code=500)
 
 
+@app.post("/api/session/create")
+async def create_session(request: SessionCreateRequest):
+    """创建一个新会话，返回 session_id"""
+    if request.program_name not in PROGRAM_CLASSES:
+        return JSONResponse(content={"message": "Invalid program name"}, status_code=400)
+    try:
+        state = await session_registry.create(request.program_name)
+    except RuntimeError as e:
+        return JSONResponse(content={"message": str(e)}, status_code=503)
+    return {"session_id": state.session_id, "program": state.program_name}
+
+@app.delete("/api/session/{session_id}")
+async def delete_session(session_id: str):
+    if session_id == DEFAULT_SESSION_ID:
+        return JSONResponse(content={"message": "Default session cannot be deleted"}, status_code=400)
+    if not await session_registry.remove(session_id):
+        return _session_not_found(session_id)
+    return {"message": f"Session {session_id} deleted"}
+
+@app.get("/api/sessions")
+async def list_sessions():
+    return {"sessions": [state.describe() for state in session_registry.sessions.values()]}
+
+
 @app.post("/api/model/update")
-async def update_model(update_data: UpdateModel):
+async def update_model(update_data: UpdateModel, session_id: str = DEFAULT_SESSION_ID):
     """切换当前程序的大模型"""
-    global program
-    if not program:
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
+    if not state.program:
         return JSONResponse(content={"message": "No active program"}, status_code=400)
     
     # 直接调用 BaseProgram 定义的 set_model 方法，不使用 hasattr
-    program.set_model(update_data.modelName)
+    state.program.set_model(update_data.modelName)
     return {"message": f"Model updated to {update_data.modelName} successfully"}
 
 
 @app.post("/api/program/set")
-async def set_program(request: ProgramSetRequest):
-    global program
+async def set_program(request: ProgramSetRequest, session_id: str = DEFAULT_SESSION_ID):
     prog_class = PROGRAM_CLASSES.get(request.program_name)
     if not prog_class:
         return JSONResponse(content={"message": "Invalid program name"}, status_code=400)
+    state = session_registry.get(session_id)
+    if not state and session_id == DEFAULT_SESSION_ID and readiness.error:
+        # 预热失败时默认会话不存在：用所选程序重建，成功后服务恢复就绪
+        try:
+            await session_registry.create(request.program_name, session_id=DEFAULT_SESSION_ID)
+        except Exception as e:
+            return JSONResponse(content={"message": f"Failed to build {request.program_name}: "
+                                                    f"{type(e).__name__}: {e}"}, status_code=500)
+        readiness.mark_ready()
+        return {"message": f"Program set to {request.program_name}"}
+    if not state:
+        return _session_not_found(session_id)
     
-    program = prog_class()
-    update_backend_state_from_program(program)
-    await backend_state.broadcast_update()
+    async with state.lock:
+        # 程序构造（如 ALFWorld 环境初始化）耗时较长，放到线程中执行，避免阻塞事件循环
+        old_program = state.program
+        program = await asyncio.to_thread(prog_class)
+        # 切换程序等同于重新开始：新程序不继承旧程序按会话持久化的状态（如堆），
+        # 必须在新程序 bind_session 加载同一 namespace 之前删除
+        if old_program:
+            await asyncio.to_thread(old_program.discard_session)
+        await asyncio.to_thread(program.bind_session, session_id)
+        state.program = program
+        state.program_name = request.program_name
+    if session_id == DEFAULT_SESSION_ID and readiness.error:
+        # 默认会话已建好但预热后续步骤（如环境池）失败：切换程序成功后同样恢复就绪
+        readiness.mark_ready()
+    await state.broadcast_update()
     return {"message": f"Program set to {request.program_name}"}
 
 @app.post("/api/program/reset")
-async def reset_program():
-    global program
-    if program:
-        program.reset()
-        update_backend_state_from_program(program)
-        await backend_state.broadcast_update()
+async def reset_program(session_id: str = DEFAULT_SESSION_ID):
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
+    if state.program:
+        async with state.lock:
+            await asyncio.to_thread(state.program.reset)
+        await state.broadcast_update()
         return {"message": "Program reset successfully"}
     return JSONResponse(content={"message": "No active program"}, status_code=400)
 
 @app.post("/api/windows/event_call")
-async def handle_event_call(request: EventCallRequest):
+async def handle_event_call(request: EventCallRequest, session_id: str = DEFAULT_SESSION_ID):
     """处理前端窗口触发的事件（如 ChatWindow 发送消息）"""
-    global program
-    if not program:
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
+    if not state.program:
         return JSONResponse(content={"message": "No active program"}, status_code=400)
     
     try:
-        # 调用程序的 env_event
-        program.env_event(request.args, **request.kwargs)
+        # 调用程序的 env_event；与模型回合互斥，避免事件在回合中途修改窗口
+        async with state.lock:
+            state.program.env_event(request.args, **request.kwargs)
         
         # 同步更新 UI 并广播
-        backend_state.update_windowConfig()
-        await backend_state.broadcast_update()
+        await state.broadcast_update()
         
         return {"message": f"Event {request.args} handled successfully"}
     except Exception as e:
@@ -162,66 +530,90 @@ async def handle_event_call(request: EventCallRequest):
         return JSONResponse(content={"message": f"Error: {str(e)}"}, status_code=500)
 
 
-# 用于存储 SSE 客户端队列
-subscribers = []
 # 新式窗口配置管理接口
 @app.get("/api/windows/config")
-async def get_window_configs():
+async def get_window_configs(session_id: str = DEFAULT_SESSION_ID):
     """获取窗口配置列表"""
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
     return JSONResponse(content={
-        "windows": [config.model_dump() for config in backend_state.window_configs]
+        "windows": [config.model_dump() for config in state.window_configs]
     })
 
 # SSE 接口（新式格式）
+# 推送格式：
+#   {"type": "full",  "version": v, "windows": [...]}                     连接时 / 版本不一致时
+#   {"type": "delta", "version": v, "base_version": v-1,
+#    "changed": [...], "removed": [windowId...], "order": [windowId...]}   其余更新，仅包含变化的窗口
+# 空闲时每 SSE_HEARTBEAT_INTERVAL 秒发送一次心跳注释行，断开的连接会被移出订阅列表。
 @app.get("/api/sse")
-async def sse_endpoint():
-    async def event_generator():
-        # 新客户端连接时立即推送完整状态
-        initial_data = backend_state.get_full_state()
-        yield f"data: {json.dumps(initial_data, ensure_ascii=False)}\n\n"
+async def sse_endpoint(request: Request, session_id: str = DEFAULT_SESSION_ID):
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
 
-        # 添加到订阅者队列
-        queue = asyncio.Queue()
-        backend_state.subscribers.append(queue)
+    async def event_generator():
+        # 先把尚未推送的变化发给已有订阅者，再给新客户端推送当前版本的完整状态
+        await state.broadcast_update()
+        subscriber = SSESubscriber()
+        subscriber.version = state.version
+        state.subscribers.append(subscriber)
 
         try:
+            yield state.get_full_frame()
             while True:
-                data = await queue.get()
-                yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-        except asyncio.CancelledError:
-            # 客户端断开时清理
-            if queue in backend_state.subscribers:
-                backend_state.subscribers.remove(queue)
-            raise
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield SSE_HEARTBEAT_FRAME
+                    continue
+
+                payload = subscriber.next_payload(frame, state)
+                if payload is not None:
+                    yield payload
+        finally:
+            # 客户端断开（取消、写入失败或心跳检测到断开）时清理
+            if subscriber in state.subscribers:
+                state.subscribers.remove(subscriber)
+            state.touch()
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
-# 广播函数：推送给所有 SSE 客户端
-async def send_sse_update(data):
-    for queue in subscribers:
-        await queue.put(data)
-
 # 请求体模型
 class LLMCallRequest(BaseModel):
     prompt: str
 
 @app.post("/api/llm/call")
-async def call_llm(data: LLMCallRequest):
+async def call_llm(data: LLMCallRequest, session_id: str = DEFAULT_SESSION_ID):
     """LLM 调用接口"""
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
+    if not state.program:
+        return JSONResponse(content={"message": "No active program"}, status_code=400)
     prompt = data.prompt
-    print("收到 LLM 调用请求！Prompt 内容前50字符：")
+    print(f"[{session_id}] 收到 LLM 调用请求！Prompt 内容前50字符：")
     print(prompt[:50])
     
-    # 调用上下文程序
-    if backend_state.use_cache and "last_result" in backend_state.cache:
-        result = backend_state.cache["last_result"]
-    else:
-        result = program.run(use_cache=backend_state.use_cache)
-        backend_state.cache["last_result"] = result
-
-    backend_state.update_windowConfig()
+    loop = asyncio.get_running_loop()
+
+    def on_call(_result):
+        # 流式模式下每执行一个 Syscall 就推送一次 UI 更新，此时模型仍在继续生成
+        loop.call_soon_threadsafe(state.publish)
+
+    # 调用上下文程序（同一会话内串行执行）
+    async with state.lock:
+        client = getattr(state.program, "llm_client", None)
+        if client is not None:
+            client.set_response_cache(state.response_cache)
+        # 异步等待模型回复，期间其他请求与 SSE 推送照常处理
+        result = await state.program.arun(use_cache=state.use_cache, stream=state.stream, on_call=on_call)
+
     # 广播更新
-    await backend_state.broadcast_update()
+    await state.broadcast_update()
     
     # 💡 提取第一个行动记录的摘要作为简短回答，如果没有则显示执行成功
     answer = result.get_first_summary()
@@ -236,19 +628,39 @@ async def call_llm(data: LLMCallRequest):
 
 class LLMConfig(BaseModel):
     use_cache: bool
+    stream: Optional[bool] = None
+    response_cache: Optional[bool] = None
 
 @app.post("/api/llm/config")
-async def config_llm(config: LLMConfig):
-    backend_state.use_cache = config.use_cache
+async def config_llm(config: LLMConfig, session_id: str = DEFAULT_SESSION_ID):
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
+    state.use_cache = config.use_cache
+    if config.stream is not None:
+        state.stream = config.stream
+    if config.response_cache is not None:
+        state.response_cache = config.response_cache
     return {
-        "message": f"Cache usage set to {backend_state.use_cache}"}
+        "message": f"Cache usage set to {state.use_cache}, streaming set to {state.stream}, "
+                   f"response cache set to {state.response_cache}"}
+
+@app.get("/api/llm/cacheStats")
+async def response_cache_stats():
+    """模型回复缓存的命中 / 未命中 / 淘汰统计；没有会话开启缓存时不创建缓存文件"""
+    if not any(state.response_cache for state in session_registry.sessions.values()):
+        return {"enabled": False}
+    return {"enabled": True, **get_response_cache().stats()}
 
 class ModelSetRequest(BaseModel):
     model: str
 
 @app.post("/api/llm/setModel")
-async def set_model(request: ModelSetRequest):
-    global program
+async def set_model(request: ModelSetRequest, session_id: str = DEFAULT_SESSION_ID):
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
+    program = state.program
     if program and hasattr(program, 'llm_client') and program.llm_client:
         try:
             program.llm_client.set_model(request.model)
@@ -258,8 +670,11 @@ async def set_model(request: ModelSetRequest):
     return JSONResponse(content={"message": "No active program or LLM client"}, status_code=400)
 
 @app.get("/api/llm/getModels")
-async def get_models():
-    global program
+async def get_models(session_id: str = DEFAULT_SESSION_ID):
+    state = session_registry.get(session_id)
+    if not state:
+        return _session_not_found(session_id)
+    program = state.program
     if program and hasattr(program, 'llm_client') and program.llm_client:
         try:
             models = program.llm_client.get_available_models()
@@ -277,6 +692,7 @@ async def root():
         "features": [
             "动态窗口配置管理",
             "SSE 实时数据推送",
+            "多会话（session_id 参数）",
             "向后兼容的API接口",
             "前端组件类型验证"
         ],
@@ -287,7 +703,8 @@ if __name__ == "__main__":
     import uvicorn
     print("启动新式后端服务器...")
     print("支持的窗口类型: kernel, heap, stack, code")
-    print("SSE 端点: /api/sse")
+    print("SSE 端点: /api/sse?session_id=<id>")
+    print("会话管理: /api/session/create, /api/sessions")
     print("窗口配置管理: /api/windows/config")
     print("传统API兼容: /api/modules, /api/modules/update")
     
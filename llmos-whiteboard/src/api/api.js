@@ -1,9 +1,9 @@
-import {API_BASE_URL} from "../config/api";
+import {API_BASE_URL, withSession} from "../config/api";
 
 export const event_call = async (args, kwargs) => {
     try {
       const data = { "args":args,"kwargs": kwargs };
-      const res = await fetch(`${API_BASE_URL}/windows/event_call`, {
+      const res = await fetch(withSession("/windows/event_call"), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(data),
@@ -18,7 +18,7 @@ export const event_call = async (args, kwargs) => {
 
 export async function callLLM(fullPrompt) {
   try {
-    const res = await fetch(`${API_BASE_URL}/llm/call`, {
+    const res = await fetch(withSession("/llm/call"), {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ prompt: fullPrompt }),
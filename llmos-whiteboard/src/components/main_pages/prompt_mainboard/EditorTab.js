@@ -3,7 +3,7 @@ import DynamicWindowFactory from './PromptWindows/DynamicWindowFactory';
 import PromptDisplay from './Panel/PromptDisplay';
 import LLMControlPanel from './Panel/LLMControlPanel';
 
-import {API_BASE_URL} from "../../../config/api";
+import {withSession} from "../../../config/api";
 
 const EditorTab = ({
   darkMode
@@ -15,15 +15,30 @@ const EditorTab = ({
   useEffect(() => {
     setLoading(true);
     // 使用 EventSource 监听 SSE 接口
-    const eventSource = new EventSource(`${API_BASE_URL}/sse`);
+    const eventSource = new EventSource(withSession("/sse"));
+
+    // 当前已应用的状态版本号，用于校验增量是否连续
+    let version = null;
 
     // 监听 'message' 事件，这是后端推送数据时触发的事件
     eventSource.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
 
-        // 检查是否是动态配置数据（新式格式）
-        if (data.windows && Array.isArray(data.windows)) {
+        if (data.type === 'delta') {
+          // 增量：只替换变化的窗口；版本不连续时忽略，等待后端的全量同步
+          if (data.base_version !== version) return;
+          version = data.version;
+          setWindows(prev => {
+            const byId = {};
+            prev.forEach(win => { byId[win.windowId] = win; });
+            (data.removed || []).forEach(id => { delete byId[id]; });
+            (data.changed || []).forEach(win => { byId[win.windowId] = win; });
+            return (data.order || Object.keys(byId)).filter(id => byId[id]).map(id => byId[id]);
+          });
+        } else if (data.windows && Array.isArray(data.windows)) {
+          // 全量状态（新式格式）
+          version = data.version ?? null;
           setWindows(data.windows);
         }
         setLoading(false);
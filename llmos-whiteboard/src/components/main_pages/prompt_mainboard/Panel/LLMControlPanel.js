@@ -1,5 +1,5 @@
 import React, {useCallback, useEffect, useState} from 'react';
-import {API_BASE_URL} from "../../../../config/api";
+import {API_BASE_URL, withSession} from "../../../../config/api";
 import LLMOutputWindow from "./LLMOutputWindow";
 import HistoryWindow from "./HistoryWindow";
 import {callLLM} from "../../../../api/api";
@@ -21,7 +21,7 @@ const LLMControlPanel = ({
   const handleCacheToggle = async (enabled) => {
     setUseCache(enabled);
     try {
-      await fetch(`${API_BASE_URL}/llm/config`, {
+      await fetch(withSession("/llm/config"), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ use_cache: enabled }),
@@ -95,7 +95,7 @@ const LLMControlPanel = ({
   const handleProgramSwitch = async (programName) => {
     if (!programName) return;
     try {
-      const res = await fetch(`${API_BASE_URL}/program/set`, {
+      const res = await fetch(withSession("/program/set"), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ program_name: programName }),
@@ -116,7 +116,7 @@ const LLMControlPanel = ({
     
     setLoading(true);
     try {
-      const res = await fetch(`${API_BASE_URL}/program/reset`, {
+      const res = await fetch(withSession("/program/reset"), {
         method: 'POST',
       });
       if (res.ok) {
@@ -137,7 +137,7 @@ const LLMControlPanel = ({
     if (!selectedModel) return;
 
     try {
-      const res = await fetch(`${API_BASE_URL}/model/update`, {
+      const res = await fetch(withSession("/model/update"), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ modelName: selectedModel }),
@@ -1 +1,7 @@
-export const API_BASE_URL = 'http://localhost:3001/api';
\ No newline at end of file
+export const API_BASE_URL = 'http://localhost:3001/api';
+
+// 会话 ID：通过页面 URL 的 ?session=xxx 指定，未指定时使用后端的默认会话
+export const SESSION_ID = new URLSearchParams(window.location.search).get('session') || 'default';
+
+// 为后端接口地址附加 session_id 参数
+export const withSession = (path) => `${API_BASE_URL}${path}?session_id=${encodeURIComponent(SESSION_ID)}`;
@@ -1,22 +1,34 @@
+import asyncio
+import json
 from abc import ABC, abstractmethod
-from typing import List, Any
+from typing import List, Any, Dict, Tuple
 
 from llmos_core.llmos_util import LLMClient
-from llmos_core.schema import ProgramRunResult
+from llmos_core.schema import ProgramRunResult, LLMOSCall
 from llmos_core.Prompts.PromptMainBoard import PromptMainBoard, parse_response
+from llmos_core.Prompts.syscall_stream import StreamingSyscallDispatcher
 from llmos_core.Prompts.Windows.BaseWindow import NullSystemWindow
 from llmos_core.ui import WindowConfig
 
+# Program 回合的采样参数（与 LLMClient.chat() 的默认值相同），由 _build_chat_kwargs 显式传入，
+# 同步 / 异步、流式 / 非流式四条路径发送相同的请求
+LLM_SAMPLING = {"temperature": 0.8, "frequency_penalty": 1}
+
 
 class BaseProgram(ABC):
-    def __init__(self, windows=None,system_windows=None):
+    def __init__(self, windows=None,system_windows=None, llm_client=None):
+        """
+        :param llm_client: 可选的模型客户端（需提供 chat / achat 等接口，例如测试与评测中的模拟客户端），默认创建 LLMClient
+        """
         if windows is None:
             windows = []
         if system_windows is None:
             system_windows = NullSystemWindow()
         self.promptMainBoard = PromptMainBoard()
         self.promptMainBoard.register_windows(user_windows=windows, system_windows=system_windows)
-        self.llm_client = LLMClient()
+        self.llm_client = llm_client if llm_client is not None else LLMClient()
+        # 可选的回合录制器（见 Program.recorder.TurnRecorder），设置后每次模型回合都会被完整记录
+        self.recorder = None
 
     def set_model(self, model_name: str):
         if self.llm_client:
@@ -31,6 +43,97 @@ class BaseProgram(ABC):
     def run(self, *args, **kwargs) -> ProgramRunResult:
         pass
 
+    async def arun(self, *args, **kwargs) -> ProgramRunResult:
+        """
+        异步执行一次模型回合。
+        默认把同步的 run() 放到线程池中执行，保证不阻塞事件循环；
+        子类应重写为基于 LLMClient.achat 的真正异步实现。
+        """
+        return await asyncio.to_thread(self.run, *args, **kwargs)
+
+    def _build_chat_kwargs(self) -> Dict[str, Any]:
+        """组装本回合的消息与工具，作为 LLMClient.chat / achat 的参数（按当前模型的 prompt_budget 压缩）"""
+        messages = self.promptMainBoard.assemble_messages(max_tokens=getattr(self.llm_client, "prompt_budget", None))
+        # 调用 LLM，传入收集到的 tools (如果存在)
+        tools = self.promptMainBoard.get_all_tools()
+        kwargs = {"messages": messages, **LLM_SAMPLING}
+        if tools:
+            kwargs["tools"] = tools
+        return kwargs
+
+    def _call_llm(self, stream=False, auto_record=True, on_call=None) -> Tuple[Dict[str, Any], str, List[Any]]:
+        """
+        组装提示词、请求模型并分发回复。
+        stream=True 时边生成边执行：每个 Syscall 的 JSON 一旦完整就立即分发，on_call(result) 随之触发。
+        :return: (chat_kwargs, response_text, calls)
+        """
+        chat_kwargs = self._build_chat_kwargs()
+        self._begin_record()
+        if stream:
+            dispatcher = StreamingSyscallDispatcher(self.promptMainBoard, auto_record=auto_record, on_call=on_call)
+            for delta in self.llm_client.chat_stream(**chat_kwargs):
+                dispatcher.feed_delta(delta)
+            response_text, calls = dispatcher.finish()
+            response_msg = self._streamed_message(dispatcher)
+        else:
+            response_msg = self.llm_client.chat(**chat_kwargs)
+            response_text, calls = self._dispatch_llm_message(response_msg, auto_record=auto_record)
+        self._end_record(chat_kwargs, response_msg)
+        return chat_kwargs, response_text, calls
+
+    async def _acall_llm(self, stream=False, auto_record=True, on_call=None) -> Tuple[Dict[str, Any], str, List[Any]]:
+        """_call_llm() 的异步版本"""
+        chat_kwargs = self._build_chat_kwargs()
+        self._begin_record()
+        if stream:
+            dispatcher = StreamingSyscallDispatcher(self.promptMainBoard, auto_record=auto_record, on_call=on_call)
+            async for delta in self.llm_client.achat_stream(**chat_kwargs):
+                dispatcher.feed_delta(delta)
+            response_text, calls = dispatcher.finish()
+            response_msg = self._streamed_message(dispatcher)
+        else:
+            response_msg = await self.llm_client.achat(**chat_kwargs)
+            response_text, calls = self._dispatch_llm_message(response_msg, auto_record=auto_record)
+        self._end_record(chat_kwargs, response_msg)
+        return chat_kwargs, response_text, calls
+
+    @staticmethod
+    def _streamed_message(dispatcher: StreamingSyscallDispatcher) -> Dict[str, Any]:
+        """由流式分发器重建完整的助手消息"""
+        message = {"role": "assistant", "content": dispatcher.response_text}
+        if dispatcher.tool_calls:
+            message["tool_calls"] = dispatcher.tool_calls
+        return message
+
+    def _begin_record(self):
+        if self.recorder is not None:
+            self.recorder.begin_turn(self.promptMainBoard)
+
+    def _end_record(self, chat_kwargs: Dict[str, Any], response_msg: Any):
+        if self.recorder is not None:
+            self.recorder.end_turn(chat_kwargs, response_msg)
+
+    def _dispatch_llm_message(self, response_msg, auto_record=True) -> Tuple[str, List[Any]]:
+        """
+        将模型回复分发给各窗口的 handler。
+        优先处理原生 tool_calls，否则解析 content 中的 JSON Syscall。
+        :return: (response_text, calls)
+        """
+        response_text = response_msg.content or ""
+        if getattr(response_msg, 'tool_calls', None):
+            calls = []
+            for tc in response_msg.tool_calls:
+                call_data = LLMOSCall(
+                    call_type="tool",
+                    func_name=tc.function.name,
+                    kwargs=json.loads(tc.function.arguments)
+                )
+                result = self.promptMainBoard.handle_call(call_data, auto_record=auto_record)
+                calls.append(result)
+        else:
+            calls = self.promptMainBoard.apply_response(response_text, auto_record=auto_record)
+        return response_text, calls
+
     def env_event(self, func_name, **kwargs):
         """
         处理来自环境或用户的事件调用。
@@ -50,6 +153,22 @@ class BaseProgram(ABC):
     def get_window_snapshots(self):
         return self.promptMainBoard.get_divided_snapshot()
 
+    def bind_session(self, session_id: str):
+        """程序被分配给会话后由后端调用，各窗口可据此加载该会话的持久化状态（如堆）"""
+        for window in self.promptMainBoard.user_windows + self.promptMainBoard.system_windows:
+            window.bind_session(session_id)
+
+    def close(self):
+        """释放各窗口持有的资源（例如把 ALFWorld 环境归还环境池）"""
+        for window in self.promptMainBoard.user_windows + self.promptMainBoard.system_windows:
+            window.close()
+
+    def discard_session(self):
+        """程序所在的会话被移除（或程序被替换）时由后端调用：删除各窗口按会话持久化的状态，再释放资源"""
+        for window in self.promptMainBoard.user_windows + self.promptMainBoard.system_windows:
+            window.discard_session()
+        self.close()
+
     def reset(self):
         """
         重置程序状态。基类默认清空所有窗口的状态。
@@ -58,6 +177,7 @@ class BaseProgram(ABC):
         for window in self.promptMainBoard.user_windows + self.promptMainBoard.system_windows:
             if hasattr(window, 'reset'):
                 window.reset()
+                window.mark_dirty()
             else:
                 # 默认回退：尝试清除 state_prompt 相关的内部状态
                 # 这里可以根据具体窗口实现来完善
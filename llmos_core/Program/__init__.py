@@ -5,3 +5,10 @@ from .chatProgram import *
 from pathlib import Path
 import yaml
 
+
+def __getattr__(name):
+    # 批量 ALFWorld 程序在导入时依赖 alfworld，按需加载
+    if name == "BatchedALFworldProgram":
+        from .batched_alfworld_program import BatchedALFworldProgram
+        return BatchedALFworldProgram
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
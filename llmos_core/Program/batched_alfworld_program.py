@@ -0,0 +1,101 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from llmos_core.Program.ALFworldProgram import ALFworldProgram
+from llmos_core.Program.BaseProgram import BaseProgram
+from llmos_core.Prompts.Windows.ALFworldWindow import ALFworldWindow, BatchedALFworldEnv
+from llmos_core.schema import ProgramRunResult
+
+
+class BatchedALFworldProgram(BaseProgram):
+    """
+    一个程序同时驱动 N 局 ALFWorld 游戏。
+        - 每局游戏拥有独立的 ALFworldProgram（独立的窗口、观察历史与 PromptMainBoard）
+        - 所有游戏共享一个 BatchedALFworldEnv：各局本回合的动作合并为一次 env.step([...])
+        - 每回合 N 个提示词并发请求模型（共享同一个 LLMClient / AsyncOpenAI 连接池）
+    promptMainBoard 指向第 0 局，便于前端展示。
+    """
+
+    def __init__(self, batch_size: int = 4, batch_env: Optional[BatchedALFworldEnv] = None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.batch_env = batch_env or BatchedALFworldEnv(batch_size)
+        self.programs: List[ALFworldProgram] = []
+        for slot in range(batch_size):
+            program = ALFworldProgram(alfworld_kwargs={"batch_env": self.batch_env, "slot": slot})
+            program.llm_client = self.llm_client
+            self.programs.append(program)
+        self.promptMainBoard = self.programs[0].promptMainBoard
+        # 各局的分发会在批量 step 的屏障处互相等待，必须保证每局都有自己的线程
+        self._executor = ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix="alfworld-slot")
+
+    def set_model(self, model_name: str):
+        self.llm_client.set_model(model_name)
+
+    def alfworld_window(self, slot: int) -> ALFworldWindow:
+        for window in self.programs[slot].promptMainBoard.user_windows:
+            if isinstance(window, ALFworldWindow):
+                return window
+        raise LookupError(f"No ALFworldWindow registered for slot {slot}")
+
+    def active_slots(self) -> List[int]:
+        """尚未结束的游戏"""
+        return [slot for slot in range(self.batch_size) if not self.alfworld_window(slot).done]
+
+    def run(self, *args, **kwargs) -> List[ProgramRunResult]:
+        return asyncio.run(self.arun(*args, **kwargs))
+
+    async def arun(self, auto_record=True) -> List[ProgramRunResult]:
+        """
+        所有未结束的游戏各执行一个模型回合。
+        返回按 slot 排列的结果列表，已结束的游戏对应 None。
+        """
+        slots = self.active_slots()
+        self.batch_env.begin_turn(slots)
+        turn_results = await asyncio.gather(*(self._run_slot(slot, auto_record) for slot in slots))
+        results: List[Optional[ProgramRunResult]] = [None] * self.batch_size
+        for slot, result in zip(slots, turn_results):
+            results[slot] = result
+        return results
+
+    async def _run_slot(self, slot: int, auto_record: bool) -> ProgramRunResult:
+        program = self.programs[slot]
+        loop = asyncio.get_running_loop()
+        try:
+            chat_kwargs = program._build_chat_kwargs()
+            response_msg = await self.llm_client.achat(**chat_kwargs)
+        except Exception as e:
+            # 该局本回合无法继续，释放屏障，避免其他游戏一直等待
+            self.batch_env.end_slot(slot)
+            print(f"[batch] slot {slot} LLM 调用失败: {e}")
+            return ProgramRunResult(raw_response="", parsed_calls=[])
+
+        def dispatch():
+            try:
+                return program._dispatch_llm_message(response_msg, auto_record=auto_record)
+            finally:
+                self.batch_env.end_slot(slot)
+
+        response_text, calls = await loop.run_in_executor(self._executor, dispatch)
+        return ProgramRunResult(raw_response=response_text, parsed_calls=calls)
+
+    def reset(self):
+        """重置全部游戏，再重置各局的窗口状态"""
+        self.batch_env.reset()
+        for program in self.programs:
+            program.reset()
+
+    def bind_session(self, session_id: str):
+        for slot, program in enumerate(self.programs):
+            program.bind_session(f"{session_id}/{slot}")
+
+    def close(self):
+        for program in self.programs:
+            program.close()
+        self._executor.shutdown(wait=False)
+
+    def discard_session(self):
+        for program in self.programs:
+            program.discard_session()
+        self._executor.shutdown(wait=False)
@@ -1,16 +1,35 @@
+import os
+import re
 from pathlib import Path
 
 from llmos_core.Program.BaseProgram import BaseProgram
-from llmos_core.cache import CacheManager
+from llmos_core.Program.recorder import TurnRecorder, recorded_message, replay_turn
 from llmos_core.llmos_util import LLMClient
 from llmos_core.Prompts.Windows import PromptWindow
+from llmos_core.schema import ProgramRunResult
 
 
 CACHE_DIR = Path(__file__).parent / 'cache_result'
-CACHE_FILE = CACHE_DIR / "chat.json"
+CACHE_FILE = CACHE_DIR / "chat.jsonl"
+# 旧版的 JSON 数组格式缓存，CACHE_FILE 为空时从中迁移
+LEGACY_CACHE_FILE = CACHE_DIR / "chat.json"
 Code_file = Path(__file__).parent / "chatCode.md"
+# 设为 1 时默认开启回合录制（也可以通过 ChatProgram(record=True) 开启）
+CHAT_RECORDING = os.getenv("LLMOS_CHAT_RECORD", "0") == "1"
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w.-]")
+
+
+def session_record_file(session_id: str) -> Path:
+    """会话的录制文件：每个会话一个文件，并发会话之间不会交错写入或回放彼此的回合"""
+    return CACHE_DIR / f"chat-{_UNSAFE_FILENAME_RE.sub('_', session_id)}.jsonl"
+
+
 class ChatProgram(BaseProgram):
-    def __init__(self,use_cache=True):
+    def __init__(self, use_cache=False, record=CHAT_RECORDING):
+        """
+        :param use_cache: 从录制文件中按顺序回放回合，回放完后转为实时调用（需要开启 record）
+        :param record: 录制每个实时回合；未绑定会话时写入 CACHE_FILE，bind_session() 后写入该会话自己的文件
+        """
 
         # 注册窗口
         windows = [
@@ -26,70 +45,79 @@ class ChatProgram(BaseProgram):
         super().__init__(windows=windows,system_windows=system_window)
         self.llm_client = LLMClient()
         self.use_cache = use_cache
-        # === 缓存生成器状态 ===
-        self.cache_manager = CacheManager(CACHE_FILE,clear_cache_file=not use_cache)
+        self.record = record
+        # === 回合录制（默认关闭）：实时回合完整记录（含 tool_calls），use_cache 时按顺序回放 ===
+        # 录制文件在第一次使用时才打开，避免构造后立即绑定会话的程序清空共享的 CACHE_FILE
+        self.recorder = None
 
     def set_client_model(self, model_name):
         self.llm_client.set_model(model_name)
 
+    def bind_session(self, session_id: str):
+        super().bind_session(session_id)
+        if self.record:
+            if self.recorder is not None:
+                self.recorder.close()
+            self.recorder = TurnRecorder(session_record_file(session_id), clear=not self.use_cache)
+
+    def close(self):
+        super().close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def _ensure_recorder(self):
+        if self.record and self.recorder is None:
+            self.recorder = TurnRecorder(CACHE_FILE, clear=not self.use_cache, legacy_file=LEGACY_CACHE_FILE)
+        return self.recorder
+
+    def _begin_record(self):
+        self._ensure_recorder()
+        super()._begin_record()
+
     # === 核心任务1：模型回合 ===
-    def run(self,auto_record = True):
+    def run(self, use_cache=None, auto_record=True, stream=False, on_call=None) -> ProgramRunResult:
         """一次模型回合，可能来自缓存或实时API"""
-        if self.use_cache:
-            record = self.cache_manager.next_record()
-            if record:
-                print(f"[cache replay] 使用第 {record['index']} 轮缓存")
-                response = record["response"]
-                calls=self.promptMainBoard.apply_response(response)
-                return {
-                    "snapshot": self.promptMainBoard.get_divided_snapshot(),
-                    "raw_response": response,
-                    "parsed_calls": calls
-                }
+        replayed = self._replay_cached_turn(use_cache)
+        if replayed:
+            return replayed
 
         # === 实时运行 ===
-        messages = self.promptMainBoard.assemble_messages()
-
-        # This logic is derived from the intended replacement, but adapted to be a complete and valid code block.
-        # It introduces tool calling and handles both tool calls and regular text responses.
-        import json
-        from llmos_core.llmos_util import LLMOSCall
-
-        # 调用 LLM，传入收集到的 tools (如果存在)
-        tools = self.promptMainBoard.get_all_tools()
-        kwargs = {"messages": messages}
-        if tools:
-            kwargs["tools"] = tools
-
-        response_msg = self.llm_client.chat(**kwargs)
-        response_text = response_msg.content or ""
-
-        # 优先处理 tool_calls
-        if hasattr(response_msg, 'tool_calls') and response_msg.tool_calls:
-            calls = []
-            for tc in response_msg.tool_calls:
-                call_data = LLMOSCall(
-                    call_type="tool",
-                    func_name=tc.function.name,
-                    kwargs=json.loads(tc.function.arguments)
-                )
-                result = self.promptMainBoard.handle_call(call_data, auto_record=auto_record)
-                calls.append(result)
-        else:
-            # 如果没有 tool_calls，则尝试解析 content 中的 JSON Syscall
-            calls = self.apply_response(response_text)
-
-        # === 缓存记录 ===
-        # NOTE: Caching `response_text` will not preserve tool calls on replay.
-        # The cache replay logic might need a separate update to handle structured `response_msg`.
-        serializable_messages = [m.model_dump() for m in messages]
-        self.cache_manager.append_record(serializable_messages, response_text)
-
-        return {
-            "snapshot": self.promptMainBoard.get_divided_snapshot(),
-            "raw_response": response_text, # Use response_text instead of the old `response`
-            "parsed_calls": calls
-        }
+        chat_kwargs, response_text, calls = self._call_llm(stream=stream, auto_record=auto_record, on_call=on_call)
+        return self._finish_turn(chat_kwargs["messages"], response_text, calls)
+
+    async def arun(self, use_cache=None, auto_record=True, stream=False, on_call=None) -> ProgramRunResult:
+        """run() 的异步版本：等待模型期间不阻塞事件循环"""
+        replayed = self._replay_cached_turn(use_cache)
+        if replayed:
+            return replayed
+
+        chat_kwargs, response_text, calls = await self._acall_llm(stream=stream, auto_record=auto_record, on_call=on_call)
+        return self._finish_turn(chat_kwargs["messages"], response_text, calls)
+
+    def _replay_cached_turn(self, use_cache=None):
+        """use_cache 时从缓存中取下一轮回复并执行；没有更多缓存时返回 None"""
+        if use_cache is None:
+            use_cache = self.use_cache
+        if not use_cache or self._ensure_recorder() is None:
+            return None
+        record = self.recorder.next_turn()
+        if not record:
+            return None
+        print(f"[cache replay] 使用第 {record['index']} 轮缓存")
+        calls = replay_turn(self.promptMainBoard, record)
+        return ProgramRunResult(
+            snapshot=self.promptMainBoard.get_divided_snapshot(),
+            raw_response=recorded_message(record).get("content") or "",
+            parsed_calls=calls
+        )
+
+    def _finish_turn(self, messages, response_text, calls) -> ProgramRunResult:
+        """生成回合结果（回合记录已由 BaseProgram 通过 self.recorder 写入）"""
+        return ProgramRunResult(
+            snapshot=self.promptMainBoard.get_divided_snapshot(),
+            raw_response=response_text,
+            parsed_calls=calls
+        )
 
     def apply_response(self, response):
         return self.promptMainBoard.apply_response(response)
@@ -2,9 +2,8 @@ from llmos_core.Program import BaseProgram
 from llmos_core.Prompts.PromptMainBoard import PromptMainBoard, parse_response
 from llmos_core.llmos_util.api_client import LLMClient
 from llmos_core.Prompts.Windows import PromptWindow
-from llmos_core.schema import ProgramRunResult, LLMOSCall
+from llmos_core.schema import ProgramRunResult
 import yaml
-import json
 from pathlib import Path
 
 CACHE_FILE = Path('./cache') / "cache.yaml"
@@ -29,28 +28,26 @@ class ContextProgram(BaseProgram):
         self.promptMainBoard.register_windows(windows)
         self.llm_client = LLMClient()
 
-    def run(self, use_cache=True) -> ProgramRunResult:
+    def run(self, use_cache=True, stream=False, on_call=None) -> ProgramRunResult:
         if use_cache:
             response_text = load_cache_result()
             calls = parse_response(response_text)
         else:
-            messages = self.promptMainBoard.assemble_messages()
-            tools = self.promptMainBoard.get_all_tools()
-            response_msg = self.llm_client.chat(messages, tools=tools)
-            response_text = response_msg.content or ""
-            
-            if hasattr(response_msg, 'tool_calls') and response_msg.tool_calls:
-                calls = []
-                for tc in response_msg.tool_calls:
-                    call_data = LLMOSCall(
-                        call_type="tool",
-                        func_name=tc.function.name,
-                        kwargs=json.loads(tc.function.arguments)
-                    )
-                    result = self.promptMainBoard.handle_call(call_data)
-                    calls.append(result)
-            else:
-                calls = self.promptMainBoard.apply_response(response_text)
+            _, response_text, calls = self._call_llm(stream=stream, on_call=on_call)
+
+        return ProgramRunResult(
+            snapshot=self.promptMainBoard.get_divided_snapshot(),
+            raw_response=response_text,
+            parsed_calls=calls
+        )
+
+    async def arun(self, use_cache=True, stream=False, on_call=None) -> ProgramRunResult:
+        """run() 的异步版本：等待模型期间不阻塞事件循环"""
+        if use_cache:
+            response_text = load_cache_result()
+            calls = parse_response(response_text)
+        else:
+            _, response_text, calls = await self._acall_llm(stream=stream, on_call=on_call)
 
         return ProgramRunResult(
             snapshot=self.promptMainBoard.get_divided_snapshot(),
@@ -0,0 +1,241 @@
+"""
+无界面的 ALFWorld 评测：把多局游戏分散到进程池中执行。
+
+    python -m llmos_core.Program.evaluate --episodes 200 --max-steps 40 --output results.jsonl
+    python -m llmos_core.Program.evaluate --episodes 20 --mock                  # 进程内的模拟模型
+    python -m llmos_core.Program.evaluate --base-url http://127.0.0.1:8001/v1   # OpenAI 兼容的模拟服务
+
+每局的种子为 seed + episode，与由哪个进程执行无关，结果可复现。
+每局结束立即写入一行 JSON（won, steps, reward, tokens, wall time ...），最后打印成功率与延迟分位数。
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from openai.types.chat import ChatCompletionMessage
+
+DEFAULT_MAX_STEPS = 50
+
+_ADMISSIBLE_RE = re.compile(r"### ADMISSIBLE COMMANDS ###\s*\n(.*)")
+
+
+@dataclass
+class EpisodeResult:
+    episode: int
+    seed: int
+    won: bool = False
+    steps: int = 0
+    reward: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    wall_time: float = 0.0
+    prompt_bytes: int = 0
+    prefix_bytes: int = 0  # 与上一回合提示词相同的前缀字节数（可被服务端前缀缓存复用）
+    turn_latencies: List[float] = field(default_factory=list)  # 每个模型回合的耗时（秒）
+    error: Optional[str] = None
+
+
+class MockLLMClient:
+    """
+    进程内的模拟模型：从提示词的 ADMISSIBLE COMMANDS 中随机选择一个动作，以原生 tool_call 返回。
+    用于在没有模型服务的情况下验证评测流程与框架开销。
+    """
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.model_name = "mock"
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def seed(self, seed: int):
+        self.rng.seed(seed)
+
+    def set_model(self, model_name):
+        pass
+
+    def get_available_models(self):
+        return ["mock"]
+
+    def reset_usage(self) -> Dict[str, int]:
+        usage, self.usage = self.usage, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        return usage
+
+    def chat(self, messages, tools=None, **kwargs):
+        text = "\n".join(getattr(m, "content", None) or (m.get("content") if isinstance(m, dict) else "") or ""
+                         for m in messages)
+        match = None
+        for match in _ADMISSIBLE_RE.finditer(text):
+            pass
+        commands = [c.strip() for c in match.group(1).split(",") if c.strip()] if match else []
+        action = self.rng.choice(commands) if commands else "look"
+        arguments = json.dumps({"action": action})
+
+        self.usage["requests"] += 1
+        self.usage["prompt_tokens"] += len(text) // 4
+        self.usage["completion_tokens"] += len(arguments) // 4
+        return ChatCompletionMessage.model_validate({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{self.usage['requests']}",
+                "type": "function",
+                "function": {"name": "ALF_step", "arguments": arguments},
+            }],
+        })
+
+    async def achat(self, *args, **kwargs):
+        return self.chat(*args, **kwargs)
+
+
+# === 工作进程 ===
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(model: Optional[str], base_url: Optional[str], mock: bool, prompt_layout: Optional[str] = None):
+    """每个工作进程只创建一次程序与环境，之后的各局复用"""
+    from llmos_core.Program.ALFworldProgram import ALFworldProgram
+    from llmos_core.Prompts.Windows.ALFworldWindow import ALFworldWindow
+
+    program = ALFworldProgram()
+    if prompt_layout:
+        program.promptMainBoard.set_prompt_layout(prompt_layout)
+    if mock:
+        program.llm_client = MockLLMClient()
+    else:
+        if model:
+            program.set_model(model)
+        if base_url:
+            program.llm_client.set_endpoint(base_url)
+
+    window = next(w for w in program.promptMainBoard.user_windows if isinstance(w, ALFworldWindow))
+    _worker["program"] = program
+    _worker["window"] = window
+
+
+def run_episode(episode: int, seed: int, max_steps: int) -> Dict[str, Any]:
+    program = _worker["program"]
+    window = _worker["window"]
+    client = program.llm_client
+    result = EpisodeResult(episode=episode, seed=seed)
+    start = time.perf_counter()
+
+    rewards: List[float] = []
+
+    def on_result(call_result):
+        if call_result.func_name == "ALF_step" and isinstance(call_result.result, dict):
+            rewards.append(call_result.result.get("reward", 0) or 0)
+
+    board = program.promptMainBoard
+    board.add_call_listener(on_result)
+    try:
+        random.seed(seed)
+        if hasattr(client, "seed"):
+            client.seed(seed)
+        window.seed(seed)
+        program.reset()
+        client.reset_usage()
+
+        while result.steps < max_steps and not window.done:
+            turn_start = time.perf_counter()
+            program.run()
+            result.turn_latencies.append(time.perf_counter() - turn_start)
+            result.steps += 1
+            prefix = board.last_prefix_report
+            if prefix is not None:
+                result.prompt_bytes += prefix.total_bytes
+                result.prefix_bytes += prefix.prefix_bytes
+
+        won = (window.info or {}).get("won", [False])
+        result.won = bool(won[0] if isinstance(won, (list, tuple)) else won)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        board.remove_call_listener(on_result)
+
+    usage = client.reset_usage()
+    result.prompt_tokens = usage.get("prompt_tokens", 0)
+    result.completion_tokens = usage.get("completion_tokens", 0)
+    result.reward = float(sum(rewards))
+    result.wall_time = time.perf_counter() - start
+    return asdict(result)
+
+
+# === 汇总 ===
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    finished = [r for r in results if not r.get("error")]
+    wall_times = [r["wall_time"] for r in results]
+    turn_latencies = [t for r in results for t in r.get("turn_latencies", [])]
+    total = len(results)
+    prompt_bytes = sum(r.get("prompt_bytes", 0) for r in results)
+    return {
+        "episodes": total,
+        "errors": total - len(finished),
+        "success_rate": sum(1 for r in results if r["won"]) / total if total else 0.0,
+        "mean_steps": sum(r["steps"] for r in results) / total if total else 0.0,
+        "mean_reward": sum(r["reward"] for r in results) / total if total else 0.0,
+        "prompt_tokens": sum(r["prompt_tokens"] for r in results),
+        "completion_tokens": sum(r["completion_tokens"] for r in results),
+        "prefix_reuse": sum(r.get("prefix_bytes", 0) for r in results) / prompt_bytes if prompt_bytes else 0.0,
+        "episode_wall_time": {f"p{q}": percentile(wall_times, q) for q in (50, 90, 99)},
+        "turn_latency": {f"p{q}": percentile(turn_latencies, q) for q in (50, 90, 99)},
+    }
+
+
+def evaluate(episodes: int, output: str, workers: Optional[int] = None, max_steps: int = DEFAULT_MAX_STEPS,
+             seed: int = 0, model: Optional[str] = None, base_url: Optional[str] = None,
+             mock: bool = False, prompt_layout: Optional[str] = None) -> Dict[str, Any]:
+    """并行执行 episodes 局游戏，结果逐行写入 output，返回汇总统计"""
+    workers = workers or os.cpu_count() or 1
+    results: List[Dict[str, Any]] = []
+    with open(output, "w", encoding="utf-8") as out, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(model, base_url, mock, prompt_layout)) as pool:
+        futures = [pool.submit(run_episode, episode, seed + episode, max_steps) for episode in range(episodes)]
+        for future in as_completed(futures):
+            record = future.result()
+            results.append(record)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            status = "WON " if record["won"] else ("ERR " if record["error"] else "LOST")
+            print(f"[eval] {len(results)}/{episodes} episode={record['episode']} {status} "
+                  f"steps={record['steps']} wall={record['wall_time']:.1f}s")
+    return summarize(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并行评测 ALFworldProgram")
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认使用全部 CPU")
+    parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS, help="每局最多的模型回合数")
+    parser.add_argument("--seed", type=int, default=0, help="第 i 局使用 seed + i")
+    parser.add_argument("--output", default="eval_results.jsonl")
+    parser.add_argument("--model", default=None, help="api_config.yaml 中的模型名")
+    parser.add_argument("--base-url", default=None, help="覆盖 API 地址（例如模拟服务）")
+    parser.add_argument("--mock", action="store_true", help="使用进程内的模拟模型")
+    parser.add_argument("--prompt-layout", default=None, choices=["windows", "prefix_stable"],
+                        help="消息布局，见 PromptMainBoard.set_prompt_layout")
+    args = parser.parse_args(argv)
+
+    summary = evaluate(args.episodes, args.output, workers=args.workers, max_steps=args.max_steps,
+                       seed=args.seed, model=args.model, base_url=args.base_url, mock=args.mock,
+                       prompt_layout=args.prompt_layout)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return summary
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass, field, is_dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from llmos_core.cache import CacheManager
+from llmos_core.Prompts.PromptMainBoard import PromptMainBoard, parse_response
+from llmos_core.schema import LLMOSCall, ToolCallResult
+
+
+def to_jsonable(obj: Any) -> Any:
+    """把消息 / dataclass / pydantic 对象转换为可以写入 JSON 的结构"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json", exclude_none=True)
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return to_jsonable(asdict(obj))
+    if isinstance(obj, dict):
+        return {str(key): to_jsonable(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(item) for item in obj]
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return str(obj)
+
+
+class TurnRecorder:
+    """
+    完整录制每个模型回合（基于 JSONL 的 CacheManager）：
+        prompt:   {"messages": [...], "tools": [...]}                 组装好的请求
+        response: {"message": {"content", "tool_calls"}, "results": [...]}  模型原始消息与各 handler 的执行结果
+    旧版只记录 response_text 的缓存（response 为字符串）同样可以读取。
+
+    用法：
+        recorder.begin_turn(board)
+        ... 请求模型并分发 ...
+        recorder.end_turn(chat_kwargs, message)
+    """
+
+    def __init__(self, cache_file: Union[str, Path], clear: bool = True, legacy_file: Union[str, Path, None] = None):
+        """
+        :param legacy_file: 旧版 JSON 数组格式的录制文件，cache_file 为空时从中迁移（见 CacheManager）
+        """
+        self.cache = CacheManager(Path(cache_file), clear_cache_file=clear, legacy_file=legacy_file)
+        self._board: Optional[PromptMainBoard] = None
+        self._results: List[ToolCallResult] = []
+
+    def __len__(self):
+        return len(self.cache)
+
+    def begin_turn(self, board: PromptMainBoard):
+        """开始收集本回合的 handler 结果"""
+        self._detach()
+        self._results = []
+        self._board = board
+        board.add_call_listener(self._results.append)
+
+    def end_turn(self, chat_kwargs: Dict[str, Any], message: Any):
+        """写入一条完整的回合记录"""
+        results = self._results
+        self._detach()
+        prompt = {
+            "messages": to_jsonable(chat_kwargs.get("messages", [])),
+            "tools": to_jsonable(chat_kwargs.get("tools") or []),
+        }
+        response = {
+            "message": to_jsonable(message),
+            "results": to_jsonable(results),
+        }
+        self.cache.append_record(prompt, response)
+
+    def _detach(self):
+        if self._board is not None:
+            self._board.remove_call_listener(self._results.append)
+            self._board = None
+
+    def next_turn(self) -> Optional[Dict[str, Any]]:
+        return self.cache.next_record()
+
+    def get_turn(self, index: int) -> Dict[str, Any]:
+        return self.cache.get_record(index)
+
+    def reset(self):
+        self.cache.reset()
+
+    def close(self):
+        self._detach()
+        self.cache.close()
+
+
+def recorded_message(record: Dict[str, Any]) -> Dict[str, Any]:
+    """取出记录中的模型消息（兼容只记录了 response_text 的旧格式）"""
+    response = record.get("response")
+    if isinstance(response, dict) and "message" in response:
+        return response["message"] or {}
+    return {"role": "assistant", "content": response or ""}
+
+
+def parse_recorded_calls(record: Dict[str, Any]) -> List[Any]:
+    """
+    还原一条记录中待分发的调用。
+    完整格式的记录直接使用录制的执行结果（func_name / call_kwargs）：与实时回合实际执行的调用一致，
+    包括经大模型修复的 JSON，以及没有调用的纯文本回合。
+    旧格式的记录才重新解析模型消息：原生 tool_calls 优先，否则解析 content 中的 JSON（失败时抛出 ValueError）。
+    """
+    message = recorded_message(record)
+    response = record.get("response")
+    if isinstance(response, dict) and isinstance(response.get("results"), list):
+        default_type = "tool" if message.get("tool_calls") else "prompt"
+        return [
+            LLMOSCall(
+                call_type=result.get("call_type") or default_type,
+                func_name=result.get("func_name", ""),
+                kwargs=result.get("call_kwargs") or {},
+                reasoning=result.get("reasoning") or "",
+            )
+            for result in response["results"]
+        ]
+    tool_calls = message.get("tool_calls")
+    if tool_calls:
+        return [
+            LLMOSCall(
+                call_type="tool",
+                func_name=tc["function"]["name"],
+                kwargs=json.loads(tc["function"].get("arguments") or "{}"),
+            )
+            for tc in tool_calls
+        ]
+    content = message.get("content") or ""
+    if not content.strip():
+        return []
+    # 回放时不允许调用大模型修复
+    return parse_response(content, retry_fix=0)
+
+
+def _recorded_calls(board: PromptMainBoard, record: Dict[str, Any], auto_record: bool = True) -> List[Any]:
+    """parse_recorded_calls 解析失败时与 apply_response 一样记录错误，本回合不执行任何调用"""
+    try:
+        return parse_recorded_calls(record)
+    except Exception as e:
+        if auto_record:
+            board.record_parse_error(recorded_message(record).get("content") or "", e)
+        return []
+
+
+def replay_turn(board: PromptMainBoard, record: Dict[str, Any], auto_record: bool = True) -> List[ToolCallResult]:
+    """将一条记录的调用经 handle_call 重新执行，返回各调用的结果"""
+    calls = _recorded_calls(board, record, auto_record)
+    return [board.handle_call(call, auto_record=auto_record) for call in calls]
+
+
+@dataclass
+class TurnTiming:
+    """单个回合各阶段的 CPU 耗时（毫秒）"""
+    index: int
+    calls: int
+    assemble_ms: float
+    parse_ms: float
+    dispatch_ms: float
+    snapshot_ms: float
+    mismatches: int = 0
+
+    @property
+    def total_ms(self) -> float:
+        return self.assemble_ms + self.parse_ms + self.dispatch_ms + self.snapshot_ms
+
+
+@dataclass
+class ReplayReport:
+    turns: List[TurnTiming] = field(default_factory=list)
+
+    PHASES = ("assemble_ms", "parse_ms", "dispatch_ms", "snapshot_ms", "total_ms")
+
+    def summary(self) -> Dict[str, Any]:
+        """各阶段的 mean / p50 / max，以及调用数与结果不一致数"""
+        result: Dict[str, Any] = {
+            "turns": len(self.turns),
+            "calls": sum(turn.calls for turn in self.turns),
+            "mismatches": sum(turn.mismatches for turn in self.turns),
+        }
+        for phase in self.PHASES:
+            values = [getattr(turn, phase) for turn in self.turns] or [0.0]
+            result[phase] = {
+                "mean": statistics.fmean(values),
+                "p50": statistics.median(values),
+                "max": max(values),
+            }
+        return result
+
+    def format_table(self) -> str:
+        lines = [f"{'turn':>5} {'calls':>5} {'assemble':>10} {'parse':>10} {'dispatch':>10} {'snapshot':>10} {'total':>10}"]
+        for t in self.turns:
+            lines.append(f"{t.index:>5} {t.calls:>5} {t.assemble_ms:>10.3f} {t.parse_ms:>10.3f} "
+                         f"{t.dispatch_ms:>10.3f} {t.snapshot_ms:>10.3f} {t.total_ms:>10.3f}")
+        summary = self.summary()
+        lines.append(f"{'mean':>5} {summary['calls']:>5} " + " ".join(
+            f"{summary[phase]['mean']:>10.3f}" for phase in self.PHASES))
+        return "\n".join(lines)
+
+
+def replay_recording(board: PromptMainBoard, recorder: TurnRecorder, snapshot: bool = True,
+                     verify: bool = False, auto_record: bool = True) -> ReplayReport:
+    """
+    不请求模型，全速回放录制的所有回合，统计框架自身每回合的 CPU 开销：
+        assemble  组装消息与 tools
+        parse     还原调用（完整格式的记录取录制的调用，旧格式解析 tool_calls 参数 / content 中的 JSON）
+        dispatch  经 handle_call 执行全部调用
+        snapshot  生成窗口快照
+    verify=True 时逐个比较执行结果与录制结果（状态与返回值），不一致的数目记入 mismatches。
+    board 应处于录制开始时的初始状态（例如新建的 Program）。
+    """
+    report = ReplayReport()
+    clock = time.process_time
+    recorder.reset()
+    while (record := recorder.next_turn()) is not None:
+        t0 = clock()
+        board.assemble_messages()
+        board.get_all_tools()
+        t1 = clock()
+        calls = _recorded_calls(board, record, auto_record)
+        t2 = clock()
+        results = [board.handle_call(call, auto_record=auto_record) for call in calls]
+        t3 = clock()
+        if snapshot:
+            board.get_divided_snapshot()
+        t4 = clock()
+
+        mismatches = 0
+        if verify:
+            recorded = (record.get("response") or {}).get("results") if isinstance(record.get("response"), dict) else None
+            if recorded is not None:
+                replayed = to_jsonable(results)
+                mismatches = sum(
+                    1 for old, new in zip(recorded, replayed)
+                    if (old.get("status"), old.get("result")) != (new.get("status"), new.get("result"))
+                ) + abs(len(recorded) - len(replayed))
+
+        report.turns.append(TurnTiming(
+            index=record["index"],
+            calls=len(calls),
+            assemble_ms=(t1 - t0) * 1000,
+            parse_ms=(t2 - t1) * 1000,
+            dispatch_ms=(t3 - t2) * 1000,
+            snapshot_ms=(t4 - t3) * 1000,
+            mismatches=mismatches,
+        ))
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import llmos_core.Program as programs
+
+    parser = argparse.ArgumentParser(description="回放录制的回合并统计框架开销")
+    parser.add_argument("recording", help="录制文件（JSONL）")
+    parser.add_argument("--program", default="ChatProgram", help="用于回放的 Program 类名")
+    parser.add_argument("--verify", action="store_true", help="比较回放结果与录制结果")
+    args = parser.parse_args()
+
+    program = getattr(programs, args.program)()
+    replay_report = replay_recording(program.promptMainBoard, TurnRecorder(args.recording, clear=False),
+                                     verify=args.verify)
+    print(replay_report.format_table())
+    print(json.dumps(replay_report.summary(), indent=2, ensure_ascii=False))
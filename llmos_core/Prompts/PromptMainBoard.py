@@ -1,11 +1,11 @@
 import json
-from dataclasses import asdict
+from dataclasses import asdict, dataclass
 from collections.abc import Iterable
 from typing import List
 
 from llmos_core.Prompts.Windows import BasePromptWindow,FlowStackPromptWindow
 from llmos_core.Prompts.Windows.BaseWindow import NullSystemWindow
-from typing import List, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from llmos_core.Prompts.Windows.stack_window import StackPromptWindow
 from llmos_core.logger import LogEvent, RecordType
@@ -17,10 +17,46 @@ NEEDKEYS = ["call_type", "func_name"]
 
 from llmos_core.llmos_util.api_client import LLMMessage, LLMClient
 from llmos_core.Prompts.Windows.Window_register import get_window_type
+from llmos_core.Prompts.json_repair import repair_json_locally, record_parse_path
+from llmos_core.Prompts.token_budget import BudgetReport, TokenBudget, estimate_tokens, estimate_tools_tokens
 
+import os
 import re
 import json
 
+# 消息布局，见 PromptMainBoard.set_prompt_layout
+LAYOUT_WINDOWS = "windows"
+LAYOUT_PREFIX_STABLE = "prefix_stable"
+PROMPT_LAYOUTS = (LAYOUT_WINDOWS, LAYOUT_PREFIX_STABLE)
+DEFAULT_PROMPT_LAYOUT = os.getenv("LLMOS_PROMPT_LAYOUT", LAYOUT_WINDOWS)
+
+# 窗口的渲染部分
+RENDER_FULL = "full"
+RENDER_META = "meta"
+RENDER_STATE = "state"
+
+
+@dataclass
+class PrefixReport:
+    prefix_bytes: int  # 与上一轮提示词逐字节相同的前缀长度
+    total_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        return self.prefix_bytes / self.total_bytes if self.total_bytes else 0.0
+
+
+def shared_prefix_length(a: bytes, b: bytes) -> int:
+    """两个字节串的公共前缀长度（二分查找，比较在 C 层完成）"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
 def repair_json_with_llm(bad_json_str: str, error_msg: str = "", retry_count: int = 1) -> str:
     """
     使用大模型修复损坏的 JSON 字符串。
@@ -92,12 +128,33 @@ def repair_json_with_llm(bad_json_str: str, error_msg: str = "", retry_count: in
             continue
     return bad_json_str
 
+def _is_call(item) -> bool:
+    return isinstance(item, dict) and bool(item.get("func_name"))
+
+
+def select_repaired_calls(data) -> Optional[list]:
+    """
+    从本地修复的结果中挑出 Syscall：顶层的调用对象，以及全部由调用对象组成的数组。
+    说明文字中被当作 JSON 的值（例如 "[step 1]"）被跳过；没有任何调用时返回 None。
+    """
+    calls = []
+    for item in data if isinstance(data, list) else [data]:
+        if _is_call(item):
+            calls.append(item)
+        elif isinstance(item, list) and item and all(_is_call(sub) for sub in item):
+            calls.extend(item)
+    return calls or None
+
+
 def parse_response(response_text: str, retry_fix: int = 1):
     """
     最稳妥的解析策略：
     1. 尝试原始字符串。
     2. 尝试去除 Markdown 标记后解析。
-    3. 如果都失败，尝试使用 LLM 修复。
+    3. 本地确定性修复（单引号、尾随逗号、未闭合括号等），不发起网络请求；
+       只采用其中带 func_name 的调用，一个调用都没有时视为修复失败。
+    4. 如果都失败，尝试使用 LLM 修复。
+    各路径的命中次数可通过 get_repair_stats() 查看。
     """
     cleaned_text = response_text.strip()
     last_error = ""
@@ -116,14 +173,31 @@ def parse_response(response_text: str, retry_fix: int = 1):
 
     # 第一步：直接尝试
     data = _try_parse(cleaned_text)
+    if data is not None:
+        record_parse_path("direct")
 
-    # 第二步：如果失败，尝试使用 LLM 修复
+    # 第二步：本地修复
+    if data is None:
+        repaired_text = repair_json_locally(cleaned_text)
+        if repaired_text is not None:
+            data = _try_parse(repaired_text)
+            if data is not None:
+                data = select_repaired_calls(data)
+                if data is None:
+                    last_error = "no syscall with func_name found in the repaired JSON"
+            if data is not None:
+                record_parse_path("local")
+
+    # 第三步：如果失败，尝试使用 LLM 修复
     if data is None and retry_fix > 0:
         repaired_text = repair_json_with_llm(cleaned_text, error_msg=last_error, retry_count=retry_fix)
         data = _try_parse(repaired_text)
+        if data is not None:
+            record_parse_path("llm")
 
-    # 第三步：如果依然失败，报错
+    # 第四步：如果依然失败，报错
     if data is None:
+        record_parse_path("failed")
         raise ValueError(f"JSON 解析失败: {last_error}。原始文本片段: {response_text[:100]}...")
 
     if isinstance(data, dict):
@@ -138,30 +212,163 @@ class PromptMainBoard:
         self.user_windows:List[BasePromptWindow] = []
         self.system_windows:List[BasePromptWindow] = []
         self.handlers = {}
+        # handler 名 -> 所属窗口，用于在调用时标记对应窗口为脏
+        self._handler_owners: Dict[str, BasePromptWindow] = {}
+        # (id(window), 压缩级别, 渲染部分) -> (version, 文本)，干净窗口直接复用
+        self._render_cache: Dict[Tuple[int, int, str], Tuple[int, Optional[str]]] = {}
+        # 编译好的 OpenAI tools 列表，窗口集合与元数据不变时复用同一个对象
+        self._tools_cache: Optional[List[dict]] = None
+        self._tools_cache_key: Optional[tuple] = None
+        self._call_listeners: List[Callable[[ToolCallResult], None]] = []
+        # token 预算：上限为 None 时不做任何压缩；assemble_messages(max_tokens=...) 可按模型覆盖
+        self.token_budget = TokenBudget()
+        # (id(window), 压缩级别, 渲染部分) -> (version, token 数)
+        self._token_cache: Dict[Tuple[int, int, str], Tuple[int, Optional[int]]] = {}
+        self._tools_tokens: Optional[Tuple[List[dict], int]] = None
+        self.last_budget_report: Optional[BudgetReport] = None
+        # 消息布局（见 set_prompt_layout），以及与上一轮提示词的公共前缀统计
+        self.prompt_layout = DEFAULT_PROMPT_LAYOUT
+        self._last_prompt_bytes: bytes = b""
+        self.last_prefix_report: Optional[PrefixReport] = None
+
+    def set_prompt_layout(self, layout: str):
+        """
+        切换消息布局：
+            LAYOUT_WINDOWS        系统窗口一条 system 消息，每个用户窗口（META + STATE）一条 user 消息
+            LAYOUT_PREFIX_STABLE  按从静态到易变排列：系统窗口与全部用户窗口的 META 合并为 system 消息，
+                                  之后按 prompt_volatility 升序输出各窗口的 STATE，且状态中不输出挂钟时间戳。
+                                  连续回合之间的公共前缀更长，更容易命中服务端的前缀缓存
+        """
+        if layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unknown prompt layout '{layout}', expected one of {PROMPT_LAYOUTS}")
+        self.prompt_layout = layout
+        for window in self.system_windows + self.user_windows:
+            self._apply_layout(window)
+
+    def _apply_layout(self, window: BasePromptWindow):
+        render_timestamps = self.prompt_layout != LAYOUT_PREFIX_STABLE
+        if window.render_timestamps != render_timestamps:
+            window.render_timestamps = render_timestamps
+            window.mark_dirty()
+
+    def assemble_messages(self, max_tokens: Optional[int] = None) -> List[LLMMessage]:
+        """
+        将窗口转化为消息列表格式（仅重新渲染版本号变化过的窗口），布局见 set_prompt_layout
+        :param max_tokens: 提示词的 token 上限（含 tools），默认使用 self.token_budget.max_tokens；
+                           超出时按各窗口的优先级逐级压缩，分配结果记录在 last_budget_report
+        """
+        # meta_file 被编辑时重新加载并提升版本号（每回合每个窗口只检查一次），
+        # 并在渲染之前换入窗口的后台任务结果
+        for window in self.system_windows + self.user_windows:
+            window.refresh_meta()
+            window.begin_turn()
+
+        prefix_stable = self.prompt_layout == LAYOUT_PREFIX_STABLE
+        user_part = RENDER_STATE if prefix_stable else RENDER_FULL
+        user_windows = self.user_windows
+        if prefix_stable:
+            # sorted 是稳定排序，易变程度相同的窗口保持注册顺序
+            user_windows = sorted(user_windows, key=lambda window: window.prompt_volatility)
 
-    def assemble_messages(self) -> List[LLMMessage]:
-        """将窗口转化为消息列表格式"""
         messages = []
-        # 系统窗口
-        system_content = "".join([window.forward() for window in self.system_windows])
+        # 系统窗口（前缀稳定布局下还包括全部用户窗口的 META）
+        system_parts = [self._render_window(window) for window in self.system_windows]
+        if prefix_stable:
+            system_parts += [self._render_window(window, part=RENDER_META) for window in user_windows]
+        system_content = "".join(system_parts)
         if system_content:
             messages.append(LLMMessage(role="system", content=system_content))
 
+        levels = {}
+        if max_tokens is not None or self.token_budget.max_tokens is not None:
+            fixed_tokens = estimate_tokens(system_content) + self._estimate_tools_tokens()
+            report = self.token_budget.fit(user_windows, lambda window, level: self._measure_window(window, level, user_part),
+                                           fixed_tokens=fixed_tokens, max_tokens=max_tokens)
+            levels = {id(window): usage.level for window, usage in zip(user_windows, report.windows)}
+            self.last_budget_report = report
+
         # 用户窗口
-        for window in self.user_windows:
-            content = window.forward()
+        for window in user_windows:
+            content = self._render_window(window, levels.get(id(window), 0), user_part)
             if content:
                 messages.append(LLMMessage(role="user", content=content))
+
+        self._record_prefix(messages)
         return messages
 
+    def _record_prefix(self, messages: List[LLMMessage]):
+        """统计本轮提示词与上一轮逐字节相同的前缀长度（tools 不变时即服务端可复用的前缀）"""
+        prompt_bytes = "".join(f"<{message.role}>{message.content}" for message in messages).encode("utf-8")
+        self.last_prefix_report = PrefixReport(
+            prefix_bytes=shared_prefix_length(prompt_bytes, self._last_prompt_bytes),
+            total_bytes=len(prompt_bytes),
+        )
+        self._last_prompt_bytes = prompt_bytes
+
+    def _render_window(self, window: BasePromptWindow, level: int = 0, part: str = RENDER_FULL) -> Optional[str]:
+        """
+        渲染窗口（level 为压缩级别，part 为 RENDER_FULL / RENDER_META / RENDER_STATE）；
+        窗口版本号未变化时复用上一次的结果。无法压缩到 level 时返回 None。
+        """
+        cache_key = (id(window), level, part)
+        cached = self._render_cache.get(cache_key)
+        if cached is not None and cached[0] == window.version:
+            return cached[1]
+        if part == RENDER_META:
+            content = window.forward_meta()
+        elif part == RENDER_STATE:
+            content = window.forward_state(level)
+        else:
+            content = window.forward_compact(level)
+        self._render_cache[cache_key] = (window.version, content)
+        return content
+
+    def _measure_window(self, window: BasePromptWindow, level: int, part: str = RENDER_FULL) -> Optional[int]:
+        """窗口在压缩级别 level 下的 token 数，无法压缩到该级别时为 None"""
+        cache_key = (id(window), level, part)
+        cached = self._token_cache.get(cache_key)
+        if cached is not None and cached[0] == window.version:
+            return cached[1]
+        content = self._render_window(window, level, part)
+        tokens = None if content is None else estimate_tokens(content)
+        self._token_cache[cache_key] = (window.version, tokens)
+        return tokens
+
+    def _estimate_tools_tokens(self) -> int:
+        tools = self.get_all_tools()
+        # get_all_tools() 在工具集合不变时返回同一个列表对象
+        if self._tools_tokens is None or self._tools_tokens[0] is not tools:
+            self._tools_tokens = (tools, estimate_tools_tokens(tools))
+        return self._tools_tokens[1]
+
+    def _mark_dirty(self, func_name: str):
+        """handler 即将修改其所属窗口的状态，提前使该窗口的缓存失效"""
+        owner = self._handler_owners.get(func_name)
+        if owner is not None:
+            owner.mark_dirty()
+
+    def mark_all_dirty(self):
+        """使所有窗口的 forward 缓存失效（如程序整体 reset 后）"""
+        for window in self.system_windows + self.user_windows:
+            window.mark_dirty()
+
     def get_all_tools(self) -> List[dict]:
-        """收集所有窗口提供的外部工具定义"""
-        all_tools = []
-        # 遍历所有窗口，收集工具
-        for win in self.system_windows + self.user_windows:
-            for tool_def in win.get_tool_definitions():
-                all_tools.append(tool_def.to_openai_tool())
-        return all_tools
+        """
+        收集所有窗口提供的外部工具定义。
+        结果只在窗口增删或某个窗口的元数据重新加载后才重新编译，
+        其余时候返回同一个列表对象（稳定的 tools 也有利于服务端的前缀缓存命中）。
+        """
+        windows = self.system_windows + self.user_windows
+        cache_key = tuple((id(win), win.meta_revision) for win in windows)
+        if self._tools_cache is None or cache_key != self._tools_cache_key:
+            all_tools = []
+            # 遍历所有窗口，收集工具
+            for win in windows:
+                for tool_def in win.get_tool_definitions():
+                    all_tools.append(tool_def.to_openai_tool())
+            self._tools_cache = all_tools
+            self._tools_cache_key = cache_key
+        return self._tools_cache
 
     def apply_response(self, response: str, auto_record=True):
         """解析模型在 content 中生成的 JSON Syscall"""
@@ -172,14 +379,18 @@ class PromptMainBoard:
                 self.handle_call(call, auto_record)
         except Exception as e:
             if auto_record:
-                log_event = LogEvent(
-                    event_type=RecordType.error,
-                    error=str(e),
-                    raw_response=response
-                )
-                self._submit_event(log_event)
+                self.record_parse_error(response, e)
         return calls
 
+    def record_parse_error(self, response: str, error: Exception):
+        """把无法解析的模型回复作为错误事件写入执行历史"""
+        log_event = LogEvent(
+            event_type=RecordType.error,
+            error=str(error),
+            raw_response=response
+        )
+        self._submit_event(log_event)
+
     def register_windows(
             self,
             user_windows: Union[List[BasePromptWindow], BasePromptWindow, None] = None,
@@ -193,7 +404,11 @@ class PromptMainBoard:
 
         def _register(target_list, win):
             target_list.append(win)
-            self.handlers.update(win.export_handlers() or {})
+            self._apply_layout(win)
+            win_handlers = win.export_handlers() or {}
+            self.handlers.update(win_handlers)
+            for name in win_handlers:
+                self._handler_owners[name] = win
 
         def _ensure_list(obj):
             if obj is None:
@@ -208,8 +423,25 @@ class PromptMainBoard:
         for sys_win in _ensure_list(system_windows):
             _register(self.system_windows, sys_win)
 
+        # 窗口集合变化，工具表需要重新编译
+        self._tools_cache = None
+
+    def add_call_listener(self, listener: Callable[[ToolCallResult], None]):
+        """注册调用监听器：每次 handle_call 执行完毕后以 ToolCallResult 回调（用于录制等）"""
+        self._call_listeners.append(listener)
+
+    def remove_call_listener(self, listener: Callable[[ToolCallResult], None]):
+        if listener in self._call_listeners:
+            self._call_listeners.remove(listener)
+
     def handle_call(self, call_data: Union[dict, LLMOSCall], auto_record=True) -> ToolCallResult:
         """统一分发到对应窗口的 handler"""
+        result = self._handle_call(call_data, auto_record)
+        for listener in self._call_listeners:
+            listener(result)
+        return result
+
+    def _handle_call(self, call_data: Union[dict, LLMOSCall], auto_record=True) -> ToolCallResult:
         # 如果输入是字典，转换为 LLMOSCall dataclass
         if isinstance(call_data, dict):
             call = LLMOSCall(
@@ -233,6 +465,7 @@ class PromptMainBoard:
             event_type = RecordType.error
 
         if func_name in self.handlers:
+            self._mark_dirty(func_name)
             try:
                 result = self.handlers[func_name](**kwargs)
 
@@ -249,7 +482,8 @@ class PromptMainBoard:
                     result=result,
                     summary=summary,
                     call_kwargs=kwargs,
-                    status="success"
+                    status="success",
+                    call_type=call_type_str
                 )
 
                 if auto_record:
@@ -271,7 +505,8 @@ class PromptMainBoard:
                     reasoning=reasoning,
                     result=str(e),
                     call_kwargs=kwargs,
-                    status="error"
+                    status="error",
+                    call_type=call_type_str
                 )
                 if auto_record:
                     error_log = LogEvent(
@@ -295,7 +530,8 @@ class PromptMainBoard:
                     status="error_not_found"
                 )
                 self._submit_event(not_found_log)
-            return ToolCallResult(func_name=func_name, result=msg, status="error")
+            return ToolCallResult(func_name=func_name, result=msg, call_kwargs=kwargs, status="error",
+                                  call_type=call_type_str)
 
     def _submit_event(self, log_event:LogEvent):
         """
@@ -306,6 +542,7 @@ class PromptMainBoard:
         for window in self.user_windows:
             if isinstance(window, FlowStackPromptWindow):
                 window.record_event(log_event)
+                window.mark_dirty()
                 break
 
     def get_divided_snapshot(self):
@@ -1,8 +1,7 @@
 import json
-from typing import List
+from typing import List, Optional
 from llmos_core.Prompts.Windows.BaseWindow import BasePromptWindow
 from llmos_core.schema import ToolDefinition
-from alfworld.agents.environment import get_environment
 import yaml
 import os
 import traceback
@@ -17,28 +16,56 @@ META_FILE = META_DIR / 'alfworld_description.json'
 
 # 最多保留最近 N 步的历史（防止 prompt 无限增长）
 OBS_HISTORY_MAXLEN = 10
+# token 预算不足时的压缩级别：依次保留的历史条数（可选命令列表始终保留）
+OBS_COMPACT_STEPS = (OBS_HISTORY_MAXLEN, 5, 3, 1)
 
 
-class ALFworldWindow(BasePromptWindow):
-    def __init__(self, window_title='ALFWorld'):
-        super().__init__(window_title=window_title, meta_file=META_FILE)
+def load_alfworld_config() -> dict:
+    """加载 ALFWorld 配置，失败时返回空配置"""
+    config_path = os.path.join("/root/PycharmProjects/alfworld/configs", "base_config.yaml")
+    try:
+        with open(config_path, 'r') as f:
+            return yaml.safe_load(f)
+    except Exception as e:
+        print(f"Error loading config file: {e}")
+        return {}
 
-        # 加载配置
-        config_path = os.path.join("/root/PycharmProjects/alfworld/configs", "base_config.yaml")
-        try:
-            with open(config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
-        except Exception as e:
-            print(f"Error loading config file: {e}")
-            self.config = {}
 
-        # 初始化环境
-        EnvClass = get_environment('AlfredTWEnv')
-        uninitialized_env = EnvClass(self.config, train_eval='train')
-        self.env = uninitialized_env.init_env(batch_size=1)
+def create_alfworld_env(config: dict, batch_size: int = 1):
+    """创建 AlfredTWEnv，batch_size > 1 时一个环境对象同时驱动多局游戏"""
+    # 用到时才导入 alfworld：环境池、批量环境及其测试（使用假环境）不依赖 alfworld
+    from alfworld.agents.environment import get_environment
+    EnvClass = get_environment('AlfredTWEnv')
+    uninitialized_env = EnvClass(config, train_eval='train')
+    return uninitialized_env.init_env(batch_size=batch_size)
 
-        # 首次重置
-        obs_batch, self.info = self.env.reset()
+
+class ALFworldWindow(BasePromptWindow):
+    # 当前观察与可选命令是决策所必需的，最后才被压缩
+    budget_priority = 90
+    budget_min_share = 0.2
+    prompt_volatility = 80
+
+    def __init__(self, window_title='ALFWorld', batch_env=None, slot=0):
+        """
+        :param batch_env: 可选的 BatchedALFworldEnv；给定时本窗口只驱动其中第 slot 局游戏。
+                          否则从进程级环境池 (env_pool) 中取出一个已预热的环境。
+        """
+        super().__init__(window_title=window_title, meta_file=META_FILE)
+        self._env_pool = None
+        # seed() 设置后，reset 会在当前环境上按该种子重置（用于可复现的评测）
+        self._seed = None
+
+        # 初始化环境（首次重置已由环境池或这里完成）
+        if batch_env is not None:
+            self.config = batch_env.config
+            self.env = batch_env.slot_env(slot)
+            obs_batch, self.info = self.env.reset()
+        else:
+            from .env_pool import get_env_pool
+            self._env_pool = get_env_pool()
+            self.config = self._env_pool.config
+            self.env, (obs_batch, self.info) = self._env_pool.acquire()
         self.obs = obs_batch[0] if isinstance(obs_batch, (list, tuple)) else obs_batch
 
         # 状态变量
@@ -77,10 +104,15 @@ class ALFworldWindow(BasePromptWindow):
     def forward(self, *args, **kwargs):
         return super().forward()
 
-    def _render_obs_history(self) -> str:
-        """将观察历史渲染为易读的累加格式。"""
+    def _render_obs_history(self, limit: Optional[int] = None) -> str:
+        """将观察历史渲染为易读的累加格式；limit 为保留的最近条数。"""
         lines = []
-        for i, (action, obs, reward) in enumerate(self._obs_history):
+        history = list(self._obs_history)
+        start = 0
+        if limit is not None and len(history) > limit:
+            start = len(history) - limit
+            lines.append(f"  ... ({start} earlier steps omitted)")
+        for i, (action, obs, reward) in enumerate(history[start:], start):
             clean_obs = obs.strip().replace('\n', ' ')
             if i == 0 and action is None:
                 # 初始观察
@@ -92,6 +124,15 @@ class ALFworldWindow(BasePromptWindow):
         return "\n".join(lines)
 
     def export_state_prompt(self) -> str:
+        return self._render_state()
+
+    def export_compact_state_prompt(self, level: int) -> Optional[str]:
+        """逐级减少保留的观察历史"""
+        if level >= len(OBS_COMPACT_STEPS):
+            return None
+        return self._render_state(OBS_COMPACT_STEPS[level])
+
+    def _render_state(self, history_limit: Optional[int] = None) -> str:
         cmds = self.info.get("admissible_commands")[0]
         self.admissible_cmds = cmds
         won = self.info.get("won")[0]
@@ -100,7 +141,7 @@ class ALFworldWindow(BasePromptWindow):
         return f"""
 {status_line}
 ### RECENT OBSERVATION HISTORY ###
-{self._render_obs_history()}
+{self._render_obs_history(history_limit)}
 
 ### ADMISSIBLE COMMANDS ###
 {", ".join(self.admissible_cmds)}
@@ -162,9 +203,33 @@ class ALFworldWindow(BasePromptWindow):
             '__summary__': summary
         }
 
+    def seed(self, seed):
+        """固定之后每次 reset 使用的种子；传入 None 恢复为从环境池换取新游戏"""
+        self._seed = seed
+
+    def release_env(self):
+        """把环境归还给环境池（批量模式下无操作）"""
+        if self._env_pool is not None and self.env is not None:
+            self._env_pool.release(self.env)
+            self.env = None
+
+    def close(self):
+        self.release_env()
+
     def reset(self):
-        """重置 ALFWorld 环境和内部状态"""
-        obs_batch, self.info = self.env.reset()
+        """
+        重置 ALFWorld 环境和内部状态。
+        使用环境池时，归还当前环境并换取一个已在后台 reset 好的环境，不必等待加载新游戏。
+        """
+        if self._env_pool is not None and self._seed is None:
+            self.release_env()
+            self.env, (obs_batch, self.info) = self._env_pool.acquire()
+        else:
+            if self.env is None:
+                self.env, _ = self._env_pool.acquire()
+            if self._seed is not None and hasattr(self.env, "seed"):
+                self.env.seed(self._seed)
+            obs_batch, self.info = self.env.reset()
         self.obs = obs_batch[0] if isinstance(obs_batch, (list, tuple)) else obs_batch
         self.admissible_cmds = self.info.get("admissible_commands", [])
         self.last_action = None
@@ -1 +1,2 @@
-from .ALFworldWindow import ALFworldWindow
\ No newline at end of file
+from .ALFworldWindow import ALFworldWindow
+from .batched_env import BatchedALFworldEnv
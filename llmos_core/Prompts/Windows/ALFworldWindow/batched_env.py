@@ -0,0 +1,135 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .ALFworldWindow import create_alfworld_env, load_alfworld_config
+
+# 本轮没有提交动作的游戏执行的占位动作（不会改变游戏状态）
+IDLE_ACTION = "look"
+
+
+def _slot_info(info: Dict[str, Any], slot: int) -> Dict[str, List[Any]]:
+    """从批量 info（键 -> 每局的值列表）中取出某一局，仍以单元素列表表示，与 batch_size=1 时的格式一致"""
+    sliced = {}
+    for key, values in (info or {}).items():
+        if isinstance(values, (list, tuple)) and len(values) > slot:
+            sliced[key] = [values[slot]]
+        else:
+            sliced[key] = values
+    return sliced
+
+
+class BatchedALFworldEnv:
+    """
+    一个 AlfredTWEnv（init_env(batch_size=N)）同时驱动 N 局游戏。
+
+    每局游戏由一个 ALFworldWindow 通过 slot_env(slot) 驱动，窗口的 env.step([action]) 会进入同步屏障：
+        - begin_turn(slots) 声明本回合参与的游戏
+        - 参与的每一局要么提交动作（step_slot），要么声明本回合结束（end_slot）
+        - 全部到齐后执行一次 env.step([...])，没有提交动作的游戏执行 IDLE_ACTION
+    step_slot 会阻塞到本轮执行完毕，因此各局的分发需要在不同线程中进行。
+    """
+
+    def __init__(self, batch_size: int, config: Optional[dict] = None, env=None):
+        self.batch_size = batch_size
+        self.config = config if config is not None else load_alfworld_config()
+        self.env = env if env is not None else create_alfworld_env(self.config, batch_size=batch_size)
+
+        self._cond = threading.Condition()
+        self._active: set = set()
+        self._pending: Dict[int, str] = {}
+        self._round = 0
+        self._results: Dict[int, Any] = {}
+        self.steps = 0  # 实际执行的 env.step 次数
+
+        self._reset_generation = 0
+        self.obs: Tuple[str, ...] = ()
+        self.info: Dict[str, Any] = {}
+        self.reset()
+
+    # === 批量操作 ===
+    def reset(self):
+        """重置全部游戏（AlfredTWEnv 不支持单独重置某一局）"""
+        with self._cond:
+            obs_batch, self.info = self.env.reset()
+            self.obs = tuple(obs_batch)
+            self._reset_generation += 1
+            self._active.clear()
+            self._pending.clear()
+        return self.obs, self.info
+
+    def seed(self, seed: int):
+        if hasattr(self.env, "seed"):
+            self.env.seed(seed)
+
+    def begin_turn(self, slots: Iterable[int]):
+        """声明本回合参与的游戏"""
+        with self._cond:
+            self._active = set(slots)
+            self._pending.clear()
+
+    def end_slot(self, slot: int):
+        """该局本回合不再提交动作（分发结束或出错时调用）"""
+        with self._cond:
+            self._active.discard(slot)
+            self._pending.pop(slot, None)
+            self._maybe_step_locked()
+
+    def step_slot(self, slot: int, action: str):
+        """提交一局的动作，阻塞到本轮批量执行完毕，返回该局的 (obs, reward, done, info)"""
+        with self._cond:
+            if slot not in self._active:
+                # 没有调用 begin_turn 的单独调用：作为单局回合执行
+                self._active.add(slot)
+            self._pending[slot] = action
+            round_id = self._round
+            self._maybe_step_locked()
+            while self._round == round_id:
+                self._cond.wait()
+            result = self._results[slot]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def _maybe_step_locked(self):
+        if not self._pending or not self._active.issubset(self._pending):
+            return
+        actions = [self._pending.get(slot, IDLE_ACTION) for slot in range(self.batch_size)]
+        submitted = list(self._pending)
+        try:
+            obs_batch, reward_batch, done_batch, info = self.env.step(actions)
+            self.obs = tuple(obs_batch)
+            self.info = info
+            self.steps += 1
+            self._results = {
+                slot: (obs_batch[slot], reward_batch[slot], done_batch[slot], _slot_info(info, slot))
+                for slot in submitted
+            }
+        except Exception as e:
+            self._results = {slot: e for slot in submitted}
+        self._pending.clear()
+        self._round += 1
+        self._cond.notify_all()
+
+    def slot_env(self, slot: int) -> "_SlotEnv":
+        if not 0 <= slot < self.batch_size:
+            raise IndexError(f"slot {slot} out of range for batch size {self.batch_size}")
+        return _SlotEnv(self, slot)
+
+
+class _SlotEnv:
+    """把批量环境中的一局游戏包装成 batch_size=1 的环境接口，供 ALFworldWindow 直接使用"""
+
+    def __init__(self, batch: BatchedALFworldEnv, slot: int):
+        self.batch = batch
+        self.slot = slot
+        self._seen_generation = 0
+
+    def reset(self):
+        if self._seen_generation == self.batch._reset_generation:
+            raise RuntimeError("Games in a batched ALFWorld env are reset together; reset the batched program instead.")
+        self._seen_generation = self.batch._reset_generation
+        return (self.batch.obs[self.slot],), _slot_info(self.batch.info, self.slot)
+
+    def step(self, actions: Sequence[str]):
+        obs, reward, done, info = self.batch.step_slot(self.slot, actions[0])
+        return (obs,), (reward,), (done,), info
@@ -0,0 +1,154 @@
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple
+
+from .ALFworldWindow import create_alfworld_env, load_alfworld_config
+
+# 池中预热（已创建并 reset 完毕）的环境数量，可通过环境变量或 configure_pool() 调整
+ALFWORLD_POOL_SIZE = int(os.getenv("LLMOS_ALFWORLD_POOL_SIZE", "2"))
+
+
+class ALFworldEnvPool:
+    """
+    进程级的 ALFWorld 环境池。
+    创建 AlfredTWEnv 与 reset（加载新游戏）都需要数秒，池在后台线程中提前完成这些工作：
+        - acquire()：取出一个已 reset 的环境及其初始 (obs, info)；池为空时当场创建
+        - release(env)：归还环境，后台线程 reset 后重新放回池中；池未运行或已满时关闭该环境
+    后台线程只由配置池的调用方启动（start() / configure_pool()），acquire() 不会自行启动预热，
+    因此评测进程等不使用预热环境的场景不会在后台额外创建环境。
+    """
+
+    def __init__(self, size: int = ALFWORLD_POOL_SIZE, factory: Optional[Callable[[], Any]] = None):
+        self.size = size
+        self._config = None
+        self._factory = factory or self._create_env
+        self._cond = threading.Condition()
+        self._ready: Deque[Tuple[Any, Tuple[Any, Any]]] = deque()
+        self._dirty: Deque[Any] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        # 统计：命中池 / 当场创建
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def config(self) -> dict:
+        if self._config is None:
+            self._config = load_alfworld_config()
+        return self._config
+
+    def _create_env(self):
+        return create_alfworld_env(self.config, batch_size=1)
+
+    @staticmethod
+    def _close_env(env):
+        """关闭不再放回池中的环境，释放其游戏进程"""
+        close = getattr(env, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            print(f"[env pool] 关闭 ALFWorld 环境失败: {e}")
+
+    def start(self):
+        """启动后台补充线程（幂等），size 为 0 时不启动"""
+        with self._cond:
+            if self._running or self.size <= 0:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._refill_loop, name="alfworld-env-pool", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def configure(self, size: int):
+        surplus = []
+        with self._cond:
+            self.size = size
+            while len(self._ready) > size:
+                surplus.append(self._ready.pop()[0])
+            self._cond.notify_all()
+        for env in surplus:
+            self._close_env(env)
+        self.start()
+
+    def acquire(self) -> Tuple[Any, Tuple[Any, Any]]:
+        """返回 (env, env.reset() 的结果)"""
+        with self._cond:
+            if self._ready:
+                self.hits += 1
+                item = self._ready.popleft()
+                self._cond.notify_all()
+                return item
+            self.misses += 1
+        env = self._factory()
+        return env, env.reset()
+
+    def release(self, env):
+        """归还环境；池未运行或已满时关闭该环境"""
+        if env is None:
+            return
+        with self._cond:
+            if self._running and len(self._ready) + len(self._dirty) < self.size:
+                self._dirty.append(env)
+                self._cond.notify_all()
+                return
+        self._close_env(env)
+
+    def _needs_work(self) -> bool:
+        return bool(self._dirty) or len(self._ready) + len(self._dirty) < self.size
+
+    def _refill_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._needs_work():
+                    self._cond.wait()
+                if not self._running:
+                    return
+                env = self._dirty.popleft() if self._dirty else None
+
+            try:
+                if env is None:
+                    env = self._factory()
+                item = (env, env.reset())
+            except Exception as e:
+                print(f"[env pool] 预热 ALFWorld 环境失败: {e}")
+                with self._cond:
+                    self._running = False
+                if env is not None:
+                    self._close_env(env)
+                return
+
+            with self._cond:
+                if len(self._ready) < self.size:
+                    self._ready.append(item)
+                    continue
+            self._close_env(env)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"size": self.size, "ready": len(self._ready), "hits": self.hits, "misses": self.misses}
+
+
+_pool: Optional[ALFworldEnvPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_env_pool() -> ALFworldEnvPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ALFworldEnvPool()
+        return _pool
+
+
+def configure_pool(size: int) -> ALFworldEnvPool:
+    """调整进程级环境池的大小并开始预热"""
+    pool = get_env_pool()
+    pool.configure(size)
+    return pool
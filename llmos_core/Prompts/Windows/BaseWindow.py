@@ -1,8 +1,9 @@
 import json
 import os
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Callable, Union
+from typing import List, Dict, Any, Callable, Optional, Union
 from llmos_core.schema import WindowSnapshot, ToolDefinition
+from llmos_core.Prompts.Windows.meta_cache import META_CACHE
 
 
 class BasePromptWindow(ABC):
@@ -14,64 +15,128 @@ class BasePromptWindow(ABC):
     ✅ 每个窗口负责维护自身的提示词片段，以及内部状态。
     ✅ 提供 forward() 来序列化本模块的最终提示词文本。
     ✅ 提供 handler 分发机制，使模型的 function call 能调用该模块的能力。
+    ✅ 可选：提供 export_compact_state_prompt(level)，在 token 预算不足时输出压缩后的状态。
     """
 
+    # token 预算中的默认策略（见 Prompts.token_budget）：优先级越低越先被压缩；min_share 为保底份额
+    budget_priority = 50
+    budget_min_share = 0.0
+    # 前缀稳定布局中状态的排列顺序：越大越易变，越靠后输出
+    prompt_volatility = 50
+    # 状态中是否输出挂钟时间戳；前缀稳定布局下由 PromptMainBoard 关闭，使相同的状态渲染出相同的文本
+    render_timestamps = True
+
     def __init__(self, window_title="", meta_file=None):
         """
         :param window_title: 窗口标题，对应前端展示的名称
         :param meta_file: 可选的文件路径，用于加载元数据（META）
         """
         self.handlers: Dict[str, Callable] = {}  # 各模块暴露给 LLM 的处理方法，例如 function call 的入口
+        self.version = 0  # 状态版本号：每次状态可能变化时递增，PromptMainBoard 据此复用 forward() 缓存
+        self.meta_revision = 0  # 元数据版本号：meta_data 被重新赋值时递增，工具定义缓存据此失效
         if window_title is None or window_title == "":
             window_title = "undefined_window"
         self.window_title = window_title
         
         # 🚀 新增：如果提供了 meta_file，则加载它
         self.meta_file = meta_file
+        self._meta_prompt_cache = None  # export_meta_prompt() 的序列化结果，meta_data 被重新赋值时失效
         self.meta_data = None
         if self.meta_file:
             self.meta_data = self.load_meta_from_file(self.meta_file)
 
+    @property
+    def meta_data(self) -> Union[str, Dict, List, None]:
+        return self._meta_data
+
+    @meta_data.setter
+    def meta_data(self, value: Union[str, Dict, List, None]):
+        """重新赋值元数据时清空序列化缓存，并标记窗口状态变化"""
+        self._meta_data = value
+        self._meta_prompt_cache = None
+        self.meta_revision += 1
+        self.mark_dirty()
+
+    def reload_meta(self):
+        """
+        从 meta_file 重新加载元数据（例如描述文件被编辑后）。
+        没有 meta_file 时不做任何事。
+        """
+        if self.meta_file:
+            self.meta_data = self.load_meta_from_file(self.meta_file)
+
     def load_meta_from_file(self, file_path: Union[str, os.PathLike]) -> Union[str, Dict, List]:
         """
         从文件中加载元数据（META）。
         支持 .json, .yaml, .yml 格式解析，其余格式按纯文本读取。
+        解析结果来自进程级共享缓存（只读），文件未修改时不会重复读盘。
 
         :param file_path: 文件路径
-        :return: 解析后的数据（字典/列表）或纯文本字符串
+        :return: 解析后的数据（只读字典/元组）或纯文本字符串
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Meta file not found: {file_path}")
+        return META_CACHE.get(file_path)
 
-        _, ext = os.path.splitext(file_path)
-        ext = ext.lower()
+    def refresh_meta(self) -> bool:
+        """
+        廉价的 stat 检查（按 META_CHECK_INTERVAL 节流）：meta_file 在磁盘上被修改后自动重新加载。
+        由 PromptMainBoard 在每次组装提示词前对每个窗口调用一次；加载失败时保留旧的元数据。
 
+        :return: 是否发生了重新加载
+        """
+        if not self.meta_file:
+            return False
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                if ext == '.json':
-                    return json.load(f)
-                elif ext in ['.yaml', '.yml']:
-                    try:
-                        import yaml
-                        return yaml.safe_load(f)
-                    except ImportError:
-                        # 如果没有安装 yaml，降级为文本读取并给出警告
-                        print("Warning: PyYAML not installed, reading .yaml as plain text.")
-                        f.seek(0)
-                        return f.read()
-                else:
-                    return f.read()
-        except Exception as e:
-            raise RuntimeError(f"Error loading meta from {file_path}: {e}")
+            data = self.load_meta_from_file(self.meta_file)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"Warning: failed to refresh meta for {self.window_title}: {e}")
+            return False
+        if data is self._meta_data:
+            return False
+        self.meta_data = data
+        return True
 
     def forward(self, *args, **kwargs) -> str:
         """
         将当前模块的提示内容序列化为字符串。
         默认行为是输出 meta prompt + state prompt 的组合。
         """
+        return self._wrap_prompt(self.export_meta_prompt(), self.export_state_prompt())
+
+    def forward_compact(self, level: int) -> Optional[str]:
+        """
+        以压缩级别 level 渲染窗口（0 即 forward()）。
+        窗口无法再压缩时返回 None。
+        """
+        if level <= 0:
+            return self.forward()
+        state_prompt = self.export_compact_state_prompt(level)
+        if state_prompt is None:
+            return None
+        return self._wrap_prompt(self.export_meta_prompt(), state_prompt)
+
+    def forward_meta(self) -> str:
+        """只渲染元提示词部分（前缀稳定布局中与其他窗口的元数据一起放在最前面）"""
         meta_prompt = self.export_meta_prompt()
-        state_prompt = self.export_state_prompt()
+        if not meta_prompt:
+            return ""
+        return (f"\n"
+                f"<WINDOW META: {self.window_title}>\n"
+                f"{meta_prompt}\n"
+                f"<WINDOW META END: {self.window_title}>\n")
+
+    def forward_state(self, level: int = 0) -> Optional[str]:
+        """只渲染状态部分（压缩级别 level），无法压缩到该级别时返回 None"""
+        state_prompt = self.export_compact_state_prompt(level)
+        if state_prompt is None:
+            return None
+        if not state_prompt:
+            return ""
+        return (f"\n"
+                f"<WINDOW STATE: {self.window_title}>\n"
+                f"{state_prompt}\n"
+                f"<WINDOW STATE END: {self.window_title}>\n")
 
+    def _wrap_prompt(self, meta_prompt: str, state_prompt: str) -> str:
         # 仅当 meta 或 state 有内容时才生成窗口
         if not meta_prompt and not state_prompt:
             return ""
@@ -94,16 +159,50 @@ class BasePromptWindow(ABC):
         :return: 调用处理结果（通常是 Any，用于返回给模型）
         """
         if module_call in self.handlers:
-            return self.handlers[module_call](*args, **kwargs)
+            try:
+                return self.handlers[module_call](*args, **kwargs)
+            finally:
+                self.mark_dirty()
         else:
             raise NotImplementedError(
                 f"Handler for {module_call} not found in {self.__class__.__name__}"
             )
 
+    def close(self):
+        """释放窗口持有的外部资源（如环境、连接），程序被切换或会话过期时调用。默认无操作。"""
+        pass
+
+    def bind_session(self, session_id: str):
+        """程序被分配给某个会话后调用（例如按会话恢复持久化的状态）。默认无操作。"""
+        pass
+
+    def discard_session(self):
+        """
+        会话被删除、过期或切换了程序时调用：删除按会话持久化的状态（与 bind_session 对应），
+        之后程序会再调用 close() 释放资源。默认无操作。
+        """
+        pass
+
+    def begin_turn(self):
+        """
+        每次组装提示词前由 PromptMainBoard 在主线程中调用（在渲染之前），
+        窗口可在此换入后台任务的结果并自行 mark_dirty。默认无操作。
+        """
+        pass
+
+    def mark_dirty(self):
+        """
+        标记窗口状态已变化（版本号 +1）。
+        handler 执行、env_event、reset 之后由 PromptMainBoard / BaseProgram 自动调用；
+        若窗口在 handler 之外修改了自身状态（如后台线程注入消息），需要自行调用。
+        """
+        self.version += 1
+
     def get_tool_definitions(self) -> List[ToolDefinition]:
         """
         返回该窗口提供的所有外部工具定义，用于 LLM API 的 tools 参数。
         默认不提供任何工具。仅需要调用外部环境的窗口需要重写此方法。
+        结果由 PromptMainBoard 缓存，重写时应只依赖 meta_data（变化时 meta_revision 会递增）。
         """
         return []
 
@@ -111,12 +210,16 @@ class BasePromptWindow(ABC):
         """
         返回模块的“元提示词”部分，用于描述模块目的、功能、使用规范等。
         如果 self.meta_data 有值，则返回其字符串表示。
+        元数据加载后不会变化，序列化结果会被缓存，直到 meta_data 被重新赋值（见 refresh_meta）。
         """
-        if self.meta_data is not None:
-            if isinstance(self.meta_data, (dict, list)):
-                return json.dumps(self.meta_data, indent=2, ensure_ascii=False)
-            return str(self.meta_data)
-        return ""
+        if self._meta_prompt_cache is None:
+            if self.meta_data is None:
+                self._meta_prompt_cache = ""
+            elif isinstance(self.meta_data, (dict, list, tuple)):
+                self._meta_prompt_cache = json.dumps(self.meta_data, indent=2, ensure_ascii=False)
+            else:
+                self._meta_prompt_cache = str(self.meta_data)
+        return self._meta_prompt_cache
 
     def export_state_prompt(self) -> str:
         """
@@ -126,6 +229,15 @@ class BasePromptWindow(ABC):
         """
         return ""
 
+    def export_compact_state_prompt(self, level: int) -> Optional[str]:
+        """
+        返回压缩级别 level 下的状态提示词，level 越大越精简；level 为 0 时等同于 export_state_prompt()。
+        返回 None 表示无法压缩到该级别。默认不支持压缩，需要时由子类实现（如截断较早的历史）。
+        """
+        if level <= 0:
+            return self.export_state_prompt()
+        return None
+
     def export_handlers(self) -> Dict[str, Callable]:
         """
         返回该窗口提供的 function call 可调用表。
@@ -138,8 +250,6 @@ class BasePromptWindow(ABC):
         拿到更结构化的快照：meta 与 state 分别展示。
         用于可视化、存储、调试或 Web UI 显示。
         """
-        # 将 tool definitions 格式化为 meta 描述
-        tools = self.get_tool_definitions()
         meta_desc = self.export_meta_prompt()
         return WindowSnapshot(
             meta=meta_desc,
@@ -1,15 +1,13 @@
+import importlib
+import threading
 from enum import Enum
-from .BaseWindow import BasePromptWindow, NullSystemWindow
+from typing import Dict, Optional, Type
 
-# 导入必要的底层实现类，以确保它们在被调用前注册到 BasePromptWindow
-from  .static_window import KernelPromptWindow,CodePromptWindow
-from  .stack_window import StackPromptWindow,FlowStackPromptWindow
-from  .heap_window import HeapPromptWindow
-from  .system_window import SystemPromptWindow
+from .BaseWindow import BasePromptWindow, NullSystemWindow
 
-from  .chat_window import ChatWindow,AsyChatPromptWindow
-from  .ALFworldWindow import ALFworldWindow
-from  .think_window import ThinkWindow
+# 窗口类不在导入时加载：_WINDOW_MAPPING 只保存 "模块:类名"，首次 create / from_name 时才导入对应模块。
+# 例如 ALFworldWindow 会导入 alfworld，只有真正使用 ALFWorld 窗口的部署才需要承担这部分开销。
+_PACKAGE = __name__.rsplit(".", 1)[0]
 
 class PromptWindow(Enum):
     KernelPromptWindow = 'kernel'
@@ -34,7 +32,7 @@ class PromptWindow(Enum):
 
     def create(self, **kwargs):
         """通过 PromptWindow.MEMBER.create() 方式创建窗口实例"""
-        cls = _WINDOW_MAPPING.get(self)
+        cls = _resolve(self)
         if not cls:
             raise ValueError(f"Window class for {self} not found in mapping.")
         
@@ -65,44 +63,61 @@ class PromptWindow(Enum):
             
         return window_cls(**kwargs)
 
-# 建立 Enum 到 类的映射表
-_WINDOW_MAPPING = {
-    PromptWindow.KernelPromptWindow: KernelPromptWindow,
-    PromptWindow.CodePromptWindow: CodePromptWindow,
-    PromptWindow.StackPromptWindow: StackPromptWindow,
-    PromptWindow.FlowStackPromptWindow: FlowStackPromptWindow,
-    PromptWindow.HeapPromptWindow: HeapPromptWindow,
-    PromptWindow.SystemPromptWindow: SystemPromptWindow,
-    PromptWindow.ChatPromptWindow: ChatWindow,
-    PromptWindow.ALFWorldWindow: ALFworldWindow,
-    PromptWindow.AsyChatPromptWindow: AsyChatPromptWindow,
-    PromptWindow.ThinkingPromptWindow: ThinkWindow,
-    PromptWindow.NullWindow: NullSystemWindow,
+# 建立 Enum 到 窗口类路径的映射表（惰性导入）
+_WINDOW_MAPPING: Dict["PromptWindow", str] = {
+    PromptWindow.KernelPromptWindow: f"{_PACKAGE}.static_window.kernel_window:KernelPromptWindow",
+    PromptWindow.CodePromptWindow: f"{_PACKAGE}.static_window.code_window:CodePromptWindow",
+    PromptWindow.StackPromptWindow: f"{_PACKAGE}.stack_window.stack_window:StackPromptWindow",
+    PromptWindow.FlowStackPromptWindow: f"{_PACKAGE}.stack_window.flowStackWindow:FlowStackPromptWindow",
+    PromptWindow.HeapPromptWindow: f"{_PACKAGE}.heap_window.heap_window:HeapPromptWindow",
+    PromptWindow.SystemPromptWindow: f"{_PACKAGE}.system_window.system_window:SystemPromptWindow",
+    PromptWindow.ChatPromptWindow: f"{_PACKAGE}.chat_window.chat_window:ChatWindow",
+    PromptWindow.ALFWorldWindow: f"{_PACKAGE}.ALFworldWindow.ALFworldWindow:ALFworldWindow",
+    PromptWindow.AsyChatPromptWindow: f"{_PACKAGE}.chat_window.chat_window:AsyChatPromptWindow",
+    PromptWindow.ThinkingPromptWindow: f"{_PACKAGE}.think_window.think_window:ThinkWindow",
+    PromptWindow.NullWindow: f"{NullSystemWindow.__module__}:{NullSystemWindow.__qualname__}",
 }
 
+# 已解析的类
+_RESOLVED: Dict["PromptWindow", Type[BasePromptWindow]] = {PromptWindow.NullWindow: NullSystemWindow}
+_resolve_lock = threading.Lock()
+
+# 字符串 -> Enum 成员：value 优先于 name（与逐个匹配时的优先级一致）
+_NAME_LOOKUP: Dict[str, "PromptWindow"] = {member.name: member for member in PromptWindow}
+_NAME_LOOKUP.update({member.value: member for member in PromptWindow})
+
+# "模块:类名" -> 类型字符串，用于 get_window_type 的 O(1) 反查（无需导入任何窗口模块）
+_PATH_TO_TYPE: Dict[str, str] = {path: member.value for member, path in _WINDOW_MAPPING.items()}
+
+
+def _resolve(member: "PromptWindow") -> Optional[Type[BasePromptWindow]]:
+    cls = _RESOLVED.get(member)
+    if cls is not None:
+        return cls
+    path = _WINDOW_MAPPING.get(member)
+    if path is None:
+        return None
+    module_name, _, class_name = path.partition(":")
+    with _resolve_lock:
+        cls = getattr(importlib.import_module(module_name), class_name)
+        _RESOLVED[member] = cls
+    return cls
+
+
 # 辅助函数：根据名称（Enum 或 字符串）获取类
 def _get_window_class(name):
     if isinstance(name, PromptWindow):
-        return _WINDOW_MAPPING.get(name)
-    
+        return _resolve(name)
+
     if isinstance(name, str):
-        # 尝试通过 value 匹配 Enum
-        for member in PromptWindow:
-            if member.value == name:
-                return _WINDOW_MAPPING.get(member)
-        # 尝试通过 name 匹配 Enum
-        for member in PromptWindow:
-            if member.name == name:
-                return _WINDOW_MAPPING.get(member)
-                
+        member = _NAME_LOOKUP.get(name)
+        if member is not None:
+            return _resolve(member)
+
     return None
 
 # 辅助函数：根据类或实例获取其注册的类型字符串
 def get_window_type(window_obj_or_cls):
     """根据类或实例获取其注册的类型字符串"""
     cls = window_obj_or_cls if isinstance(window_obj_or_cls, type) else window_obj_or_cls.__class__
-    
-    for member, mapped_cls in _WINDOW_MAPPING.items():
-        if mapped_cls == cls:
-            return member.value
-    return "text" # 默认 fallback
\ No newline at end of file
+    return _PATH_TO_TYPE.get(f"{cls.__module__}:{cls.__qualname__}", "text") # 默认 fallback
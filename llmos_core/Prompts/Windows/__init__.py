@@ -1,14 +1,32 @@
-# 导入必要的底层实现类，以确保它们在被调用前注册到 BasePromptWindow
+import importlib
+
+# 只预先导入基类与注册表；具体窗口类在首次访问时才导入（PEP 562），
+# 避免仅使用 Chat / Context 的部署也要导入 alfworld 等重量级依赖。
 from llmos_core.Prompts.Windows.BaseWindow import BasePromptWindow
-from  .static_window import KernelPromptWindow, CodePromptWindow
-from  .stack_window import stack_window,FlowStackPromptWindow
-from  .heap_window import heap_window
-from  .system_window import SystemPromptWindow
+from .Window_register import PromptWindow
 
-from  .chat_window import ChatWindow,AsyChatPromptWindow
-from  .ALFworldWindow import ALFworldWindow
-from  .think_window import ThinkWindow
+_LAZY_ATTRS = {
+    "KernelPromptWindow": ".static_window",
+    "CodePromptWindow": ".static_window",
+    "StackPromptWindow": ".stack_window",
+    "FlowStackPromptWindow": ".stack_window",
+    "HeapPromptWindow": ".heap_window",
+    "SystemPromptWindow": ".system_window",
+    "ChatWindow": ".chat_window",
+    "AsyChatPromptWindow": ".chat_window",
+    "ALFworldWindow": ".ALFworldWindow",
+    "ThinkWindow": ".think_window",
+}
 
-from .Window_register import PromptWindow
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
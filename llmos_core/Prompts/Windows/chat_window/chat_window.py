@@ -8,7 +8,15 @@ from pathlib import Path
 Meta_dir = Path(__file__).parent
 Meta_file = Meta_dir / 'user_instruction.json'
 
+# token 预算不足时的压缩级别：依次保留的最近消息条数
+CHAT_COMPACT_MESSAGES = (20, 8, 3, 1)
+
 class ChatWindow(BasePromptWindow):
+    budget_priority = 60
+    budget_min_share = 0.1
+    # 只在用户发言时变化
+    prompt_volatility = 30
+
     def __init__(self, code_file=None, window_title="ChatWindow"):
         default_path = Meta_file
         self.code_file = code_file if code_file else default_path
@@ -30,7 +38,22 @@ class ChatWindow(BasePromptWindow):
     def export_state_prompt(self):
         if not self.messages:
             return '\nNO USER instruction'
-        joined = "\n".join([f"{m['role'].upper()}: {m['text']}" for m in self.messages])
+        return self._render_messages(self.messages)
+
+    def export_compact_state_prompt(self, level):
+        """逐级只保留最近的消息"""
+        if level <= 0:
+            return self.export_state_prompt()
+        if level > len(CHAT_COMPACT_MESSAGES) or len(self.messages) <= CHAT_COMPACT_MESSAGES[-1]:
+            return None
+        keep = CHAT_COMPACT_MESSAGES[level - 1]
+        omitted = len(self.messages) - keep
+        prefix = f"\n... ({omitted} earlier messages omitted)" if omitted > 0 else ""
+        return prefix + self._render_messages(self.messages[-keep:])
+
+    @staticmethod
+    def _render_messages(messages):
+        joined = "\n".join([f"{m['role'].upper()}: {m['text']}" for m in messages])
         return f"\n{joined}"
 
     def forward(self):
@@ -128,6 +151,8 @@ class AsyChatPromptWindow(BasePromptWindow):
         else:
             # 直接加入历史
             self.chat_history.append(msg_obj)
+        # 后台线程注入的消息不经过 handler，需要主动标记状态变化
+        self.mark_dirty()
 
     # ============ 对外同步接口（主循环调用）============
 
@@ -137,7 +162,8 @@ class AsyChatPromptWindow(BasePromptWindow):
 
         # 历史消息
         for msg in self.chat_history[-5:]:
-            history_str += f"[{msg['role'].upper()} {msg['timestamp']}]:\n"
+            timestamp = f" {msg['timestamp']}" if self.render_timestamps else ""
+            history_str += f"[{msg['role'].upper()}{timestamp}]:\n"
             history_str += f"{msg['content']}\n\n"
 
         # 流式生成中的消息
@@ -149,7 +175,8 @@ class AsyChatPromptWindow(BasePromptWindow):
         if self.input_buffer:
             history_str += "--- USER INPUT BUFFER ---\n"
             for buffered in self.input_buffer:
-                history_str += f"[{buffered['timestamp']}] {buffered['content']}\n"
+                timestamp = f"[{buffered['timestamp']}] " if self.render_timestamps else "- "
+                history_str += f"{timestamp}{buffered['content']}\n"
 
         return f"### CHAT WINDOW STATE ###\n{history_str}"
 
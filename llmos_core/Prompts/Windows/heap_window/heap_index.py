@@ -0,0 +1,129 @@
+import bisect
+import fnmatch
+import re
+from typing import Dict, List, Optional, Set
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> Set[str]:
+    """按词切分并转为小写（连续的中文字符作为一个词，查询时按子串匹配词表）"""
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+class HeapIndex:
+    """
+    堆的增量索引，在 heap_set / heap_delete 时更新：
+        - 有序键表（bisect）：前缀查询与 glob 查询
+        - 倒排索引（词 -> 键）与有序词表：按内容搜索，候选键再用值的全文做子串校验
+        - 每个值的文本长度（字符串值为原文长度，与 heap_read 的 total 一致），用于键摘要
+    """
+
+    def __init__(self):
+        self._sorted_keys: List[str] = []
+        self._postings: Dict[str, Set[str]] = {}  # 词 -> 含有该词的键
+        self._tokens: Dict[str, Set[str]] = {}  # 键 -> 其值中的词（删除时用）
+        self._vocabulary: List[str] = []  # 有序词表，按前缀查找词
+        self.sizes: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._sorted_keys)
+
+    def __contains__(self, key):
+        return str(key) in self.sizes
+
+    def add(self, key, text: str):
+        """写入或覆盖一个键，text 为值的可搜索文本（字符串值为原文，其余为紧凑 JSON）"""
+        key = str(key)
+        if key in self.sizes:
+            self._unlink(key)
+        else:
+            bisect.insort(self._sorted_keys, key)
+        tokens = tokenize(text)
+        self._tokens[key] = tokens
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                bisect.insort(self._vocabulary, token)
+            posting.add(key)
+        self.sizes[key] = len(text)
+
+    def remove(self, key):
+        key = str(key)
+        if key not in self.sizes:
+            return
+        self._unlink(key)
+        del self._tokens[key]
+        del self.sizes[key]
+        index = bisect.bisect_left(self._sorted_keys, key)
+        del self._sorted_keys[index]
+
+    def _unlink(self, key: str):
+        for token in self._tokens.get(key, ()):
+            keys = self._postings.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[token]
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def clear(self):
+        self._sorted_keys.clear()
+        self._postings.clear()
+        self._tokens.clear()
+        self._vocabulary.clear()
+        self.sizes.clear()
+
+    def keys(self) -> List[str]:
+        """按字典序排列的全部键"""
+        return list(self._sorted_keys)
+
+    def keys_with_prefix(self, prefix: str = "") -> List[str]:
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        result = []
+        for key in self._sorted_keys[start:]:
+            if not key.startswith(prefix):
+                break
+            result.append(key)
+        return result
+
+    def find(self, pattern: str) -> List[str]:
+        """glob 匹配键名（* ? [...]，区分大小写），用通配符之前的字面前缀缩小范围"""
+        literal = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+        return [key for key in self.keys_with_prefix(literal) if fnmatch.fnmatchcase(key, pattern)]
+
+    def _tokens_with_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        result = []
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            result.append(token)
+        return result
+
+    def candidates(self, text: str) -> Optional[List[str]]:
+        """
+        可能包含 text 的键（按字典序），结果还需由调用方用值的全文校验。
+        查询中的词按其在 text 中的边界与值中的词比较：
+            - 两侧都是非词字符：必须与值中的某个词完全相同，直接查倒排索引
+            - 只有左侧是：必须是某个词的前缀，在有序词表中二分查找
+            - 其余（位于 text 两端的词）：是某个词的子串，只在没有前两类词时才扫描词表
+        text 中没有任何词（如只有标点）时返回 None，表示无法用索引缩小范围，调用方需逐个校验。
+        """
+        text = text.lower()
+        exact, prefix, partial = [], [], []
+        for match in _TOKEN_RE.finditer(text):
+            left, right = match.start() > 0, match.end() < len(text)
+            (exact if left and right else prefix if left else partial).append(match.group())
+        if not exact and not prefix and not partial:
+            return None
+
+        postings = [self._postings.get(token, set()) for token in exact]
+        postings += [set().union(*(self._postings[t] for t in self._tokens_with_prefix(token))) for token in prefix]
+        if not postings:
+            # 只有两端的词时退回到扫描词表（例如单个词的查询）
+            postings = [set().union(*(posting for t, posting in self._postings.items() if token in t))
+                        for token in partial]
+        result = set.intersection(*postings)
+        return sorted(result)
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple, Union
+
+# 设置后，绑定到会话的堆改用该 sqlite 文件持久化（见 HeapPromptWindow.bind_session）
+HEAP_DB_PATH = os.getenv("LLMOS_HEAP_DB")
+# SqliteHeapStore 在内存中保留的热点值数量
+HEAP_CACHE_SIZE = 64
+
+
+class HeapStore(MutableMapping):
+    """
+    堆的存储后端，按 dict 的语义使用（键保持插入顺序，覆盖已有键不改变其位置）。
+    值必须可 JSON 序列化；get_serialized() 返回值的紧凑 JSON，供窗口渲染时直接使用。
+    """
+
+    def get_serialized(self, key) -> str:
+        return json.dumps(self[key], ensure_ascii=False)
+
+    def close(self):
+        """释放后端持有的资源，默认无操作"""
+        pass
+
+
+class MemoryHeapStore(HeapStore):
+    """进程内的字典存储（默认后端）"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def clear(self):
+        self._data.clear()
+
+
+_connections: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+_connections_lock = threading.Lock()
+
+
+def _get_connection(path: Path) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """同一个文件的所有会话共享一个连接（大量会话时不必各自持有连接）"""
+    key = str(path.resolve())
+    with _connections_lock:
+        if key not in _connections:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(key, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS heap (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_heap_seq ON heap(namespace, seq)")
+            conn.commit()
+            _connections[key] = (conn, threading.Lock())
+        return _connections[key]
+
+
+class SqliteHeapStore(HeapStore):
+    """
+    基于 sqlite 的持久化存储，每个会话一个 namespace。
+        - 内存中只保留键的顺序与最近访问的 cache_size 个值（LRU），其余值留在磁盘上
+        - 值以 JSON 文本存储，get_serialized() 无需反序列化
+        - 写入立即提交，进程重启后按 namespace 恢复
+    """
+
+    def __init__(self, path: Union[str, Path], namespace: str = "default", cache_size: int = HEAP_CACHE_SIZE):
+        self.path = Path(path)
+        self.namespace = namespace
+        self.cache_size = cache_size
+        self._conn, self._lock = _get_connection(self.path)
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        with self._lock:
+            rows = self._conn.execute("SELECT key, seq FROM heap WHERE namespace = ? ORDER BY seq",
+                                      (namespace,)).fetchall()
+        # 键 -> seq，按插入顺序排列
+        self._keys: Dict[str, int] = {key: seq for key, seq in rows}
+        self._next_seq = rows[-1][1] + 1 if rows else 0
+
+    def _remember(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _load_serialized(self, key) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM heap WHERE namespace = ? AND key = ?",
+                                     (self.namespace, key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __getitem__(self, key):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if key not in self._keys:
+            raise KeyError(key)
+        value = json.loads(self._load_serialized(key))
+        self._remember(key, value)
+        return value
+
+    def get_serialized(self, key) -> str:
+        if key not in self._keys:
+            raise KeyError(key)
+        if key in self._cache:
+            return json.dumps(self._cache[key], ensure_ascii=False)
+        return self._load_serialized(key)
+
+    def __setitem__(self, key, value):
+        serialized = json.dumps(value, ensure_ascii=False)
+        seq = self._keys.get(key)
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO heap (namespace, key, seq, value) VALUES (?, ?, ?, ?)",
+                               (self.namespace, key, seq, serialized))
+            self._conn.commit()
+        self._keys[key] = seq
+        self._remember(key, value)
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        with self._lock:
+            self._conn.execute("DELETE FROM heap WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._conn.commit()
+        del self._keys[key]
+        self._cache.pop(key, None)
+
+    def __iter__(self) -> Iterator:
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM heap WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+        self._keys.clear()
+        self._cache.clear()
+        self._next_seq = 0
+
+    def close(self):
+        # 连接由同一文件的所有会话共享，这里只释放本会话的内存缓存
+        self._cache.clear()
@@ -1,30 +1,241 @@
 from llmos_core.Prompts.Windows.BaseWindow import BasePromptWindow
+from .heap_index import HeapIndex
+from .heap_store import HEAP_DB_PATH, HeapStore, MemoryHeapStore, SqliteHeapStore
+from collections import OrderedDict
 from pathlib import Path
+from typing import Dict, Optional
 import json
+import os
 
 Meta_dir = Path(__file__).parent
 Meta_file = Meta_dir / 'heap_description.json'
 
+# 序列化后超过该长度的值在 HEAP DATA 中只显示预览与总长度，完整内容通过 heap_read 分页读取
+HEAP_PREVIEW_CHARS = 500
+# heap_read 默认每页的字符数
+HEAP_READ_LENGTH = 2000
+# token 预算不足时的压缩级别：每个值保留的字符数，None 表示只列出键名
+HEAP_COMPACT_PREVIEWS = (200, 40, None)
+# 工作集：最近写入或读取的键，只有这些键的值会渲染进提示词
+HEAP_WORKING_SET = 32
+# 工作集之外最多列出的键名数量
+HEAP_HIDDEN_KEYS_SHOWN = 20
+# 渲染模式："values" 渲染工作集中的值；"keys" 只渲染键摘要，值由模型通过 heap_get / heap_search 等按需读取
+HEAP_RENDER_VALUES = "values"
+HEAP_RENDER_KEYS = "keys"
+HEAP_RENDER_MODE = os.getenv("LLMOS_HEAP_RENDER", HEAP_RENDER_VALUES)
+# 键摘要中最多列出的键数量
+HEAP_SUMMARY_KEYS = 100
+# heap_keys / heap_find / heap_search 默认返回的最大条数
+HEAP_QUERY_LIMIT = 50
+# heap_search 结果中匹配位置前后保留的字符数
+HEAP_SNIPPET_CHARS = 40
+
+
+def searchable_text(serialized: str) -> str:
+    """heap_search 与索引所用的文本：字符串值用原文（与 heap_read 一致，不含 JSON 转义），其余用紧凑 JSON"""
+    return json.loads(serialized) if serialized.startswith('"') else serialized
+
 class HeapPromptWindow(BasePromptWindow):
+    # 堆中的值可以随时用 heap_get / heap_read 取回，预算不足时最先压缩
+    budget_priority = 30
+    prompt_volatility = 40
 
-    def __init__(self, window_title="Heap"):
+    def __init__(self, window_title="Heap", store: Optional[HeapStore] = None, working_set: int = HEAP_WORKING_SET,
+                 render_mode: str = HEAP_RENDER_MODE):
+        """
+        :param store: 堆的存储后端，默认为进程内的 MemoryHeapStore；
+                      设置了 LLMOS_HEAP_DB 时，bind_session() 会换成按会话持久化的 SqliteHeapStore
+        :param working_set: 渲染进提示词的最近使用键的数量
+        :param render_mode: HEAP_RENDER_VALUES 或 HEAP_RENDER_KEYS（只渲染键摘要）
+        """
         super().__init__(window_title=window_title, meta_file=Meta_file)
-        # 堆的核心数据结构，一个全局字典
-        self.data = {}
+        # 堆的核心数据结构，按 dict 语义使用的键值存储
+        self.data: HeapStore = store if store is not None else MemoryHeapStore()
+        self.working_set = working_set
+        self.render_mode = render_mode
+        # 键与值内容的索引，支持 heap_keys / heap_find / heap_search；
+        # 在第一次查询或渲染键摘要时才从存储构建（持久化存储下需要读出全部的值）
+        self._index = HeapIndex()
+        self._index_stale = True
+        # 增量序列化缓存，只在 heap_set / heap_delete 改动对应的 key 时失效
+        self._serialized: Dict[str, str] = {}  # key -> 值的紧凑 JSON
+        self._fragments: Dict[str, str] = {}  # key -> 该键在 HEAP DATA 中的片段
+        self._state_cache: Dict[int, str] = {}  # 压缩级别 -> 状态文本
+        self._recent: "OrderedDict[str, None]" = OrderedDict()  # 工作集，按最近使用排序
+        self._init_working_set()
+
+    @property
+    def index(self) -> HeapIndex:
+        if self._index_stale:
+            self._index.clear()
+            for key in self.data:
+                self._index.add(key, searchable_text(self.data.get_serialized(key)))
+            self._index_stale = False
+        return self._index
+
+    def _init_working_set(self):
+        """从存储中已有的键（如重启后恢复的会话）初始化工作集：取最后写入的若干个"""
+        self._recent.clear()
+        keys = list(self.data)
+        for key in keys[max(0, len(keys) - self.working_set):]:
+            self._recent[key] = None
+
+    def _touch(self, key):
+        """key 被写入或读取，移到工作集末尾；工作集成员变化时使状态缓存失效"""
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            return
+        self._recent[key] = None
+        while len(self._recent) > self.working_set:
+            # 移出工作集的键不再渲染，释放其序列化缓存（持久化存储下值只留在磁盘上）
+            evicted, _ = self._recent.popitem(last=False)
+            self._serialized.pop(evicted, None)
+            self._fragments.pop(evicted, None)
+        self._state_cache.clear()
+
+    def _visible_keys(self):
+        """按存储顺序排列的工作集键（顺序与访问无关，利于前缀缓存）"""
+        if len(self.data) <= self.working_set:
+            return list(self.data)
+        return [key for key in self.data if key in self._recent]
+
+    def bind_session(self, session_id: str):
+        """设置了 LLMOS_HEAP_DB 时，把堆切换为该会话的持久化存储（已有的数据一并写入）"""
+        if not HEAP_DB_PATH:
+            return
+        store = SqliteHeapStore(HEAP_DB_PATH, namespace=f"{session_id}:{self.window_title}")
+        for key in self.data:
+            store[key] = self.data[key]
+        self.data.close()
+        self.data = store
+        self._serialized.clear()
+        self._fragments.clear()
+        self._state_cache.clear()
+        self._index_stale = True
+        self._init_working_set()
+        self.mark_dirty()
+
+    def close(self):
+        self.data.close()
+
+    def discard_session(self):
+        """删除该会话持久化的堆数据（sqlite 中该会话的 namespace）"""
+        self.data.clear()
 
     def reset(self):
         """清空堆数据"""
         self.data.clear()
+        self._serialized.clear()
+        self._fragments.clear()
+        self._state_cache.clear()
+        self._recent.clear()
+        self._index.clear()
+        self._index_stale = False
         print(f"Heap Window Reset.")
 
+    def _invalidate(self, key):
+        self._serialized.pop(key, None)
+        self._fragments.pop(key, None)
+        self._state_cache.clear()
+
+    def _serialize(self, key) -> str:
+        serialized = self._serialized.get(key)
+        if serialized is None:
+            serialized = self.data.get_serialized(key)
+            self._serialized[key] = serialized
+        return serialized
+
+    def _fragment(self, key) -> str:
+        """单个键的片段：与整体 json.dumps(indent=2) 的输出一致，过长的值只保留预览"""
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            serialized = self._serialize(key)
+            if len(serialized) > HEAP_PREVIEW_CHARS:
+                fragment = (f"  {json.dumps(key, ensure_ascii=False)}: {serialized[:HEAP_PREVIEW_CHARS]}"
+                            f"... [{len(serialized)} chars, use heap_read to page]")
+            else:
+                fragment = json.dumps({key: self.data[key]}, indent=2, ensure_ascii=False)[2:-2]
+            self._fragments[key] = fragment
+        return fragment
+
+    def _value_result(self, key, limit: int = HEAP_PREVIEW_CHARS):
+        """
+        heap_set / heap_get 的返回值：value 始终是完整的值；
+        过长时只有写进执行历史的 __summary__ 换成预览与总长度
+        """
+        result = {"status": "ok", "key": key, "value": self.data[key]}
+        serialized = self._serialize(key)
+        if len(serialized) > limit:
+            result["__summary__"] = (f"heap['{key}'] = {serialized[:limit]}... "
+                                     f"[{len(serialized)} chars, use heap_read to page]")
+        return result
+
     # export_meta_prompt 已经由基类实现
 
+    def _hidden_keys_line(self, visible) -> str:
+        """工作集之外的键只列出名字"""
+        hidden = len(self.data) - len(visible)
+        if hidden <= 0:
+            return ""
+        visible = set(visible)
+        names = []
+        for key in self.data:
+            if key not in visible:
+                names.append(json.dumps(key, ensure_ascii=False))
+                if len(names) >= HEAP_HIDDEN_KEYS_SHOWN:
+                    break
+        more = ", ..." if hidden > len(names) else ""
+        return f"({hidden} more keys not shown, use heap_get / heap_read: {', '.join(names)}{more})\n"
+
+    def _render_key_summary(self) -> str:
+        """键摘要：按字典序列出键名与值的大小"""
+        keys = self.index.keys()
+        lines = [f"  {json.dumps(key, ensure_ascii=False)} ({self.index.sizes[key]} chars)"
+                 for key in keys[:HEAP_SUMMARY_KEYS]]
+        if len(keys) > HEAP_SUMMARY_KEYS:
+            lines.append(f"  ... {len(keys) - HEAP_SUMMARY_KEYS} more keys (use heap_keys / heap_find)")
+        return (f"### HEAP KEYS ({len(keys)}), values hidden: use heap_get / heap_read / heap_search ###\n"
+                + "\n".join(lines) + "\n")
+
     def export_state_prompt(self):
-        heap_data_str = json.dumps(self.data, indent=2, ensure_ascii=False)
-        if heap_data_str:
-            return f"### HEAP DATA ###\n{heap_data_str}\n"
+        state = self._state_cache.get(0)
+        if state is None:
+            if self.data and self.render_mode == HEAP_RENDER_KEYS:
+                state = self._render_key_summary()
+            elif self.data:
+                visible = self._visible_keys()
+                body = ",\n".join(self._fragment(key) for key in visible)
+                state = f"### HEAP DATA ###\n{{\n{body}\n}}\n" + self._hidden_keys_line(visible)
+            else:
+                state = "### HEAP Empty ###\n"
+            self._state_cache[0] = state
+        return state
+
+    def export_compact_state_prompt(self, level):
+        """逐级截断较长的值，最后只列出键名（完整的值可以通过 heap_read 读取）"""
+        if level <= 0:
+            return self.export_state_prompt()
+        if level > len(HEAP_COMPACT_PREVIEWS) or not self.data or self.render_mode == HEAP_RENDER_KEYS:
+            return None
+        state = self._state_cache.get(level)
+        if state is not None:
+            return state
+        preview = HEAP_COMPACT_PREVIEWS[level - 1]
+        if preview is None:
+            keys = ", ".join(json.dumps(key, ensure_ascii=False) for key in self.data)
+            state = f"### HEAP KEYS (values hidden, use heap_read) ###\n{keys}\n"
         else:
-            return "### HEAP Empty ###\n"
+            lines = []
+            visible = self._visible_keys()
+            for key in visible:
+                value_str = self._serialize(key)
+                if len(value_str) > preview:
+                    value_str = f"{value_str[:preview]}... ({len(value_str)} chars, use heap_read)"
+                lines.append(f"  {json.dumps(key, ensure_ascii=False)}: {value_str}")
+            state = "### HEAP DATA (truncated) ###\n" + "\n".join(lines) + "\n" + self._hidden_keys_line(visible)
+        self._state_cache[level] = state
+        return state
 
     def forward(self, context=None):
         """将堆数据序列化成提示词，供 LLM 使用"""
@@ -35,29 +246,143 @@ class HeapPromptWindow(BasePromptWindow):
         value = kwargs.get("value")
         if key is None or value is None:
             return {"status": "error", "reason": "key or value missing"}
+        # 键统一为字符串：sqlite 后端按 TEXT 存储，索引同样按 str(key) 建立，各后端重启前后一致
+        key = str(key)
         self.data[key] = value
-        return {"status": "ok", "key": key, "value": value}
+        self._invalidate(key)
+        if not self._index_stale:
+            self._index.add(key, searchable_text(self._serialize(key)))
+        self._touch(key)
+        return self._value_result(key)
 
     def _heap_get(self,*args,**kwargs):
         key = kwargs.get("key")
         if key is None:
             return {"status": "error", "reason": "key missing"}
-        value = self.data.get(key)
-        return {"status": "ok", "key": key, "value": value}
+        key = str(key)
+        if key not in self.data:
+            return {"status": "ok", "key": key, "value": None}
+        self._touch(key)
+        return self._value_result(key)
+
+    def _heap_read(self, *args, **kwargs):
+        """分页读取一个值：字符串按原文，其余按紧凑 JSON"""
+        key = kwargs.get("key")
+        if key is None:
+            return {"status": "error", "reason": "key missing"}
+        key = str(key)
+        if key not in self.data:
+            return {"status": "error", "reason": f"key '{key}' not found"}
+        try:
+            offset = max(0, int(kwargs.get("offset", 0) or 0))
+            length = max(1, int(kwargs.get("length", HEAP_READ_LENGTH) or HEAP_READ_LENGTH))
+        except (TypeError, ValueError):
+            return {"status": "error", "reason": "offset and length must be integers"}
+        self._touch(key)
+        value = self.data[key]
+        text = value if isinstance(value, str) else self._serialize(key)
+        chunk = text[offset:offset + length]
+        end = offset + len(chunk)
+        next_offset = end if end < len(text) else None
+        return {
+            "status": "ok",
+            "key": key,
+            "offset": offset,
+            "total": len(text),
+            "next_offset": next_offset,
+            "content": chunk,
+            # 摘要会写入执行历史，模型从这里看到本页内容
+            "__summary__": f"heap['{key}'][{offset}:{end}] of {len(text)} chars"
+                           f"{'' if next_offset is None else f' (next_offset={next_offset})'}:\n{chunk}"
+        }
 
     def _heap_delete(self,*args,**kwargs):
         key = kwargs.get("key")
         if key is None:
             return {"status": "error", "reason": "key missing"}
+        key = str(key)
         if key in self.data:
             del self.data[key]
+            self._invalidate(key)
+            if not self._index_stale:
+                self._index.remove(key)
+            self._recent.pop(key, None)
             return {"status": "ok", "key": key}
         else:
             return {"status": "error", "reason": f"key '{key}' not found"}
 
+    @staticmethod
+    def _query_limit(kwargs) -> int:
+        try:
+            return max(1, int(kwargs.get("limit", HEAP_QUERY_LIMIT) or HEAP_QUERY_LIMIT))
+        except (TypeError, ValueError):
+            return HEAP_QUERY_LIMIT
+
+    def _keys_result(self, keys, limit, description):
+        shown = keys[:limit]
+        more = f" (+{len(keys) - limit} more)" if len(keys) > limit else ""
+        return {
+            "status": "ok",
+            "keys": shown,
+            "total": len(keys),
+            "__summary__": f"{len(keys)} keys {description}{more}: {json.dumps(shown, ensure_ascii=False)}"
+        }
+
+    def _heap_keys(self, *args, **kwargs):
+        """按前缀列出键（字典序）"""
+        prefix = str(kwargs.get("prefix") or "")
+        keys = self.index.keys_with_prefix(prefix)
+        return self._keys_result(keys, self._query_limit(kwargs), f"with prefix '{prefix}'")
+
+    def _heap_find(self, *args, **kwargs):
+        """按 glob 模式匹配键名"""
+        pattern = kwargs.get("pattern")
+        if not pattern:
+            return {"status": "error", "reason": "pattern missing"}
+        keys = self.index.find(str(pattern))
+        return self._keys_result(keys, self._query_limit(kwargs), f"matching '{pattern}'")
+
+    def _heap_search(self, *args, **kwargs):
+        """在值的内容中搜索子串（不区分大小写），返回匹配的键与上下文片段"""
+        text = kwargs.get("text")
+        if not text:
+            return {"status": "error", "reason": "text missing"}
+        needle = str(text).lower()
+        limit = self._query_limit(kwargs)
+        matches = []
+        total = 0
+        candidates = self.index.candidates(needle)
+        # 查询中没有可索引的词（如只有标点）时按字典序逐个校验全部的值
+        for key in (candidates if candidates is not None else self.index.keys()):
+            serialized = self._serialized.get(key)
+            if serialized is None:
+                serialized = self.data.get_serialized(key)
+            content = searchable_text(serialized)
+            position = content.lower().find(needle)
+            if position < 0:
+                continue
+            total += 1
+            if len(matches) < limit:
+                start = max(0, position - HEAP_SNIPPET_CHARS)
+                end = position + len(needle) + HEAP_SNIPPET_CHARS
+                snippet = ("..." if start else "") + content[start:end] + ("..." if end < len(content) else "")
+                matches.append({"key": key, "snippet": snippet})
+        more = f" (+{total - limit} more)" if total > limit else ""
+        lines = "\n".join(f"  {json.dumps(m['key'], ensure_ascii=False)}: {m['snippet']}" for m in matches)
+        return {
+            "status": "ok",
+            "matches": matches,
+            "total": total,
+            "__summary__": f"{total} values containing '{text}'{more}" + (f":\n{lines}" if lines else "")
+        }
+
     def export_handlers(self):
         return {
                 'heap_set':self._heap_set,
                 'heap_get':self._heap_get,
-                'heap_delete':self._heap_delete
-                }
\ No newline at end of file
+                'heap_read':self._heap_read,
+                'heap_delete':self._heap_delete,
+                'heap_keys':self._heap_keys,
+                'heap_find':self._heap_find,
+                'heap_search':self._heap_search
+                }
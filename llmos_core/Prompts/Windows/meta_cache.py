@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple, Union
+
+# 同一文件两次 stat 检查之间的最短间隔（秒），期间直接返回缓存；设为 0 时每次获取都检查
+META_CHECK_INTERVAL = float(os.getenv("LLMOS_META_CHECK_INTERVAL", "1.0"))
+
+
+class FrozenDict(dict):
+    """
+    只读字典。
+    缓存中的元数据被所有窗口实例共享，禁止原地修改；需要修改时请先 dict(...) 复制一份。
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Shared meta data is read-only, copy it before modifying.")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze(obj: Any) -> Any:
+    """递归地将 dict/list 转换为只读的 FrozenDict/tuple"""
+    if isinstance(obj, dict):
+        return FrozenDict((key, _freeze(value)) for key, value in obj.items())
+    if isinstance(obj, list):
+        return tuple(_freeze(item) for item in obj)
+    return obj
+
+
+def _parse_meta_file(file_path: str) -> Union[str, Dict, list]:
+    """
+    按后缀解析元数据文件。
+    支持 .json, .yaml, .yml 格式解析，其余格式按纯文本读取。
+    """
+    _, ext = os.path.splitext(file_path)
+    ext = ext.lower()
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            if ext == '.json':
+                return json.load(f)
+            elif ext in ['.yaml', '.yml']:
+                try:
+                    import yaml
+                    return yaml.safe_load(f)
+                except ImportError:
+                    # 如果没有安装 yaml，降级为文本读取并给出警告
+                    print("Warning: PyYAML not installed, reading .yaml as plain text.")
+                    f.seek(0)
+                    return f.read()
+            else:
+                return f.read()
+    except Exception as e:
+        raise RuntimeError(f"Error loading meta from {file_path}: {e}")
+
+
+class MetaFileCache:
+    """
+    进程级的元数据文件缓存（线程安全）。
+    以 (真实路径) 为键，保存 (mtime_ns, size) 与解析后的只读数据：
+        - 文件未变化时，所有窗口实例共享同一份解析结果，不再读盘和解析
+        - 距上次检查超过 check_interval 秒时做一次 stat，文件被编辑后自动重新加载（热更新）
+    """
+
+    def __init__(self, check_interval: float = META_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self._checked_at: Dict[str, float] = {}  # 路径 -> 上次 stat 的时间（monotonic）
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, file_path: Union[str, os.PathLike]) -> Any:
+        path = os.path.realpath(file_path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - self._checked_at.get(path, 0.0) < self.check_interval:
+                self.hits += 1
+                return entry[1]
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Meta file not found: {file_path}")
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            self._checked_at[path] = now
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return entry[1]
+
+        # 解析放在锁外，避免大文件阻塞其他路径的读取
+        data = _freeze(_parse_meta_file(path))
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                # 其他线程已经加载了同一版本，复用它以保证共享同一对象
+                self.hits += 1
+                return entry[1]
+            self._entries[path] = (stamp, data)
+            self.loads += 1
+        return data
+
+    def invalidate(self, file_path: Union[str, os.PathLike, None] = None):
+        """清除指定文件（或全部）的缓存"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                self._checked_at.clear()
+            else:
+                self._entries.pop(os.path.realpath(file_path), None)
+                self._checked_at.pop(os.path.realpath(file_path), None)
+
+
+# 进程内唯一的共享实例
+META_CACHE = MetaFileCache()
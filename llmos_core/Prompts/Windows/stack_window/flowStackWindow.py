@@ -1,8 +1,12 @@
 import json
+import threading
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Deque, List, Dict, Any, Optional, Tuple
 
 from llmos_core.Prompts.Windows.BaseWindow import BasePromptWindow
+from .history_compactor import HISTORY_COMPACTION, HistoryCompactor, get_history_compactor
 from llmos_core.logger import LogEvent, RecordType
 from llmos_core.schema import ToolDefinition
 
@@ -10,31 +14,80 @@ META_DIR = Path(__file__).parent
 META_FILE = META_DIR / 'flowStack_description.json'
 
 RECORD_STEP = 50
+# token 预算不足时的压缩级别：栈顶帧保留的历史条数（依次递减），
+# 从 LOWER_FRAME_HISTORY_LEVEL 起较低的栈帧不再输出历史，最后一级只保留较低栈帧的函数名与描述
+COMPACT_RECORD_STEPS = (RECORD_STEP, 10, 5, 2, 1)
+LOWER_FRAME_HISTORY_LEVEL = 2
 # =========================================================
 # 🧱 FrameLogger：封装执行历史记录
 # =========================================================
+class _RecentBlock:
+    """最近 limit 条记录拼成的历史块：新记录追加到末尾，满时挤掉最早一行，已渲染的行不再重新拼接"""
+
+    __slots__ = ("limit", "lengths", "text")
+
+    def __init__(self, limit: int, lines: List[str]):
+        self.limit = limit
+        self.lengths: Deque[int] = deque(len(line) for line in lines)
+        self.text = "\n".join(lines)
+
+    def push(self, line: str):
+        if len(self.lengths) >= self.limit:
+            self.text = self.text[self.lengths.popleft() + 1:]
+        self.text = f"{self.text}\n{line}" if self.lengths else line
+        self.lengths.append(len(line))
+
+
 class FrameLogger:
+    """
+    定长环形缓冲区：超过 maxlen 的最早记录被自动丢弃。
+    事件的渲染文本由 LogEvent 自身缓存；渲染出的历史块按 (条数, 是否带时间戳) 缓存，
+    新增记录时增量追加到已缓存的块中，只在丢弃或清空记录时整体失效。
+    """
+
     def __init__(self, name: str = None, maxlen: int = 20):
         self.frameName = name or "UnnamedFrame"
-        self.records: List[LogEvent] = []
         self.maxlen = maxlen
+        self.records: Deque[LogEvent] = deque(maxlen=maxlen)
+        self._block_cache: Dict[Tuple[int, bool], _RecentBlock] = {}
 
     def log(self, log_event: LogEvent):
         """记录一次事件"""
         self.records.append(log_event)
-        if len(self.records) > self.maxlen:
-            self.records.pop(0)
+        for (_, with_timestamp), block in self._block_cache.items():
+            block.push(log_event.render(with_timestamp))
         return log_event
 
-    def render_recent(self, n=3):
+    def render_recent(self, n=3, with_timestamp=True):
         """渲染最近几条记录"""
-        return "\n".join(e.render() for e in self.records[-n:])
+        if n <= 0:
+            return ""
+        # 按请求条数（不超过环形缓冲区容量）缓存，记录增长时仍命中同一个块
+        key = (min(n, self.maxlen), with_timestamp)
+        block = self._block_cache.get(key)
+        if block is None:
+            recent = islice(self.records, max(len(self.records) - key[0], 0), None)
+            block = _RecentBlock(key[0], [e.render(with_timestamp) for e in recent])
+            self._block_cache[key] = block
+        return block.text
+
+    def oldest(self, n: int) -> List[LogEvent]:
+        """最早的 n 条记录"""
+        return list(islice(self.records, n))
+
+    def discard_oldest(self, events: List[LogEvent]):
+        """丢弃已被折叠进摘要的最早记录（其中已被环形缓冲区挤掉的部分自然跳过）"""
+        folded = {id(e) for e in events}
+        while self.records and id(self.records[0]) in folded:
+            self.records.popleft()
+        self._block_cache.clear()
 
     def __len__(self):
         return len(self.records)
 
     def clear(self):
         self.records.clear()
+        self._block_cache.clear()
 
 # =========================================================
 # 🧩 Frame：栈帧对象（包含自己的 StackLogger）
@@ -48,6 +101,9 @@ class Frame:
         self.ret_key = ret_key
         self.fail_reason = None
         self.step_counter = 0
+        # 较早历史的滚动摘要（见 HistoryCompactor），以及进行中的压缩任务 (future, 被折叠的记录)
+        self.summary: Optional[str] = None
+        self.compaction = None
 
         # ✅ 每个帧都自带日志记录器
         self.logger = FrameLogger(name=self.name)
@@ -58,14 +114,24 @@ class Frame:
         log_event.append_data({"step": self.step_counter})
         return self.logger.log(log_event)
 
-    def render_text(self):
-        """渲染当前帧的简短状态描述"""
+    def render_text(self, record_step: int = RECORD_STEP, brief: bool = False, with_timestamp: bool = True):
+        """
+        渲染当前帧的简短状态描述
+        :param record_step: 输出的历史条数
+        :param brief: 只输出函数名与描述（预算不足时用于较低的栈帧）
+        :param with_timestamp: 历史记录是否带挂钟时间
+        """
         lines = [f"Function {self.name}: {self.description}"]
+        if brief:
+            return "\n".join(lines)
         if self.variables:
             lines.append(f"Variables: {self.variables}")
-        if len(self.logger):
-            lines.append("[Execution History]")
-            lines.append(self.logger.render_recent(RECORD_STEP))
+        if self.summary:
+            lines.append(f"[Summary of earlier steps] {self.summary}")
+        if len(self.logger) and record_step > 0:
+            omitted = len(self.logger) - record_step
+            lines.append("[Execution History]" + (f" ({omitted} earlier steps omitted)" if omitted > 0 else ""))
+            lines.append(self.logger.render_recent(record_step, with_timestamp))
         if self.instruction:
             lines.append(f"-> INSTRUCTION: {self.instruction}")
         if self.fail_reason:
@@ -82,11 +148,22 @@ class Frame:
 from .stack_window import StackPromptWindow
 
 class FlowStackPromptWindow(StackPromptWindow):
+    budget_priority = 70
+    budget_min_share = 0.15
+    # 执行历史每一步都会变化
+    prompt_volatility = 90
 
-    def __init__(self, window_title='FlowStackWindow'):
+    def __init__(self, window_title='FlowStackWindow', compactor: Optional[HistoryCompactor] = None):
+        """
+        :param compactor: 可选的 HistoryCompactor，帧内历史过长时把较早的记录折叠为摘要；
+                          未指定且设置了 LLMOS_HISTORY_COMPACTION=1 时使用进程共享的压缩器
+        """
         # 💡 基类构造函数
         BasePromptWindow.__init__(self, window_title=window_title, meta_file=META_FILE)
         self.stack: List[Frame] = []
+        self.compactor = compactor or (get_history_compactor() if HISTORY_COMPACTION else None)
+        # 后台摘要完成时只置位该标志，由 begin_turn 在下一回合开始时（主线程）换入
+        self._compaction_ready = threading.Event()
         self._init_root_frame()
 
     def export_state_prompt(self):
@@ -94,13 +171,75 @@ class FlowStackPromptWindow(StackPromptWindow):
         if not self.stack:
             return "### STACK EMPTY ###\n"
 
-        parts = [frame.render_text() for frame in self.stack]
+        parts = [frame.render_text(with_timestamp=self.render_timestamps) for frame in self.stack]
+        return "### FLOW STACK DATA ###\n" + "\n".join(parts)
+
+    def export_compact_state_prompt(self, level: int) -> Optional[str]:
+        """
+        逐级缩短栈顶帧的执行历史；从 LOWER_FRAME_HISTORY_LEVEL 起较低的栈帧不再输出历史，
+        最后一级把较低的栈帧缩为一行。
+        """
+        if level <= 0:
+            return self.export_state_prompt()
+        if not self.stack or level > len(COMPACT_RECORD_STEPS):
+            return None
+        top_step = COMPACT_RECORD_STEPS[min(level, len(COMPACT_RECORD_STEPS) - 1)]
+        lower_step = 0 if level >= LOWER_FRAME_HISTORY_LEVEL else top_step
+        lower_brief = level == len(COMPACT_RECORD_STEPS)
+        parts = [frame.render_text(lower_step, brief=lower_brief, with_timestamp=self.render_timestamps)
+                 for frame in self.stack[:-1]]
+        parts.append(self.stack[-1].render_text(top_step, with_timestamp=self.render_timestamps))
         return "### FLOW STACK DATA ###\n" + "\n".join(parts)
 
     def record_event(self, log_event: LogEvent):
         """在当前栈帧记录事件"""
         if self.stack:
             self.stack[-1].record_event(log_event)
+            self._schedule_compaction(self.stack[-1])
+
+    def _schedule_compaction(self, frame: Frame):
+        """帧内历史超过阈值时，在后台为最早的若干条记录生成摘要（不阻塞当前回合）"""
+        compactor = self.compactor
+        if compactor is None or frame.compaction is not None or not compactor.should_compact(len(frame.logger)):
+            return
+        events = frame.logger.oldest(compactor.batch)
+        lines = [event.render(with_timestamp=False) for event in events]
+        future = compactor.submit(frame.name, frame.summary, lines)
+        frame.compaction = (future, events)
+        # 回调运行在压缩线程中：只置位线程安全的标志，不触碰窗口状态
+        future.add_done_callback(lambda _: self._compaction_ready.set())
+
+    def begin_turn(self):
+        """回合开始时换入已完成的摘要"""
+        if not self._compaction_ready.is_set():
+            return
+        # 先清除标志：换入期间完成的摘要会再次置位，留到下一回合
+        self._compaction_ready.clear()
+        if self._collect_compactions():
+            self.mark_dirty()
+
+    def _collect_compactions(self) -> bool:
+        """
+        在主线程中换入已完成的摘要：更新帧的滚动摘要并丢弃被折叠的原始记录
+        :return: 是否有帧的状态发生变化
+        """
+        changed = False
+        if self.compactor is None:
+            return changed
+        for frame in self.stack:
+            if frame.compaction is None or not frame.compaction[0].done():
+                continue
+            future, events = frame.compaction
+            frame.compaction = None
+            try:
+                frame.summary = future.result()
+            except Exception as e:
+                print(f"[history compactor] 帧 {frame.name} 的历史摘要失败: {e}")
+                continue
+            frame.logger.discard_oldest(events)
+            changed = True
+            self._schedule_compaction(frame)
+        return changed
 
     def forward(self, *args, **kwargs):
         return super().forward(*args, **kwargs)
@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+# 帧内的历史达到 COMPACT_THRESHOLD 条时，把最早的 COMPACT_BATCH 条折叠进该帧的滚动摘要
+# （需小于 FrameLogger 的 maxlen，保证摘要生成期间这些记录不会先被环形缓冲区挤掉）
+COMPACT_THRESHOLD = 16
+COMPACT_BATCH = 8
+# 连续失败这么多次后停用压缩（例如没有配置可用的模型），避免每回合都发起注定失败的请求
+MAX_FAILURES = 3
+# 设为 1 时 FlowStackPromptWindow 默认启用压缩
+HISTORY_COMPACTION = os.getenv("LLMOS_HISTORY_COMPACTION", "0") == "1"
+# api_config.yaml 中指定压缩模型的键，格式与 default 相同：compaction: {name: <模型名>}
+COMPACTION_CONFIG_KEY = "compaction"
+
+SUMMARY_SYSTEM_PROMPT = """You compress an agent's execution history.
+Merge the previous summary and the new events into ONE updated summary paragraph.
+Keep facts the agent still needs: places visited, objects found and where, actions that failed and why,
+subgoals completed, and the current progress. Drop timestamps and repetition.
+Output only the summary, at most 80 words."""
+
+
+class HistoryCompactor:
+    """
+    在后台线程中用较便宜的模型把帧内较早的执行历史折叠为滚动摘要。
+    调用方（FlowStackPromptWindow）提交任务后立即返回，摘要完成后由调用方在下一次渲染时换入，
+    因此压缩从不增加回合的延迟。
+    """
+
+    def __init__(self, model_name: Optional[str] = None, client=None, threshold: int = COMPACT_THRESHOLD,
+                 batch: int = COMPACT_BATCH):
+        """
+        :param model_name: 压缩所用的模型，默认取 api_config.yaml 中 compaction 项，没有时使用默认模型
+        :param client: 可选的 LLMClient（或兼容 chat() 的对象），默认在后台线程中首次使用时创建
+        """
+        self.model_name = model_name
+        self.threshold = threshold
+        self.batch = batch
+        self.enabled = True
+        self.failures = 0
+        self._client = client
+        self._client_lock = threading.Lock()
+        # 单线程：同一帧的摘要按提交顺序依次滚动
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-compactor")
+
+    def _get_client(self):
+        with self._client_lock:
+            if self._client is None:
+                from llmos_core.llmos_util.api_client import LLMClient
+                client = LLMClient()
+                model_name = self.model_name or client.api_configs.get(COMPACTION_CONFIG_KEY, {}).get("name")
+                if model_name:
+                    client.set_model(model_name)
+                self._client = client
+            return self._client
+
+    def should_compact(self, history_len: int) -> bool:
+        return self.enabled and history_len >= self.threshold
+
+    def submit(self, frame_name: str, previous_summary: Optional[str], lines: List[str]) -> Future:
+        """提交一次摘要任务，Future 的结果为新的摘要文本"""
+        return self._executor.submit(self._summarize, frame_name, previous_summary, lines)
+
+    def _summarize(self, frame_name: str, previous_summary: Optional[str], lines: List[str]) -> str:
+        prompt = (f"FRAME: {frame_name}\n"
+                  f"PREVIOUS SUMMARY:\n{previous_summary or '(none)'}\n\n"
+                  f"NEW EVENTS:\n" + "\n".join(lines))
+        try:
+            response = self._get_client().chat(messages=prompt, system_prompt=SUMMARY_SYSTEM_PROMPT,
+                                               temperature=0.2, max_tokens=256)
+            summary = (getattr(response, "content", None) or "").strip()
+            if not summary:
+                raise ValueError("empty summary")
+        except Exception:
+            self.failures += 1
+            if self.failures >= MAX_FAILURES:
+                self.enabled = False
+                print(f"[history compactor] 连续失败 {self.failures} 次，停用历史压缩")
+            raise
+        self.failures = 0
+        return summary
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_compactor: Optional[HistoryCompactor] = None
+_compactor_lock = threading.Lock()
+
+
+def get_history_compactor() -> HistoryCompactor:
+    """进程共享的压缩器（所有窗口共用一个后台线程与模型客户端）"""
+    global _compactor
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = HistoryCompactor()
+        return _compactor
@@ -1 +1,2 @@
-from .PromptMainBoard import PromptMainBoard,parse_response
\ No newline at end of file
+from .PromptMainBoard import PromptMainBoard,parse_response
+from .json_repair import repair_json_locally, get_repair_stats
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import List, Optional, Tuple
+
+# 修复结果的 LRU 缓存大小（按输入文本的哈希记忆）
+REPAIR_CACHE_SIZE = 256
+
+_NUMBER_RE = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+_WORD_RE = re.compile(r'[A-Za-z_$][\w$\-.]*')
+_HEX4_RE = re.compile(r'[0-9a-fA-F]{4}')
+_WORD_LITERALS = {
+    "true": "true", "True": "true", "TRUE": "true",
+    "false": "false", "False": "false", "FALSE": "false",
+    "null": "null", "None": "null", "none": "null", "NULL": "null",
+    "NaN": "null", "Infinity": "null", "undefined": "null",
+}
+_CLOSERS = {"{": "}", "[": "]"}
+
+# 各解析路径被采用的次数：direct(直接解析) / local(本地修复) / llm(大模型修复) / failed(全部失败)
+REPAIR_STATS = Counter()
+_stats_lock = threading.Lock()
+
+_cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def record_parse_path(path: str):
+    """记录一次解析所走的路径"""
+    with _stats_lock:
+        REPAIR_STATS[path] += 1
+
+
+def get_repair_stats() -> dict:
+    with _stats_lock:
+        return dict(REPAIR_STATS)
+
+
+def repair_json_locally(text: str) -> Optional[str]:
+    """
+    确定性的本地 JSON 修复，能修复时返回可被 json.loads 解析的文本，否则返回 None。
+
+    处理的常见缺陷：
+    - JSON 前后的说明文字、Markdown 代码块标记
+    - 单引号字符串、字符串内未转义的双引号、字符串中的裸换行、非法转义
+    - 未加引号的键、Python 字面量 (True / False / None)
+    - 尾随逗号、重复逗号、缺失的逗号、// 与 /* */ 注释
+    - 未闭合的字符串 / 括号（在末尾补齐）
+    - 连续输出的多个顶层值（合并为数组，每个值保持原样，不会把数组展开拼接）
+
+    说明文字中的括号（如 "[step 1]"）也可能被当作顶层值，调用方需要自行筛选结果。
+
+    结果按输入文本的哈希缓存。
+    """
+    key = hashlib.sha1(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    try:
+        repaired = _Repairer(text).run()
+    except Exception:
+        repaired = None
+
+    with _cache_lock:
+        _cache[key] = repaired
+        if len(_cache) > REPAIR_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return repaired
+
+
+def _closes_string(text: str, pos: int) -> bool:
+    """引号之后（跳过空白与注释）若是 , : } ] 或文本结束，则认为该引号是字符串的结束"""
+    n = len(text)
+    while pos < n:
+        if text[pos] in " \t\r\n":
+            pos += 1
+        elif text.startswith("//", pos):
+            end = text.find("\n", pos)
+            pos = n if end < 0 else end
+        elif text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            pos = n if end < 0 else end + 2
+        else:
+            break
+    return pos >= n or text[pos] in ",:}]"
+
+
+class _Repairer:
+    """单遍扫描：宽松地切分 token，同时输出合法的 JSON 文本"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.n = len(text)
+        self.i = 0
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        self.last = "open"  # 上一个 token：open / value / sep / colon
+        self.values: List[str] = []  # 已完成的顶层值
+
+    def run(self) -> Optional[str]:
+        while self.i < self.n:
+            if not self.stack:
+                # 顶层：跳过说明文字，直到下一个对象 / 数组开始
+                start = self._find_top_level_start()
+                if start < 0:
+                    break
+                self.i = start
+            self._step()
+
+        if self.stack:
+            self._close_all()
+        if not self.values:
+            return None
+
+        parsed = []
+        for value in self.values:
+            try:
+                parsed.append(json.loads(value))
+            except json.JSONDecodeError:
+                return None
+        if len(parsed) == 1:
+            return self.values[0]
+        # 多个顶层值：按出现顺序合并为数组
+        return json.dumps(parsed, ensure_ascii=False)
+
+    def _find_top_level_start(self) -> int:
+        positions = [p for p in (self.text.find("{", self.i), self.text.find("[", self.i)) if p >= 0]
+        return min(positions) if positions else -1
+
+    # === token 处理 ===
+    def _step(self):
+        text, i = self.text, self.i
+        ch = text[i]
+
+        if ch in " \t\r\n":
+            self.out.append(ch)
+            self.i += 1
+        elif ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            self.i = self.n if end < 0 else end
+        elif ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            self.i = self.n if end < 0 else end + 2
+        elif ch in "{[":
+            self._before_value()
+            self.out.append(ch)
+            self.stack.append(ch)
+            self.last = "open"
+            self.i += 1
+        elif ch in "}]":
+            self._close(ch)
+            self.i += 1
+        elif ch == ",":
+            if self.last not in ("sep", "open"):
+                self.out.append(",")
+                self.last = "sep"
+            self.i += 1
+        elif ch == ":":
+            self.out.append(":")
+            self.last = "colon"
+            self.i += 1
+        elif ch in "\"'":
+            self._before_value()
+            literal, self.i = self._read_string(i, ch)
+            self.out.append(literal)
+            self.last = "value"
+        elif ch == "-" or ch == "." or ch.isdigit():
+            match = _NUMBER_RE.match(text, i)
+            if match:
+                self._before_value()
+                number = match.group(0)
+                if number.startswith("."):
+                    number = "0" + number
+                elif number.startswith("-."):
+                    number = "-0" + number[1:]
+                if number.endswith("."):
+                    number += "0"
+                self.out.append(number)
+                self.last = "value"
+                self.i = match.end()
+            else:
+                self.i += 1
+        else:
+            match = _WORD_RE.match(text, i)
+            if match:
+                self._before_value()
+                word = match.group(0)
+                self.out.append(_WORD_LITERALS.get(word) or json.dumps(word, ensure_ascii=False))
+                self.last = "value"
+                self.i = match.end()
+            else:
+                # 其他无法识别的字符（反引号、分号等）直接丢弃
+                self.i += 1
+
+    def _before_value(self):
+        """在容器内两个值之间缺少逗号时补上"""
+        if self.stack and self.last == "value":
+            self.out.append(",")
+            self.last = "sep"
+
+    def _strip_trailing_comma(self):
+        idx = len(self.out) - 1
+        while idx >= 0 and self.out[idx].isspace():
+            idx -= 1
+        if idx >= 0 and self.out[idx] == ",":
+            del self.out[idx]
+
+    def _close(self, ch: str):
+        if not self.stack or ch not in [_CLOSERS[c] for c in self.stack]:
+            # 没有与之匹配的开括号：丢弃
+            return
+        # 关闭中间未闭合的容器，直到遇到匹配的那一层
+        while self.stack:
+            opener = self.stack.pop()
+            self._finish_container(_CLOSERS[opener])
+            if _CLOSERS[opener] == ch:
+                break
+        self._after_container()
+
+    def _close_all(self):
+        while self.stack:
+            self._finish_container(_CLOSERS[self.stack.pop()])
+        self._after_container()
+
+    def _finish_container(self, closer: str):
+        if self.last == "colon":
+            self.out.append("null")
+        self._strip_trailing_comma()
+        self.out.append(closer)
+        self.last = "value"
+
+    def _after_container(self):
+        if not self.stack:
+            self.values.append("".join(self.out).strip())
+            self.out = []
+            self.last = "open"
+
+    def _read_string(self, start: int, quote: str) -> Tuple[str, int]:
+        text, n = self.text, self.n
+        j = start + 1
+        buf = []
+        while j < n:
+            ch = text[j]
+            if ch == "\\":
+                nxt = text[j + 1] if j + 1 < n else ""
+                if nxt and nxt in '"\\/bfnrt':
+                    buf.append("\\" + nxt)
+                    j += 2
+                elif nxt == "u" and _HEX4_RE.match(text, j + 2):
+                    buf.append(text[j:j + 6])
+                    j += 6
+                elif nxt == "'":
+                    buf.append("'")
+                    j += 2
+                else:
+                    # 非法转义：把反斜杠本身转义
+                    buf.append("\\\\")
+                    j += 1
+                continue
+            if ch == quote:
+                if _closes_string(text, j + 1):
+                    return '"' + "".join(buf) + '"', j + 1
+                # 字符串内部未转义的引号
+                buf.append('\\"' if quote == '"' else "'")
+            elif ch == '"':
+                buf.append('\\"')
+            elif ch == "\n":
+                buf.append("\\n")
+            elif ch == "\r":
+                buf.append("\\r")
+            elif ch == "\t":
+                buf.append("\\t")
+            elif ord(ch) >= 0x20:
+                buf.append(ch)
+            j += 1
+        # 未闭合的字符串：在文本末尾补上引号
+        return '"' + "".join(buf) + '"', n
@@ -0,0 +1,218 @@
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from llmos_core.Prompts.json_repair import repair_json_locally
+from llmos_core.schema import LLMOSCall
+
+
+class ScannedObject(NamedTuple):
+    """扫描出的一个顶层对象片段"""
+    start: int  # 片段在整段输出中的起始位置
+    raw: str
+    value: Optional[Dict[str, Any]]  # 解析结果，json.loads 失败时为 None
+
+
+class IncrementalJSONScanner:
+    """
+    增量 JSON 扫描器。
+    逐段喂入模型的流式输出，每当一个顶层 JSON 对象的右花括号到达，就立即返回该对象的片段。
+
+    ✅ 单个对象 / 对象数组 ( [{...}, {...}] ) 都适用：数组的括号与逗号在对象之外，会被直接跳过
+    ✅ 对象之外的 Markdown 代码块标记、前后说明文字同样会被跳过；
+       说明文字中的 {（其后第一个非空白字符不是引号或 }）不会被当作对象的开始
+    ✅ 正确处理字符串中的括号与转义字符
+    """
+
+    def __init__(self):
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False  # 刚进入顶层对象，尚未看到第一个非空白字符
+        self._offset = 0  # 已喂入的字符数
+        self._start = 0  # 当前对象的起始位置
+
+    def feed(self, text: str) -> List[ScannedObject]:
+        """喂入一段文本，返回其中新完成的所有顶层对象（按出现顺序）"""
+        completed = []
+        for position, ch in enumerate(text, self._offset):
+            if self._depth == 1 and self._expect_key and not ch.isspace():
+                self._expect_key = False
+                if ch not in "\"'}":
+                    # 说明文字中的花括号，不是 JSON 对象
+                    self._depth = 0
+                    self._buf = []
+
+            if self._depth == 0:
+                # 对象之外：只关心新对象的开始
+                if ch == "{":
+                    self._buf = [ch]
+                    self._depth = 1
+                    self._expect_key = True
+                    self._start = position
+                continue
+
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._buf)
+                    completed.append(ScannedObject(self._start, raw, self._parse(raw)))
+                    self._buf = []
+        self._offset += len(text)
+        return completed
+
+    @staticmethod
+    def _parse(raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        return obj if isinstance(obj, dict) else None
+
+    @property
+    def pending(self) -> str:
+        """尚未闭合的对象片段（流结束时仍不为空说明输出被截断）"""
+        return "".join(self._buf) if self._depth else ""
+
+    @property
+    def pending_start(self) -> Optional[int]:
+        return self._start if self._depth else None
+
+
+def fragment_calls(fragment: ScannedObject) -> Optional[List[Dict[str, Any]]]:
+    """
+    片段中的 Syscall：解析失败时先尝试本地修复；不含 func_name 的对象（说明性的 JSON）被跳过。
+    无法在本地修复时返回 None。
+    """
+    value = fragment.value
+    if value is None:
+        repaired = repair_json_locally(fragment.raw)
+        if repaired is None:
+            return None
+        value = json.loads(repaired)
+    items = value if isinstance(value, list) else [value]
+    return [item for item in items if isinstance(item, dict) and item.get("func_name")]
+
+
+class StreamingSyscallDispatcher:
+    """
+    流式 Syscall 分发器。
+    消费 LLMClient.chat_stream / achat_stream 产生的 delta：
+        - content 中的 JSON Syscall 一旦完整，立即通过 PromptMainBoard.handle_call 执行
+        - 原生 tool_calls 在下一个 tool_call 开始（或流结束）时视为完整并执行
+    与非流式路径一致，回复中出现原生 tool_calls 时只执行 tool_calls：
+    第一个 tool_call delta 到达后不再即时执行 content 中的片段，流结束时也不再解析 content。
+    调用严格按输出顺序执行：遇到本地无法修复的片段后，不再即时执行之后的对象，
+    流结束时把该片段及其之后的全部内容交给 PromptMainBoard.apply_response 统一解析（含大模型修复）。
+    on_call(result) 在每次调用执行后触发，可用于即时推送 UI 更新。
+    """
+
+    def __init__(self, board, auto_record: bool = True, on_call: Optional[Callable[[Any], None]] = None):
+        self.board = board
+        self.auto_record = auto_record
+        self.on_call = on_call
+        self.scanner = IncrementalJSONScanner()
+        self.calls: List[Any] = []
+        self._content_parts: List[str] = []
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+        self._dispatched_tool_calls = 0
+        self._held_from: Optional[int] = None  # 第一个无法修复的片段的起始位置
+
+    def feed_delta(self, delta):
+        """处理一个流式 delta（choices[0].delta）"""
+        # 先登记 tool_calls：同一个 delta 中的 content 不再被执行
+        for tc in getattr(delta, "tool_calls", None) or []:
+            # 新的 tool_call 开始，说明之前的 tool_call 参数已经完整
+            self._flush_tool_calls(upto=tc.index)
+            entry = self._tool_calls.setdefault(tc.index, {"id": None, "name": "", "arguments": ""})
+            if tc.id:
+                entry["id"] = tc.id
+            if tc.function:
+                entry["name"] += tc.function.name or ""
+                entry["arguments"] += tc.function.arguments or ""
+
+        content = getattr(delta, "content", None)
+        if content:
+            self.feed_text(content)
+
+    def feed_text(self, text: str):
+        self._content_parts.append(text)
+        if self._tool_calls:
+            # 已经出现原生 tool_calls：content 只作为说明文字保留
+            return
+        for fragment in self.scanner.feed(text):
+            if self._held_from is not None:
+                continue
+            calls = fragment_calls(fragment)
+            if calls is None:
+                self._held_from = fragment.start
+                continue
+            for call in calls:
+                self._dispatch(call)
+
+    def finish(self) -> Tuple[str, List[Any]]:
+        """流结束：执行剩余的 tool_calls，必要时回退到完整解析。返回 (response_text, calls)"""
+        self._flush_tool_calls(upto=None)
+        response_text = self.response_text
+
+        if not self._tool_calls:
+            rest_from = self._held_from if self._held_from is not None else self.scanner.pending_start
+            if not self.calls and response_text.strip():
+                # 增量扫描没有得到任何调用：对整段文本走原有的解析（含 JSON 修复）路径
+                self.calls = self.board.apply_response(response_text, auto_record=self.auto_record)
+            elif rest_from is not None:
+                # 损坏或被截断的片段及其之后的内容：在已执行的调用之后按原顺序解析执行
+                self.calls.extend(self.board.apply_response(response_text[rest_from:], auto_record=self.auto_record))
+        return response_text, self.calls
+
+    @property
+    def response_text(self) -> str:
+        return "".join(self._content_parts)
+
+    @property
+    def tool_calls(self) -> List[Dict[str, Any]]:
+        """按 OpenAI 消息格式重建的 tool_calls（用于记录）"""
+        return [
+            {
+                "id": entry["id"],
+                "type": "function",
+                "function": {"name": entry["name"], "arguments": entry["arguments"]},
+            }
+            for _, entry in sorted(self._tool_calls.items())
+        ]
+
+    def _flush_tool_calls(self, upto: Optional[int]):
+        """执行索引小于 upto（为 None 时执行全部）且尚未执行的 tool_calls"""
+        for index in sorted(self._tool_calls):
+            if index < self._dispatched_tool_calls:
+                continue
+            if upto is not None and index >= upto:
+                break
+            entry = self._tool_calls[index]
+            call = LLMOSCall(
+                call_type="tool",
+                func_name=entry["name"],
+                kwargs=json.loads(entry["arguments"] or "{}"),
+            )
+            self._dispatch(call)
+            self._dispatched_tool_calls = index + 1
+
+    def _dispatch(self, call):
+        result = self.board.handle_call(call, auto_record=self.auto_record)
+        self.calls.append(result)
+        if self.on_call:
+            self.on_call(result)
@@ -0,0 +1,182 @@
+"""
+提示词的 token 预算。
+
+每个窗口按优先级 (priority) 与最低份额 (min_share) 参与分配：
+    - 先以完整形式渲染全部窗口并估算 token 数
+    - 超出预算时，从优先级最低的窗口开始逐级压缩（export_compact_state_prompt(level)），
+      直到总量落入预算，或该窗口已压缩到其最低份额
+    - 若仍超出，再忽略最低份额压缩一轮：宁可挤占份额，也不能让请求被服务端拒绝
+各窗口的压缩策略由窗口自己决定（较早的历史、较低的栈帧、堆中的长值 ...）。
+
+模型的预算来自 api_config.yaml 中的 prompt_budget 字段，也可以通过环境变量 LLMOS_PROMPT_BUDGET 设置默认值。
+"""
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import tiktoken  # 可选依赖：安装后使用真实的分词器计数
+except ImportError:
+    tiktoken = None
+
+# 默认的提示词 token 上限；0 表示不限制
+DEFAULT_PROMPT_BUDGET = int(os.getenv("LLMOS_PROMPT_BUDGET", "0")) or None
+TIKTOKEN_ENCODING = "cl100k_base"
+# 启发式估算：ASCII 文本约 4 个字符一个 token，其余字符（中文等）按一个字符一个 token 计
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TIKTOKEN_ENCODING)
+    except Exception as e:
+        # 编码表需要联网下载，离线时退回启发式估算
+        print(f"[token budget] tiktoken 不可用，改用估算: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    if text.isascii():
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return math.ceil(ascii_chars / CHARS_PER_TOKEN) + (len(text) - ascii_chars)
+
+
+def estimate_tools_tokens(tools: Optional[List[dict]]) -> int:
+    if not tools:
+        return 0
+    return estimate_tokens(json.dumps(tools, ensure_ascii=False))
+
+
+@dataclass
+class WindowPolicy:
+    priority: int = 50  # 越大越重要，越晚被压缩
+    min_share: float = 0.0  # 在预算中保底的比例（0 ~ 1）
+
+
+@dataclass
+class WindowUsage:
+    window_title: str
+    priority: int
+    level: int = 0  # 0 为完整渲染
+    tokens: int = 0
+
+
+@dataclass
+class BudgetReport:
+    max_tokens: Optional[int]
+    fixed_tokens: int = 0  # 不参与压缩的部分（系统窗口、tools）
+    windows: List[WindowUsage] = field(default_factory=list)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.fixed_tokens + sum(w.tokens for w in self.windows)
+
+    @property
+    def within_budget(self) -> bool:
+        return self.max_tokens is None or self.total_tokens <= self.max_tokens
+
+    @property
+    def compacted(self) -> Dict[str, int]:
+        """被压缩的窗口 -> 压缩级别"""
+        return {w.window_title: w.level for w in self.windows if w.level}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.max_tokens,
+            "total_tokens": self.total_tokens,
+            "fixed_tokens": self.fixed_tokens,
+            "within_budget": self.within_budget,
+            "windows": {w.window_title: {"level": w.level, "tokens": w.tokens} for w in self.windows},
+        }
+
+
+class TokenBudget:
+    """
+    为 PromptMainBoard 的用户窗口分配 token 预算。
+    窗口的默认策略来自类属性 budget_priority / budget_min_share，可按窗口标题覆盖：
+        budget = TokenBudget(max_tokens=8000, reserve_tokens=512)
+        budget.set_policy("Heap", priority=10)
+    """
+
+    def __init__(self, max_tokens: Optional[int] = DEFAULT_PROMPT_BUDGET, reserve_tokens: int = 0,
+                 policies: Optional[Dict[str, WindowPolicy]] = None):
+        """
+        :param max_tokens: 提示词的 token 上限，None 表示不限制（调用时可按模型覆盖）
+        :param reserve_tokens: 预留的余量（估算误差、消息格式开销等）
+        :param policies: 窗口标题 -> WindowPolicy
+        """
+        self.max_tokens = max_tokens
+        self.reserve_tokens = reserve_tokens
+        self.policies: Dict[str, WindowPolicy] = dict(policies or {})
+
+    def set_policy(self, window_title: str, priority: Optional[int] = None, min_share: Optional[float] = None):
+        policy = self.policies.setdefault(window_title, WindowPolicy())
+        if priority is not None:
+            policy.priority = priority
+        if min_share is not None:
+            policy.min_share = min_share
+
+    def policy_for(self, window) -> WindowPolicy:
+        policy = self.policies.get(window.window_title)
+        if policy is not None:
+            return policy
+        return WindowPolicy(priority=getattr(window, "budget_priority", 50),
+                            min_share=getattr(window, "budget_min_share", 0.0))
+
+    def fit(self, windows: list, measure: Callable[[Any, int], Optional[int]], fixed_tokens: int = 0,
+            max_tokens: Optional[int] = None) -> BudgetReport:
+        """
+        为每个窗口选择压缩级别。
+        :param windows: 参与分配的窗口
+        :param measure: measure(window, level) -> 该级别渲染后的 token 数；窗口无法再压缩时返回 None
+        :param fixed_tokens: 不可压缩部分的 token 数
+        :param max_tokens: 覆盖 self.max_tokens（例如按模型配置）
+        """
+        limit = max_tokens if max_tokens is not None else self.max_tokens
+        policies = [self.policy_for(window) for window in windows]
+        report = BudgetReport(max_tokens=limit, fixed_tokens=fixed_tokens)
+        report.windows = [WindowUsage(window_title=window.window_title, priority=policy.priority,
+                                      tokens=measure(window, 0) or 0)
+                          for window, policy in zip(windows, policies)]
+        if limit is None:
+            return report
+
+        available = max(0, limit - self.reserve_tokens - fixed_tokens)
+        order = sorted(range(len(windows)), key=lambda i: policies[i].priority)
+        total = sum(usage.tokens for usage in report.windows)
+
+        def compact(i: int, floor: float) -> int:
+            usage = report.windows[i]
+            nonlocal total
+            while total > available and usage.tokens > floor:
+                tokens = measure(windows[i], usage.level + 1)
+                if tokens is None:
+                    break
+                total += tokens - usage.tokens
+                usage.level += 1
+                usage.tokens = tokens
+            return total
+
+        for i in order:
+            if compact(i, policies[i].min_share * available) <= available:
+                return report
+        # 最低份额也放不下：按优先级继续压缩到底
+        for i in order:
+            if compact(i, 0) <= available:
+                return report
+
+        print(f"[token budget] 压缩后仍超出预算: {total + fixed_tokens} > {limit}")
+        return report
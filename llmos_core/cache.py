@@ -1,91 +1,325 @@
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
 import json
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 每累计多少条记录做一次 fsync（flush 每条都会做，保证同进程内的读取立即可见）
+FSYNC_EVERY = 16
+# 距上次 fsync 超过该秒数时，下一次写入会立即 fsync
+FSYNC_INTERVAL = 1.0
+
+# 索引文件中每条记录的偏移量：小端 uint64
+_OFFSET = struct.Struct("<Q")
+
+
+@contextmanager
+def _file_lock(fp):
+    """跨进程的排他文件锁（同一文件的多个 CacheManager 之间互斥写入）"""
+    if fcntl is not None:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+    else:
+        fp.seek(0)
+        msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            fp.seek(0)
+            msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
 
 
 class CacheManager:
     """
     管理缓存加载、迭代和写入。
+    缓存文件为追加写入的 JSON Lines（每行一条记录），旁边的 <cache_file>.idx 索引文件
+    按顺序保存每条记录在缓存文件中的字节偏移：
+        - 追加一条记录是 O(1) 的，不再重写整个文件
+        - 可以按轮次随机读取，迭代时也只读取需要的那一行
+        - 进程崩溃导致的半行记录 / 索引缺失会在打开时自动截断或重建
+        - 旧版的 JSON 数组格式缓存（cache_file 本身，或 legacy_file 指向的旧文件）会在打开时自动迁移
+        - 同一文件可以被多个实例（包括其他进程）同时打开：追加写入在 <cache_file>.lock 文件锁内完成，
+          写入前从磁盘重新读取文件末尾与记录数，读取时也以索引文件的实际大小为准
+
     提供：
         - next_record()       获取下一条缓存
+        - get_record(index)   按轮次读取缓存
         - append_record()     追加新的缓存记录
         - reset()             重置迭代器
+        - sync() / close()    将缓冲的写入落盘
     """
 
-    def __init__(self, cache_file: Path,clear_cache_file: bool = True):
-        self.cache_file = cache_file
-        self._iter = None
+    def __init__(self, cache_file: Path, clear_cache_file: bool = True, fsync_every: int = FSYNC_EVERY,
+                 fsync_interval: float = FSYNC_INTERVAL, legacy_file: Optional[Path] = None):
+        """
+        :param legacy_file: 旧版 JSON 数组格式的缓存文件；cache_file 不存在或为空时从它迁移记录（旧文件保留不动）
+        """
+        self.cache_file = Path(cache_file)
+        self.index_file = self.cache_file.with_name(self.cache_file.name + ".idx")
+        self.lock_file = self.cache_file.with_name(self.cache_file.name + ".lock")
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._data_fp = None
+        self._index_fp = None
+        self._lock_fp = None
+        self._count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
         self._index = -1
         if clear_cache_file:
             self.clear()
+        else:
+            self._open()
 
     def clear(self):
         """真正执行清空缓存的动作"""
-        self.cache_file.parent.mkdir(exist_ok=True)
-        with open(self.cache_file, "w", encoding="utf8") as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
+        with self._lock:
+            self._close_files()
+            self.cache_file.parent.mkdir(exist_ok=True)
+            with self._process_lock():
+                open(self.cache_file, "wb").close()
+                open(self.index_file, "wb").close()
+            self._open_files()
+            self._count = 0
         self.reset()
 
     # === 内部方法 ===
-    def _load_cache(self):
-        """加载整个缓存文件为列表"""
-        if not self.cache_file.exists():
-            return []
+    def _open(self):
+        """打开已有缓存：必要时迁移旧格式，并修复崩溃留下的不完整数据"""
+        with self._lock:
+            self.cache_file.parent.mkdir(exist_ok=True)
+            with self._process_lock():
+                if not self.cache_file.exists():
+                    open(self.cache_file, "wb").close()
+                if self.cache_file.stat().st_size == 0 and self.legacy_file and self.legacy_file.exists():
+                    self._migrate_legacy(self.legacy_file)
+                else:
+                    self._migrate_legacy(self.cache_file)
+                self._recover()
+            self._open_files()
+
+    @contextmanager
+    def _process_lock(self):
+        """持有 <cache_file>.lock 的文件锁（需在 self._lock 内调用）"""
+        if self._lock_fp is None or self._lock_fp.closed:
+            self._lock_fp = open(self.lock_file, "a+b")
+        with _file_lock(self._lock_fp):
+            yield
+
+    def _open_files(self):
+        self._data_fp = open(self.cache_file, "ab")
+        self._index_fp = open(self.index_file, "ab")
+
+    def _close_files(self):
+        for fp in (self._data_fp, self._index_fp):
+            if fp is not None and not fp.closed:
+                fp.flush()
+                os.fsync(fp.fileno())
+                fp.close()
+        if self._lock_fp is not None and not self._lock_fp.closed:
+            self._lock_fp.close()
+        self._data_fp = self._index_fp = self._lock_fp = None
+        self._unsynced = 0
+
+    def _migrate_legacy(self, source: Path):
+        """旧版缓存是整个 JSON 数组，转换为 JSON Lines 写入 cache_file 并重建索引"""
+        with open(source, "rb") as f:
+            head = f.read(64).lstrip()
+        if not head.startswith(b"["):
+            return
 
         try:
-            with open(self.cache_file, "r", encoding="utf8") as f:
+            with open(source, "r", encoding="utf8") as f:
                 data = json.load(f)
-            if isinstance(data, list):
-                return data
-            else:
-                print(f"[cache] 非列表格式缓存，忽略 {self.cache_file}")
-                return []
         except json.JSONDecodeError:
-            print(f"[cache] 缓存损坏 {self.cache_file}")
-            return []
+            print(f"[cache] 缓存损坏 {source}")
+            data = []
+        if not isinstance(data, list):
+            print(f"[cache] 非列表格式缓存，忽略 {source}")
+            data = []
+        records = [raw for raw in data if isinstance(raw, dict)]
+        if len(records) < len(data):
+            print(f"[cache] 跳过 {len(data) - len(records)} 条非对象记录：{source}")
+
+        tmp_data = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        tmp_index = self.index_file.with_name(self.index_file.name + ".tmp")
+        offset = 0
+        with open(tmp_data, "wb") as df, open(tmp_index, "wb") as xf:
+            for raw in records:
+                line = self._encode(raw.get("prompt"), raw.get("response"))
+                df.write(line)
+                xf.write(_OFFSET.pack(offset))
+                offset += len(line)
+            df.flush()
+            os.fsync(df.fileno())
+            xf.flush()
+            os.fsync(xf.fileno())
+        os.replace(tmp_index, self.index_file)
+        os.replace(tmp_data, self.cache_file)
+        print(f"[cache] 已将旧格式缓存迁移为 JSON Lines：{len(records)} 条记录（{source} -> {self.cache_file}）")
+
+    def _recover(self):
+        """
+        以缓存文件为准校正索引：
+            - 截断末尾不完整（没有换行或无法解析）的记录
+            - 丢弃指向文件末尾之外的索引项，并补齐缺失的索引项
+        """
+        data_size = self.cache_file.stat().st_size
+        offsets = []
+        if self.index_file.exists():
+            raw = self.index_file.read_bytes()
+            raw = raw[:len(raw) - len(raw) % _OFFSET.size]
+            offsets = [o for (o,) in _OFFSET.iter_unpack(raw)]
+
+        # 只保留单调递增且位于文件内的索引项
+        valid = 0
+        prev = -1
+        while valid < len(offsets) and prev < offsets[valid] < data_size:
+            prev = offsets[valid]
+            valid += 1
+        offsets = offsets[:valid]
+
+        with open(self.cache_file, "rb+") as f:
+            # 从最后一条已索引的记录开始逐行校验（它本身也可能是被截断的）
+            scan_from = offsets.pop() if offsets else 0
+            f.seek(scan_from)
+            pos = scan_from
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n") or not self._is_valid_line(line):
+                    break
+                offsets.append(pos)
+                pos += len(line)
+            if pos < data_size:
+                print(f"[cache] 截断不完整的缓存尾部 {data_size - pos} 字节：{self.cache_file}")
+                f.truncate(pos)
+
+        with open(self.index_file, "wb") as f:
+            f.write(b"".join(_OFFSET.pack(o) for o in offsets))
+        self._count = len(offsets)
+
+    @staticmethod
+    def _is_valid_line(line: bytes) -> bool:
+        try:
+            return isinstance(json.loads(line), dict)
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _encode(prompt, response) -> bytes:
+        record = {"prompt": prompt, "response": response}
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf8")
+
+    def _maybe_sync(self):
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        for fp in (self._data_fp, self._index_fp):
+            if fp is not None and not fp.closed:
+                os.fsync(fp.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _refresh_count(self):
+        """以索引文件的实际大小为准（其他实例可能已经追加了记录）"""
+        try:
+            self._count = self.index_file.stat().st_size // _OFFSET.size
+        except FileNotFoundError:
+            self._count = 0
 
     # === 对外的方法 ===
+    def __len__(self):
+        with self._lock:
+            self._refresh_count()
+            return self._count
+
     def reset(self):
         """重置缓存迭代器"""
-        self._iter = None
         self._index = -1
 
-    def next_record(self):
+    def get_record(self, index: int):
         """
-        生成器形式读取缓存，返回：
+        按轮次读取一条缓存（支持负数下标），返回：
         {
             "index": i,
             "prompt": {...},
             "response": {...},
-            "meta": {}
         }
-        或 None（没有更多缓存）
         """
-        # 初始化迭代器
-        if self._iter is None:
-            data = self._load_cache()
-            self._iter = iter(data)
-
-        try:
-            raw = next(self._iter)
-        except StopIteration:
-            return None
+        with self._lock:
+            self._refresh_count()
+            if index < 0:
+                index += self._count
+            if not 0 <= index < self._count:
+                raise IndexError(f"cache record index out of range: {index}")
+            with open(self.index_file, "rb") as xf:
+                xf.seek(index * _OFFSET.size)
+                (offset,) = _OFFSET.unpack(xf.read(_OFFSET.size))
+            with open(self.cache_file, "rb") as df:
+                df.seek(offset)
+                raw = json.loads(df.readline())
 
-        self._index += 1
         return {
-            "index": self._index,
+            "index": index,
             "prompt": raw.get("prompt"),
             "response": raw.get("response"),
         }
 
+    def next_record(self):
+        """
+        逐条读取缓存，返回与 get_record() 相同结构的字典，
+        或 None（没有更多缓存）
+        """
+        if self._index + 1 >= len(self):
+            return None
+        self._index += 1
+        return self.get_record(self._index)
+
     def append_record(self, prompt, response):
         """将一次交互追加到缓存文件中"""
-        data = self._load_cache()
+        line = self._encode(prompt, response)
+        with self._lock:
+            if self._data_fp is None:
+                self._open_files()
+            with self._process_lock():
+                # 其他实例可能已经追加过：以磁盘上的文件末尾为准，而不是本实例记住的位置
+                self._data_fp.seek(0, os.SEEK_END)
+                offset = self._data_fp.tell()
+                self._data_fp.write(line)
+                self._data_fp.flush()
+                # 先写数据再写索引：崩溃时最多丢失索引项，打开时会从数据补齐
+                self._index_fp.write(_OFFSET.pack(offset))
+                self._index_fp.flush()
+                self._refresh_count()
+            self._maybe_sync()
 
-        data.append({
-            "prompt": prompt,
-            "response": response,
-        })
+    def sync(self):
+        """立即将缓冲的记录 fsync 到磁盘"""
+        with self._lock:
+            self._sync_locked()
 
-        self.cache_file.parent.mkdir(exist_ok=True)
-        with open(self.cache_file, "w", encoding="utf8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    def close(self):
+        with self._lock:
+            self._close_files()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
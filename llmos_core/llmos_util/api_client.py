@@ -1,17 +1,26 @@
+import uuid
+
 from llmos_core.config_manager import ConfigManager
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from openai.types.chat import ChatCompletionMessage
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
 from pathlib import Path
-from typing import List, Dict, Union, Optional, Any
+from typing import List, Dict, Union, Optional, Any, Iterator, AsyncIterator
 from pydantic import BaseModel
+from llmos_core.llmos_util.response_cache import ResponseCache, get_response_cache, make_cache_key
+
+# 流式请求要求服务商在末尾发送用量块，否则 usage 统计（及评测报告中的 token 数）对流式回合始终为 0
+STREAM_OPTIONS = {"include_usage": True}
 
 class LLMMessage(BaseModel):
     role: str
     content: str
 
 class LLMClient:
-    def __init__(self, model_name: str=None, specific_api_config_path=None):
+    def __init__(self, model_name: str=None, specific_api_config_path=None, response_cache: Union[bool, ResponseCache, None]=None):
         """
         初始化大模型客户端。会加载配置并绑定指定模型的密钥和 API 地址。
+        response_cache: True 使用进程共享的默认回复缓存，也可以直接传入 ResponseCache 实例；默认不缓存。
         """
         api_config_path = Path(specific_api_config_path).parent if specific_api_config_path else Path(__file__).parent / 'api_configure'
         config_manager = ConfigManager(api_config_path)
@@ -20,9 +29,16 @@ class LLMClient:
         self.model_name = None
         self.api_key = None
         self.base_url = None
+        # 该模型的提示词 token 上限（api_config.yaml 中的 prompt_budget），None 表示不限制
+        self.prompt_budget: Optional[int] = None
         self.client = None
+        self.async_client = None
+        self.response_cache: Optional[ResponseCache] = None
+        # 累计用量（缓存命中不计入）
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
 
         self.set_model(model_name)
+        self.set_response_cache(response_cache)
 
     def set_model(self, model_name: str):
         # 先设定默认
@@ -35,18 +51,98 @@ class LLMClient:
         api_config = self.api_configs[self.model_name]
         self.api_key = api_config["api_key"]
         self.base_url = api_config["base_url"]
+        self.prompt_budget = api_config.get("prompt_budget")
         self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
 
-    def chat(self, messages: Union[str, List[Union[Dict[str, str], LLMMessage]]], system_prompt: str = "", tools: Optional[List[Dict[str, Any]]] = None, tool_choice: str = "auto", temperature=0.8, max_tokens=2048) -> Any:
-        """
-        执行一次聊天调用，支持消息列表和工具调用。
-        """
+    def set_endpoint(self, base_url: str, api_key: Optional[str] = None):
+        """覆盖当前模型的 API 地址（例如指向本地的模拟服务）"""
+        self.base_url = base_url
+        if api_key is not None:
+            self.api_key = api_key
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    def _record_usage(self, usage: Any):
+        self.usage["requests"] += 1
+        if usage is not None:
+            self.usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            self.usage["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def reset_usage(self) -> Dict[str, int]:
+        """返回当前累计用量并清零"""
+        usage, self.usage = self.usage, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        return usage
+
+    def set_response_cache(self, response_cache: Union[bool, ResponseCache, None]):
+        """开启 / 关闭回复缓存：相同模型、消息、工具与采样参数的请求直接返回缓存的消息"""
+        if response_cache is True:
+            response_cache = get_response_cache()
+        self.response_cache = response_cache or None
+
+    def _cache_lookup(self, kwargs: Dict[str, Any]):
+        """返回 (缓存键, 缓存的消息 dict)；未开启缓存时两者都为 None"""
+        if self.response_cache is None:
+            return None, None
+        key = make_cache_key(kwargs)
+        return key, self.response_cache.get(key)
+
+    def _cache_store(self, key: Optional[str], message: Any):
+        if key is None:
+            return
+        payload = message.model_dump(mode="json", exclude_none=True) if hasattr(message, "model_dump") else message
+        self.response_cache.put(key, payload, model=self.model_name)
+
+    @staticmethod
+    def _cached_delta(payload: Dict[str, Any]) -> ChoiceDelta:
+        """把缓存的完整消息还原为一个流式 delta（一次性给出全部内容与 tool_calls）"""
+        tool_calls = [
+            {"index": index, **call}
+            for index, call in enumerate(payload.get("tool_calls") or [])
+        ]
+        return ChoiceDelta.model_validate({
+            "role": "assistant",
+            "content": payload.get("content"),
+            "tool_calls": tool_calls or None,
+        })
+
+    @staticmethod
+    def _accumulate_delta(message: Dict[str, Any], delta: Any):
+        """将流式 delta 累积为完整的助手消息 dict（用于写入缓存）"""
+        if getattr(delta, "content", None):
+            message["content"] = (message.get("content") or "") + delta.content
+        for tc in getattr(delta, "tool_calls", None) or []:
+            calls = message.setdefault("tool_calls", [])
+            while len(calls) <= tc.index:
+                calls.append({"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+            entry = calls[tc.index]
+            if tc.id:
+                entry["id"] = tc.id
+            if tc.function:
+                entry["function"]["name"] += tc.function.name or ""
+                entry["function"]["arguments"] += tc.function.arguments or ""
+
+    @staticmethod
+    def _finish_streamed(message: Dict[str, Any]) -> Dict[str, Any]:
+        """流结束后补齐缺失的 tool_call id（部分服务商流式输出不带 id），使缓存的消息能通过 ChatCompletionMessage 校验"""
+        for call in message.get("tool_calls") or []:
+            if not call["id"]:
+                call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+        return message
+
+    @staticmethod
+    def _optional_params(**params) -> Dict[str, Any]:
+        """去掉值为 None 的可选采样参数（不发送给服务商）"""
+        return {name: value for name, value in params.items() if value is not None}
+
+    def _build_request(self, messages: Union[str, List[Union[Dict[str, str], LLMMessage]]], system_prompt: str, tools: Optional[List[Dict[str, Any]]], tool_choice: str, **params) -> Dict[str, Any]:
+        """将消息、工具与采样参数整理为 chat.completions.create 的参数"""
         if isinstance(messages, str):
             messages = [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": messages}
             ]
-        
+
         # 将 Pydantic 模型转化为字典（如果需要）
         formatted_messages = []
         for msg in messages:
@@ -58,51 +154,93 @@ class LLMClient:
         kwargs = {
             "model": self.model_name,
             "messages": formatted_messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "frequency_penalty": 1,
+            **params,
         }
-        
+
         if tools:
             kwargs["tools"] = tools
             kwargs["tool_choice"] = tool_choice
+        return kwargs
 
+    def chat(self, messages: Union[str, List[Union[Dict[str, str], LLMMessage]]], system_prompt: str = "", tools: Optional[List[Dict[str, Any]]] = None, tool_choice: str = "auto", temperature=0.8, max_tokens=2048, frequency_penalty=1) -> Any:
+        """
+        执行一次聊天调用，支持消息列表和工具调用。
+        """
+        kwargs = self._build_request(messages, system_prompt, tools, tool_choice,
+                                     temperature=temperature, max_tokens=max_tokens, frequency_penalty=frequency_penalty)
+        key, cached = self._cache_lookup(kwargs)
+        if cached is not None:
+            return ChatCompletionMessage.model_validate(cached)
         response = self.client.chat.completions.create(**kwargs)
-        return response.choices[0].message
+        self._record_usage(response.usage)
+        message = response.choices[0].message
+        self._cache_store(key, message)
+        return message
 
 
     async def achat(self, messages: Union[str, List[Union[Dict[str, str], LLMMessage]]], system_prompt: str = "", tools: Optional[List[Dict[str, Any]]] = None, tool_choice: str = "auto", temperature=0.7,
-             max_tokens=2048) -> Any:
+             max_tokens=2048, frequency_penalty=None) -> Any:
         """
         执行一次聊天调用，支持消息列表和工具调用（异步）。
+        使用 AsyncOpenAI 客户端，等待模型期间不会阻塞事件循环。
+        默认采样参数保持异步接口原有的值（temperature 0.7，不设置 frequency_penalty），与 chat() 不同；
+        Program 的回合会显式传入采样参数（见 BaseProgram 模块的 LLM_SAMPLING），四个接口发送的请求相同。
         """
-        if isinstance(messages, str):
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": messages}
-            ]
-        
-        # 将 Pydantic 模型转化为字典（如果需要）
-        formatted_messages = []
-        for msg in messages:
-            if isinstance(msg, LLMMessage):
-                formatted_messages.append(msg.model_dump())
-            else:
-                formatted_messages.append(msg)
+        kwargs = self._build_request(messages, system_prompt, tools, tool_choice, temperature=temperature,
+                                     max_tokens=max_tokens, **self._optional_params(frequency_penalty=frequency_penalty))
+        key, cached = self._cache_lookup(kwargs)
+        if cached is not None:
+            return ChatCompletionMessage.model_validate(cached)
+        response = await self.async_client.chat.completions.create(**kwargs)
+        self._record_usage(response.usage)
+        message = response.choices[0].message
+        self._cache_store(key, message)
+        return message
 
-        kwargs = {
-            "model": self.model_name,
-            "messages": formatted_messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
-        
-        if tools:
-            kwargs["tools"] = tools
-            kwargs["tool_choice"] = tool_choice
+    def chat_stream(self, messages: Union[str, List[Union[Dict[str, str], LLMMessage]]], system_prompt: str = "", tools: Optional[List[Dict[str, Any]]] = None, tool_choice: str = "auto", temperature=0.8, max_tokens=2048, frequency_penalty=1) -> Iterator[Any]:
+        """
+        流式聊天调用：逐个产出 choices[0].delta（包含 content 片段和/或 tool_calls 片段）。
+        """
+        kwargs = self._build_request(messages, system_prompt, tools, tool_choice,
+                                     temperature=temperature, max_tokens=max_tokens, frequency_penalty=frequency_penalty)
+        key, cached = self._cache_lookup(kwargs)
+        if cached is not None:
+            yield self._cached_delta(cached)
+            return
+        message = {"role": "assistant"}
+        usage = None
+        for chunk in self.client.chat.completions.create(stream=True, stream_options=STREAM_OPTIONS, **kwargs):
+            usage = getattr(chunk, "usage", None) or usage
+            # 部分服务商会在末尾发送不含 choices 的用量块
+            if chunk.choices:
+                delta = chunk.choices[0].delta
+                self._accumulate_delta(message, delta)
+                yield delta
+        self._record_usage(usage)
+        # 只有完整读完的流才写入缓存
+        self._cache_store(key, self._finish_streamed(message))
 
-        response = await self.client.chat.completions.create(**kwargs)
-        return response.choices[0].message
+    async def achat_stream(self, messages: Union[str, List[Union[Dict[str, str], LLMMessage]]], system_prompt: str = "", tools: Optional[List[Dict[str, Any]]] = None, tool_choice: str = "auto", temperature=0.7, max_tokens=2048, frequency_penalty=None) -> AsyncIterator[Any]:
+        """
+        chat_stream() 的异步版本，默认采样参数与 achat() 相同。
+        """
+        kwargs = self._build_request(messages, system_prompt, tools, tool_choice, temperature=temperature,
+                                     max_tokens=max_tokens, **self._optional_params(frequency_penalty=frequency_penalty))
+        key, cached = self._cache_lookup(kwargs)
+        if cached is not None:
+            yield self._cached_delta(cached)
+            return
+        message = {"role": "assistant"}
+        usage = None
+        stream = await self.async_client.chat.completions.create(stream=True, stream_options=STREAM_OPTIONS, **kwargs)
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices:
+                delta = chunk.choices[0].delta
+                self._accumulate_delta(message, delta)
+                yield delta
+        self._record_usage(usage)
+        self._cache_store(key, self._finish_streamed(message))
 
     def get_available_models(self):
         return self.api_configs.keys() or []
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+# 默认缓存位置，可通过环境变量 LLMOS_RESPONSE_CACHE 指定其他路径
+DEFAULT_CACHE_PATH = Path(__file__).parent / "cache_result" / "responses.sqlite"
+# 超过该总字节数时按最近访问时间淘汰
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 超过该时长（秒）未被写入的条目视为过期；None 表示永不过期
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+# 计算缓存键前从消息中抹去的易变片段（LogEvent 的 [HH:MM:SS] 时间戳、ISO 时间等）
+VOLATILE_PATTERNS = [
+    (re.compile(r"\[\d{2}:\d{2}:\d{2}\]"), "[--:--:--]"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?"), "----------T--:--:--"),
+]
+
+
+def normalize_text(text: str) -> str:
+    for pattern, replacement in VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _normalize(obj: Any) -> Any:
+    if isinstance(obj, str):
+        return normalize_text(obj)
+    if isinstance(obj, dict):
+        return {key: _normalize(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_normalize(item) for item in obj]
+    if hasattr(obj, "model_dump"):
+        return _normalize(obj.model_dump())
+    return obj
+
+
+def make_cache_key(request: Dict[str, Any]) -> str:
+    """
+    由 chat.completions.create 的完整参数（模型、消息、工具、采样参数）计算内容寻址的缓存键。
+    消息中的时间戳等易变内容会先被规范化，使相同状态下的请求命中同一条缓存。
+    """
+    canonical = json.dumps(_normalize(request), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    基于 sqlite 的模型回复缓存（线程安全，可跨进程共享同一文件）。
+        - 键：make_cache_key(请求参数)
+        - 值：助手消息（ChatCompletionMessage.model_dump() 的 JSON）
+        - 淘汰：条目超过 max_age 视为过期；总大小超过 max_bytes 时按最近访问时间 (LRU) 淘汰
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: Optional[float] = DEFAULT_MAX_AGE):
+        self.path = Path(path or os.getenv("LLMOS_RESPONSE_CACHE") or DEFAULT_CACHE_PATH)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT payload, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.max_age is not None and now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, payload: Dict[str, Any], model: Optional[str] = None):
+        data = json.dumps(payload, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, payload, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, data, len(data.encode("utf-8")), now, now),
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float):
+        if self.max_age is not None:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+            self.evictions += max(cursor.rowcount, 0)
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 按最近访问时间从旧到新淘汰，直到总大小回到上限以内
+        victims: List[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in victims])
+        self.evictions += len(victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """进程内共享的默认回复缓存（首次使用时创建）"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
@@ -31,19 +31,29 @@ class LogEvent:
         self.timestamp = datetime.datetime.now().strftime("%H:%M:%S")
         self.event_type = event_type
         self.data = data or {}
+        # 渲染结果缓存（不含时间戳的正文）；事件记录后不再变化，append_data 时失效
+        self._rendered = None
 
     def append_data(self, data: dict):
         self.data.update(data)
+        self._rendered = None
 
 
-    def render(self) -> str:
-        template = self._templates.get(self.event_type)
-        if template:
-            # 使用 SafeFormatter 进行格式化
-            formatted_message = self._formatter.format(template, **self.data)
-            return f"[{self.timestamp}] [{self.event_type.value}] {formatted_message}"
-        else:
-            return f"[{self.timestamp}] [{self.event_type.value}] {self.event_type}: {self.data}"
+    def render(self, with_timestamp: bool = True) -> str:
+        """
+        :param with_timestamp: 是否输出挂钟时间；关闭后同一事件在不同运行中渲染出相同的文本（利于前缀缓存）
+        """
+        if self._rendered is None:
+            template = self._templates.get(self.event_type)
+            if template:
+                # 使用 SafeFormatter 进行格式化
+                formatted_message = self._formatter.format(template, **self.data)
+                self._rendered = f"[{self.event_type.value}] {formatted_message}"
+            else:
+                self._rendered = f"[{self.event_type.value}] {self.event_type}: {self.data}"
+        if with_timestamp:
+            return f"[{self.timestamp}] {self._rendered}"
+        return self._rendered
 
 # --- 内核指令 (栈操作) ---
 # 重点在于：我的意图是什么 -> 栈变成了什么样
@@ -34,6 +34,7 @@ class ToolCallResult:
     reasoning: str = ""
     call_kwargs: Dict[str, Any] = field(default_factory=dict)
     status: str = "success"
+    call_type: str = ""  # 调用来源（prompt / tool），回放录制的回合时用于还原调用
 
     def get_summary(self) -> str:
         """获取执行结果摘要"""
@@ -54,6 +55,7 @@ class LLMOSCall:
 class ProgramRunResult:
     raw_response: str
     parsed_calls: List[Any]
+    snapshot: Optional[Dict[str, Any]] = None
 
     def get_first_summary(self) -> str:
         """获取第一个解析出来的调用的摘要"""
@@ -20,17 +20,21 @@ WINDOW_CONFIGS = {
     "DEFAULT": {"ui_type": "TextWindow", "theme": "blue"}
 }
 
-# 2. 自动检查覆盖率
+# 2. 自动检查覆盖率（首次生成 UI 配置时执行一次，不在导入时执行）
+_coverage_checked = False
+
 def check_coverage():
+    global _coverage_checked
+    _coverage_checked = True
     for member in PromptWindow:
         if member.value not in WINDOW_CONFIGS and member != PromptWindow.NullWindow:
             print(f"⚠️ 警告: {member} 未配置 UI 属性")
 
-check_coverage()
-
 
 def update_backend_state_from_program(program:BaseProgram=None):
     if program is None: return []
+    if not _coverage_checked:
+        check_coverage()
 
     ui_configs = program.get_ui_configs()
 
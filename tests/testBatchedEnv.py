@@ -0,0 +1,57 @@
+import threading
+import unittest
+
+from llmos_core.Prompts.Windows.ALFworldWindow import BatchedALFworldEnv
+from llmos_core.Prompts.Windows.ALFworldWindow.batched_env import IDLE_ACTION
+
+
+class RecordingBatchEnv:
+    """记录每次 step 收到的动作列表的假批量环境"""
+
+    def __init__(self, n):
+        self.n = n
+        self.steps = []
+
+    def reset(self):
+        return tuple(f"start {i}" for i in range(self.n)), {"admissible_commands": [["look"]] * self.n}
+
+    def step(self, actions):
+        self.steps.append(list(actions))
+        return tuple(f"did {a}" for a in actions), (0.0,) * self.n, (False,) * self.n, \
+            {"admissible_commands": [["look"]] * self.n}
+
+
+class BatchedEnvTestCase(unittest.TestCase):
+    def test_actions_are_stepped_together(self):
+        fake = RecordingBatchEnv(3)
+        batch = BatchedALFworldEnv(3, config={}, env=fake)
+        batch.begin_turn([0, 1, 2])
+        results = {}
+
+        def play(slot, action):
+            results[slot] = batch.slot_env(slot).step([action])
+            batch.end_slot(slot)
+
+        threads = [threading.Thread(target=play, args=(0, "open drawer")),
+                   threading.Thread(target=play, args=(2, "go to desk"))]
+        for t in threads:
+            t.start()
+        # slot 1 本回合没有动作
+        batch.end_slot(1)
+        for t in threads:
+            t.join(timeout=5)
+
+        self.assertEqual(fake.steps, [["open drawer", IDLE_ACTION, "go to desk"]])
+        self.assertEqual(results[2][0], ("did go to desk",))
+        self.assertEqual(results[0][3]["admissible_commands"], [["look"]])
+
+    def test_slot_reset_uses_batch_reset(self):
+        batch = BatchedALFworldEnv(2, config={}, env=RecordingBatchEnv(2))
+        slot_env = batch.slot_env(1)
+        self.assertEqual(slot_env.reset()[0], ("start 1",))
+        with self.assertRaises(RuntimeError):
+            slot_env.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from llmos_core.cache import CacheManager
+
+
+class CacheManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_file = Path(self.tmp.name) / "chat.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_iterate(self):
+        cache = CacheManager(self.cache_file)
+        for i in range(5):
+            cache.append_record([{"role": "user", "content": f"第{i}轮"}], f"response {i}")
+        self.assertEqual(len(cache), 5)
+        self.assertEqual(cache.get_record(3)["response"], "response 3")
+        self.assertEqual(cache.get_record(-1)["index"], 4)
+
+        responses = []
+        while (record := cache.next_record()) is not None:
+            responses.append(record["response"])
+        self.assertEqual(responses, [f"response {i}" for i in range(5)])
+        cache.close()
+
+    def test_reopen_keeps_records(self):
+        cache = CacheManager(self.cache_file)
+        cache.append_record("p", "r")
+        cache.close()
+        reopened = CacheManager(self.cache_file, clear_cache_file=False)
+        self.assertEqual(len(reopened), 1)
+        reopened.append_record("p2", "r2")
+        self.assertEqual(reopened.get_record(1)["response"], "r2")
+        reopened.close()
+
+    def test_truncated_tail_is_recovered(self):
+        cache = CacheManager(self.cache_file)
+        cache.append_record("p0", "r0")
+        cache.append_record("p1", "r1")
+        cache.close()
+        # 模拟崩溃：最后一条记录只写了一半，索引项丢失
+        data = self.cache_file.read_bytes()
+        self.cache_file.write_bytes(data[:-5])
+        index_file = self.cache_file.with_name(self.cache_file.name + ".idx")
+        index_file.write_bytes(index_file.read_bytes()[:8])
+
+        recovered = CacheManager(self.cache_file, clear_cache_file=False)
+        self.assertEqual(len(recovered), 1)
+        recovered.append_record("p1", "r1-again")
+        self.assertEqual(recovered.get_record(1)["response"], "r1-again")
+        recovered.close()
+
+    def test_missing_index_is_rebuilt(self):
+        cache = CacheManager(self.cache_file)
+        for i in range(3):
+            cache.append_record(i, i)
+        cache.close()
+        self.cache_file.with_name(self.cache_file.name + ".idx").unlink()
+        rebuilt = CacheManager(self.cache_file, clear_cache_file=False)
+        self.assertEqual(len(rebuilt), 3)
+        self.assertEqual(rebuilt.get_record(2)["prompt"], 2)
+        rebuilt.close()
+
+    def test_legacy_json_array_is_migrated(self):
+        legacy = [{"prompt": "a", "response": "1"}, {"prompt": "b", "response": "2"}]
+        self.cache_file.write_text(json.dumps(legacy, indent=2), encoding="utf8")
+        cache = CacheManager(self.cache_file, clear_cache_file=False)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.next_record()["response"], "1")
+        self.assertEqual(len(self.cache_file.read_text(encoding="utf8").splitlines()), 2)
+        cache.close()
+
+
+    def test_legacy_file_at_old_path_is_migrated(self):
+        legacy_file = self.cache_file.with_name("chat.json")
+        legacy = [{"prompt": "a", "response": "1"}, "not a record", {"prompt": "b", "response": "2"}]
+        legacy_file.write_text(json.dumps(legacy), encoding="utf8")
+        cache = CacheManager(self.cache_file, clear_cache_file=False, legacy_file=legacy_file)
+        self.assertEqual([cache.get_record(i)["prompt"] for i in range(len(cache))], ["a", "b"])
+        cache.append_record("c", "3")
+        cache.close()
+        # 已有记录后不再重复迁移
+        reopened = CacheManager(self.cache_file, clear_cache_file=False, legacy_file=legacy_file)
+        self.assertEqual(len(reopened), 3)
+        reopened.close()
+
+    def test_two_writers_share_one_file(self):
+        a = CacheManager(self.cache_file)
+        b = CacheManager(self.cache_file, clear_cache_file=False)
+        a.append_record("pa0", "ra0")
+        b.append_record("pb0", "rb0")
+        a.append_record("pa1", "ra1")
+        self.assertEqual(len(a), 3)
+        self.assertEqual([a.get_record(i)["response"] for i in range(3)], ["ra0", "rb0", "ra1"])
+        self.assertEqual(b.get_record(2)["response"], "ra1")
+        a.close()
+        b.close()
+        reopened = CacheManager(self.cache_file, clear_cache_file=False)
+        self.assertEqual(len(reopened), 3)
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
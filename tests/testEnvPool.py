@@ -0,0 +1,69 @@
+import time
+import unittest
+
+from llmos_core.Prompts.Windows.ALFworldWindow.env_pool import ALFworldEnvPool
+
+
+class CountingEnv:
+    created = 0
+
+    def __init__(self):
+        CountingEnv.created += 1
+        self.resets = 0
+        self.closed = False
+
+    def reset(self):
+        self.resets += 1
+        return ("obs",), {"admissible_commands": [["look"]]}
+
+    def close(self):
+        self.closed = True
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class EnvPoolTestCase(unittest.TestCase):
+    def test_prewarm_acquire_release(self):
+        pool = ALFworldEnvPool(size=2, factory=CountingEnv)
+        pool.start()
+        self.assertTrue(wait_until(lambda: pool.stats()["ready"] == 2))
+
+        env, (obs, info) = pool.acquire()
+        self.assertEqual(env.resets, 1)
+        self.assertEqual(pool.stats()["hits"], 1)
+
+        # 归还的环境在后台重新 reset 后回到池中
+        pool.release(env)
+        self.assertTrue(wait_until(lambda: env.resets == 2))
+        self.assertTrue(wait_until(lambda: pool.stats()["ready"] == 2))
+        pool.stop()
+
+    def test_empty_pool_creates_synchronously(self):
+        pool = ALFworldEnvPool(size=0, factory=CountingEnv)
+        env, _ = pool.acquire()
+        self.assertIsInstance(env, CountingEnv)
+        self.assertEqual(pool.stats()["misses"], 1)
+        pool.release(env)
+        self.assertEqual(pool.stats()["ready"], 0)
+        # 不放回池中的环境被关闭
+        self.assertTrue(env.closed)
+
+    def test_acquire_does_not_start_refill(self):
+        pool = ALFworldEnvPool(size=2, factory=CountingEnv)
+        created = CountingEnv.created
+        env, _ = pool.acquire()
+        # 未启动的池只当场创建一个环境，不在后台补充
+        time.sleep(0.05)
+        self.assertEqual(CountingEnv.created, created + 1)
+        self.assertEqual(pool.stats()["ready"], 0)
+        pool.release(env)
+        self.assertTrue(env.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from llmos_core.llmos_util.api_client import LLMMessage
+from llmos_core.Program import evaluate as evaluation
+from llmos_core.Program.evaluate import MockLLMClient, percentile, summarize
+from llmos_core.Prompts.Windows.ALFworldWindow import env_pool
+from llmos_core.Prompts.Windows.ALFworldWindow.env_pool import ALFworldEnvPool
+
+
+class FakeAlfEnv:
+    """两步之内完成的假 ALFWorld 环境（单局）"""
+
+    def __init__(self):
+        self.moves = 0
+
+    def seed(self, seed):
+        pass
+
+    def info(self, won=False):
+        return {"admissible_commands": [["go to desk 1", "take apple 1"]], "won": [won]}
+
+    def reset(self):
+        self.moves = 0
+        return ("You are in the middle of a room.",), self.info()
+
+    def step(self, actions):
+        self.moves += 1
+        done = self.moves >= 2
+        return (f"You {actions[0]}.",), (1.0 if done else 0.0,), (done,), self.info(won=done)
+
+
+class EvaluateTestCase(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 90), 0.0)
+
+    def test_summarize(self):
+        results = [
+            {"won": True, "steps": 4, "reward": 1.0, "prompt_tokens": 10, "completion_tokens": 2,
+             "wall_time": 1.0, "turn_latencies": [0.1, 0.2], "error": None},
+            {"won": False, "steps": 8, "reward": 0.0, "prompt_tokens": 20, "completion_tokens": 4,
+             "wall_time": 3.0, "turn_latencies": [0.3], "error": "RuntimeError: boom"},
+        ]
+        summary = summarize(results)
+        self.assertEqual(summary["success_rate"], 0.5)
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(summary["prompt_tokens"], 30)
+        self.assertEqual(summary["turn_latency"]["p50"], 0.2)
+
+    def test_mock_picks_admissible_command(self):
+        client = MockLLMClient(seed=1)
+        state = "### ADMISSIBLE COMMANDS ###\ngo to desk 1, open drawer 1, look\n"
+        message = client.chat([LLMMessage(role="user", content=state)])
+        action = json.loads(message.tool_calls[0].function.arguments)["action"]
+        self.assertIn(action, ["go to desk 1", "open drawer 1", "look"])
+        self.assertEqual(client.reset_usage()["requests"], 1)
+
+
+
+class RunEpisodeTestCase(unittest.TestCase):
+    def setUp(self):
+        # ALFworldProgram 会创建 LLMClient：提供临时的 api_config.yaml；环境池换成假环境
+        self.tmp = tempfile.TemporaryDirectory()
+        (Path(self.tmp.name) / "api_config.yaml").write_text(
+            "default:\n  name: fake\nfake:\n  api_key: sk-test\n  base_url: http://127.0.0.1:9/v1\n")
+        patches = [
+            mock.patch.dict(os.environ, {"LLMDEV_CONFIG_DIR": self.tmp.name}),
+            mock.patch.object(env_pool, "_pool", ALFworldEnvPool(size=0, factory=FakeAlfEnv)),
+            mock.patch.dict(evaluation._worker, {}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_run_episode(self):
+        evaluation._init_worker(None, None, True)
+        result = evaluation.run_episode(episode=0, seed=7, max_steps=10)
+        self.assertIsNone(result["error"])
+        self.assertTrue(result["won"])
+        self.assertEqual(result["steps"], 2)
+        self.assertEqual(result["reward"], 1.0)
+        self.assertGreater(result["prompt_tokens"], 0)
+        self.assertEqual(len(result["turn_latencies"]), 2)
+
+    def test_evaluate(self):
+        # 工作进程以 fork 启动，继承上面的假环境与配置
+        output = Path(self.tmp.name) / "results.jsonl"
+        summary = evaluation.evaluate(episodes=2, output=str(output), workers=1, max_steps=10, mock=True)
+        self.assertEqual((summary["episodes"], summary["errors"], summary["success_rate"]), (2, 0, 1.0))
+        records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(sorted(r["seed"] for r in records), [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from llmos_core.Prompts.Windows.stack_window.flowStackWindow import Frame, FrameLogger
+from llmos_core.logger import LogEvent, RecordType
+
+
+def make_event(i):
+    return LogEvent(RecordType.tool_call, func_name="ALF_step", call_kwargs={"action": f"go {i}"}, result=f"obs {i}")
+
+
+class FrameLoggerTestCase(unittest.TestCase):
+    def test_ring_buffer(self):
+        logger = FrameLogger(maxlen=3)
+        for i in range(5):
+            logger.log(make_event(i))
+        self.assertEqual(len(logger), 3)
+        block = logger.render_recent(10, with_timestamp=False)
+        self.assertNotIn("go 1", block)
+        self.assertIn("go 2", block)
+        self.assertTrue(block.endswith("obs 4"))
+
+    def test_render_memoized(self):
+        frame = Frame("ROOT", "root")
+        event = make_event(0)
+        frame.record_event(event)
+        # record_event 写入 step 后的渲染结果被缓存
+        first = event.render(with_timestamp=False)
+        self.assertIn("Step #1", first)
+        self.assertIs(event.render(with_timestamp=False), first)
+        self.assertTrue(event.render().endswith(first))
+
+        block = frame.logger.render_recent(5)
+        self.assertIs(frame.logger.render_recent(5), block)
+        frame.record_event(make_event(1))
+        self.assertIn("Step #2", frame.logger.render_recent(5))
+
+    def test_block_updated_incrementally(self):
+        logger = FrameLogger(maxlen=4)
+        logger.log(make_event(0))
+        self.assertEqual(logger.render_recent(2, with_timestamp=False), make_event(0).render(False))
+        for i in range(1, 6):
+            logger.log(make_event(i))
+            # 缓存的块随新增记录追加、挤掉最早一行，与重新渲染的结果一致
+            expected = "\n".join(e.render(False) for e in list(logger.records)[-2:])
+            self.assertEqual(logger.render_recent(2, with_timestamp=False), expected)
+        self.assertEqual(list(logger._block_cache), [(2, False)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from NewVirtualEnd import BackendState, SessionRegistry
+from llmos_core.Program.BaseProgram import BaseProgram
+from llmos_core.Prompts.Windows.heap_window.heap_store import SqliteHeapStore
+from llmos_core.Prompts.Windows.heap_window.heap_window import HEAP_PREVIEW_CHARS, HEAP_RENDER_KEYS, HeapPromptWindow
+
+
+class HeapProgram(BaseProgram):
+    def __init__(self):
+        super().__init__(windows=[HeapPromptWindow()], llm_client=object())
+
+    def run(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class HeapWindowTestCase(unittest.TestCase):
+    def test_matches_full_dump(self):
+        heap = HeapPromptWindow()
+        heap._heap_set(key="pos", value={"room": "kitchen", "items": [1, 2]})
+        heap._heap_set(key="名字", value="苹果")
+        expected = json.dumps(dict(heap.data), indent=2, ensure_ascii=False)
+        self.assertEqual(heap.export_state_prompt(), f"### HEAP DATA ###\n{expected}\n")
+
+    def test_incremental_invalidation(self):
+        heap = HeapPromptWindow()
+        heap._heap_set(key="a", value=1)
+        heap._heap_set(key="b", value=[1, 2, 3])
+        heap.export_state_prompt()
+        fragment_b = heap._fragments["b"]
+        heap._heap_set(key="a", value=2)
+        self.assertNotIn("a", heap._fragments)
+        self.assertIs(heap._fragments["b"], fragment_b)
+        self.assertIn('"a": 2', heap.export_state_prompt())
+        heap._heap_delete(key="b")
+        self.assertNotIn('"b"', heap.export_state_prompt())
+
+    def test_preview_and_paging(self):
+        heap = HeapPromptWindow()
+        text = "".join(str(i % 10) for i in range(5000))
+        result = heap._heap_set(key="obs", value=text)
+        # 返回完整的值，只有写进执行历史的摘要被截断
+        self.assertEqual(result["value"], text)
+        self.assertLess(len(result["__summary__"]), HEAP_PREVIEW_CHARS + 100)
+        self.assertEqual(heap._heap_get(key="obs")["value"], text)
+        self.assertNotIn("__summary__", heap._heap_get(key="missing"))
+        state = heap.export_state_prompt()
+        self.assertIn("[5002 chars, use heap_read to page]", state)
+        self.assertLess(len(state), HEAP_PREVIEW_CHARS + 200)
+
+        pages, offset = [], 0
+        while offset is not None:
+            page = heap._heap_read(key="obs", offset=offset, length=2000)
+            pages.append(page["content"])
+            offset = page["next_offset"]
+        self.assertEqual("".join(pages), text)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(heap._heap_read(key="missing")["status"], "error")
+
+    def test_working_set(self):
+        heap = HeapPromptWindow(working_set=2)
+        for key in ("a", "b", "c"):
+            heap._heap_set(key=key, value=key.upper())
+        state = heap.export_state_prompt()
+        self.assertNotIn('"A"', state)
+        self.assertIn('(1 more keys not shown, use heap_get / heap_read: "a")', state)
+        # 读取后重新进入工作集，仍按写入顺序渲染
+        self.assertEqual(heap._heap_get(key="a")["value"], "A")
+        state = heap.export_state_prompt()
+        self.assertLess(state.index('"a"'), state.index('"c"'))
+        self.assertIn('"b"', state.splitlines()[-1])
+
+
+class HeapIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.heap = HeapPromptWindow()
+        self.heap._heap_set(key="room_kitchen", value={"objects": ["Apple 1", "knife 2"]})
+        self.heap._heap_set(key="room_bedroom", value={"objects": ["pillow 1"]})
+        self.heap._heap_set(key="goal", value="put a clean apple in the fridge")
+
+    def test_prefix_and_glob(self):
+        self.assertEqual(self.heap._heap_keys(prefix="room_")["keys"], ["room_bedroom", "room_kitchen"])
+        self.assertEqual(self.heap._heap_keys()["total"], 3)
+        self.assertEqual(self.heap._heap_find(pattern="*_k?tchen")["keys"], ["room_kitchen"])
+        self.assertEqual(self.heap._heap_find(pattern="ROOM_*")["total"], 0)
+        self.assertEqual(self.heap._heap_keys(prefix="room_", limit=1)["keys"], ["room_bedroom"])
+
+    def test_search(self):
+        result = self.heap._heap_search(text="apple")
+        self.assertEqual([m["key"] for m in result["matches"]], ["goal", "room_kitchen"])
+        self.assertIn("Apple 1", result["matches"][1]["snippet"])
+        self.assertIn("room_kitchen", result["__summary__"])
+        # 候选键需通过全文校验：两个词都出现但不相邻
+        self.assertEqual(self.heap._heap_search(text="apple knife")["total"], 0)
+        self.assertEqual(self.heap._heap_search(text="clean app")["total"], 1)
+
+    def test_search_without_tokens(self):
+        # 只有标点的查询无法使用倒排索引，退回到逐个校验全部的值
+        self.assertIsNone(self.heap.index.candidates('", "'))
+        self.assertEqual(self.heap._heap_search(text='", "')["matches"][0]["key"], "room_kitchen")
+
+    def test_search_raw_string_values(self):
+        # 字符串值按原文搜索：引号与换行不会被 JSON 转义挡住
+        self.heap._heap_set(key="quote", value='he said "hello world"')
+        self.heap._heap_set(key="lines", value="one\nline")
+        self.assertEqual(self.heap._heap_search(text='"hello world"')["matches"][0]["key"], "quote")
+        self.assertEqual(self.heap._heap_search(text="one\nline")["matches"][0]["key"], "lines")
+        self.assertEqual(self.heap._heap_search(text="line")["matches"][0]["snippet"], "one\nline")
+        self.assertEqual(self.heap.index.candidates("nline"), [])
+
+    def test_candidates_by_token_position(self):
+        index = self.heap.index
+        # 中间的词必须与值中的词完全相同，左侧有边界的词按前缀匹配
+        self.assertEqual(index.candidates("a clean apple"), ["goal"])
+        self.assertEqual(index.candidates("a clea"), ["goal"])
+        self.assertEqual(index.candidates("a lean apple"), [])
+        self.assertEqual(index.candidates("pple 1"), ["room_bedroom", "room_kitchen"])
+        self.assertEqual(index.candidates("ppl"), ["goal", "room_kitchen"])
+
+    def test_incremental_update(self):
+        self.heap._heap_set(key="goal", value="find a mug")
+        self.assertEqual(self.heap._heap_search(text="fridge")["total"], 0)
+        self.assertEqual(self.heap._heap_search(text="mug")["matches"][0]["key"], "goal")
+        self.heap._heap_delete(key="room_kitchen")
+        self.assertEqual(self.heap._heap_keys(prefix="room_")["keys"], ["room_bedroom"])
+        self.assertEqual(self.heap._heap_search(text="knife")["total"], 0)
+
+    def test_keys_render_mode(self):
+        heap = HeapPromptWindow(render_mode=HEAP_RENDER_KEYS)
+        heap._heap_set(key="b", value="x" * 5000)
+        heap._heap_set(key="a", value=1)
+        state = heap.export_state_prompt()
+        self.assertTrue(state.startswith("### HEAP KEYS (2)"))
+        self.assertNotIn("xxxx", state)
+        lines = state.splitlines()
+        self.assertTrue(lines[1].startswith('  "a"') and lines[2].startswith('  "b"'))
+
+
+class SqliteHeapStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "heap.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_persistence_and_namespaces(self):
+        heap = HeapPromptWindow(store=SqliteHeapStore(self.path, namespace="s1", cache_size=2))
+        for i in range(5):
+            heap._heap_set(key=f"k{i}", value={"i": i})
+        heap._heap_set(key="k0", value="updated")
+        self.assertEqual(heap._heap_delete(key="k3")["status"], "ok")
+        state = heap.export_state_prompt()
+        heap.close()
+
+        # 重新打开后内容与顺序不变；其他 namespace 互不影响
+        restored = HeapPromptWindow(store=SqliteHeapStore(self.path, namespace="s1", cache_size=2))
+        self.assertEqual(list(restored.data), ["k0", "k1", "k2", "k4"])
+        self.assertEqual(restored._heap_get(key="k0")["value"], "updated")
+        self.assertEqual(restored.export_state_prompt(), state)
+        self.assertEqual(restored._heap_find(pattern="k*")["keys"], ["k0", "k1", "k2", "k4"])
+        self.assertEqual(restored._heap_search(text="updated")["matches"][0]["key"], "k0")
+        self.assertEqual(len(SqliteHeapStore(self.path, namespace="s2")), 0)
+        self.assertLessEqual(len(restored.data._cache), 2)
+
+        restored.reset()
+        self.assertEqual(len(SqliteHeapStore(self.path, namespace="s1")), 0)
+
+    def test_index_built_lazily(self):
+        store = SqliteHeapStore(self.path, namespace="s1")
+        store["goal"] = "find a mug"
+        heap = HeapPromptWindow(store=SqliteHeapStore(self.path, namespace="s1"))
+        heap._heap_set(key="room", value="mug 1")
+        heap._heap_delete(key="room")
+        # 构造与写入都不读取全部的值，第一次查询时才构建索引
+        self.assertTrue(heap._index_stale)
+        self.assertEqual(heap._heap_search(text="mug")["matches"][0]["key"], "goal")
+        self.assertFalse(heap._index_stale)
+        heap._heap_set(key="cup", value="a mug")
+        self.assertEqual(heap._heap_search(text="mug")["total"], 2)
+
+    def test_non_string_keys_agree_across_backends(self):
+        memory = HeapPromptWindow()
+        sqlite = HeapPromptWindow(store=SqliteHeapStore(self.path, namespace="s1"))
+        for heap in (memory, sqlite):
+            heap._heap_set(key=1, value="one")
+            self.assertEqual(list(heap.data), ["1"])
+            self.assertEqual(heap._heap_get(key="1")["value"], "one")
+            self.assertEqual(heap._heap_read(key=1)["content"], "one")
+            self.assertEqual(heap._heap_search(text="one")["matches"][0]["key"], "1")
+        self.assertEqual(memory.export_state_prompt(), sqlite.export_state_prompt())
+        sqlite.close()
+
+        # 重启后键仍是同一个字符串
+        restored = HeapPromptWindow(store=SqliteHeapStore(self.path, namespace="s1"))
+        self.assertEqual(restored._heap_get(key=1)["value"], "one")
+        self.assertEqual(restored._heap_delete(key=1)["status"], "ok")
+
+    def test_removed_session_dropped(self):
+        with mock.patch("llmos_core.Prompts.Windows.heap_window.heap_window.HEAP_DB_PATH", self.path):
+            registry = SessionRegistry()
+            for session_id in ("s1", "s2"):
+                program = HeapProgram()
+                program.bind_session(session_id)
+                program.promptMainBoard.user_windows[0]._heap_set(key="goal", value=session_id)
+                registry.add(BackendState(session_id, program))
+
+            # 会话被删除或过期时，其 namespace 一并删除，其他会话不受影响
+            asyncio.run(registry.remove("s1"))
+            self.assertEqual(len(SqliteHeapStore(self.path, namespace="s1:Heap")), 0)
+            self.assertEqual(SqliteHeapStore(self.path, namespace="s2:Heap")["goal"], "s2")
+
+
+if __name__ == '__main__':
+    unittest.main()
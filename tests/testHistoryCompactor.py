@@ -0,0 +1,81 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+from llmos_core.Prompts.PromptMainBoard import PromptMainBoard
+from llmos_core.Prompts.Windows.stack_window.flowStackWindow import FlowStackPromptWindow
+from llmos_core.Prompts.Windows.stack_window.history_compactor import HistoryCompactor
+from llmos_core.logger import LogEvent, RecordType
+
+
+class SlowSummaryClient:
+    """在 release 之前阻塞的模拟模型，用于确认压缩不在回合的关键路径上"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.prompts = []
+
+    def chat(self, messages, system_prompt="", **kwargs):
+        self.release.wait(5)
+        self.prompts.append(messages)
+        return SimpleNamespace(content=f"summary #{len(self.prompts)}")
+
+
+def record(window, i):
+    window.record_event(LogEvent(RecordType.tool_call, func_name="ALF_step",
+                                 call_kwargs={"action": f"go to shelf {i}"}, result=f"obs {i}"))
+
+
+class HistoryCompactorTestCase(unittest.TestCase):
+    def test_summary_replaces_oldest_events(self):
+        client = SlowSummaryClient()
+        window = FlowStackPromptWindow(compactor=HistoryCompactor(client=client, threshold=4, batch=3))
+        for i in range(4):
+            record(window, i)
+        frame = window.stack[-1]
+        future = frame.compaction[0]
+
+        # 摘要尚未完成：渲染立即返回原始历史
+        self.assertIn("go to shelf 0", window.export_state_prompt())
+        version = window.version
+
+        client.release.set()
+        future.result(timeout=5)
+        # 摘要完成的回调只置位标志：渲染仍是原始历史，窗口状态与版本号都不变
+        self.assertTrue(window._compaction_ready.wait(5))
+        self.assertEqual(window.version, version)
+        self.assertIn("go to shelf 0", window.export_state_prompt())
+
+        # 下一回合开始时（组装提示词前）换入摘要并使窗口缓存失效
+        board = PromptMainBoard()
+        board.register_windows(user_windows=window)
+        board.assemble_messages()
+        self.assertGreater(window.version, version)
+
+        state = window.export_state_prompt()
+        self.assertIn("[Summary of earlier steps] summary #1", state)
+        self.assertNotIn("go to shelf 0", state)
+        self.assertIn("go to shelf 3", state)
+        self.assertEqual(len(frame.logger), 1)
+        self.assertIn("go to shelf 2", client.prompts[0])
+
+    def test_disabled_after_failures(self):
+        class FailingClient:
+            def chat(self, *args, **kwargs):
+                raise ConnectionError("no model")
+
+        compactor = HistoryCompactor(client=FailingClient(), threshold=1, batch=1)
+        window = FlowStackPromptWindow(compactor=compactor)
+        for i in range(10):
+            record(window, i)
+            future = window.stack[-1].compaction
+            if future is not None:
+                future[0].exception(timeout=5)
+                window._compaction_ready.wait(5)
+            window.begin_turn()
+        self.assertFalse(compactor.enabled)
+        self.assertIn("go to shelf 0", window.export_state_prompt())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import unittest
+
+from llmos_core.Prompts import parse_response, repair_json_locally, get_repair_stats
+
+
+class JsonRepairTestCase(unittest.TestCase):
+    def assertRepairs(self, text, expected):
+        repaired = repair_json_locally(text)
+        self.assertIsNotNone(repaired, text)
+        self.assertEqual(json.loads(repaired), expected)
+
+    def test_markdown_and_prose(self):
+        self.assertRepairs('好的，调用如下：\n```json\n{"call_type": "prompt", "func_name": "stack_push"}\n```\n完成。',
+                           {"call_type": "prompt", "func_name": "stack_push"})
+
+    def test_python_style(self):
+        self.assertRepairs("{'call_type': 'prompt', 'kwargs': {'done': True, 'value': None,},}",
+                           {"call_type": "prompt", "kwargs": {"done": True, "value": None}})
+
+    def test_unquoted_keys_and_comments(self):
+        self.assertRepairs('{call_type: "prompt", // 注释\n func_name: "heap_write" /* x */}',
+                           {"call_type": "prompt", "func_name": "heap_write"})
+
+    def test_inner_quotes_and_newlines(self):
+        self.assertRepairs('{"reasoning": "he said "go" now\nok"}',
+                           {"reasoning": 'he said "go" now\nok'})
+
+    def test_truncated(self):
+        self.assertRepairs('[{"call_type": "prompt", "kwargs": {"a": [1, 2',
+                           [{"call_type": "prompt", "kwargs": {"a": [1, 2]}}])
+
+    def test_multiple_top_level_objects(self):
+        self.assertRepairs('{"func_name": "a"}\n{"func_name": "b"}',
+                           [{"func_name": "a"}, {"func_name": "b"}])
+
+    def test_top_level_arrays_kept_apart(self):
+        self.assertRepairs('[{"func_name": "a"}] [{"func_name": "b"}]',
+                           [[{"func_name": "a"}], [{"func_name": "b"}]])
+
+    def test_missing_commas(self):
+        self.assertRepairs('[{"a": 1 "b": 2} {"c": 3}]', [{"a": 1, "b": 2}, {"c": 3}])
+
+    def test_unrepairable(self):
+        self.assertIsNone(repair_json_locally("no json here"))
+
+    def test_parse_response_uses_local_repair(self):
+        before = get_repair_stats().get("local", 0)
+        # retry_fix=0：不允许走 LLM 修复
+        data = parse_response("{'call_type': 'prompt', 'func_name': 'stack_pop',}", retry_fix=0)
+        self.assertEqual(data, [{"call_type": "prompt", "func_name": "stack_pop"}])
+        self.assertEqual(get_repair_stats().get("local", 0), before + 1)
+
+    def test_parse_response_skips_brackets_in_prose(self):
+        text = 'Plan [step 1]: push frame. {"call_type": "prompt", "func_name": "stack_push", "kwargs": {"name": "a"}'
+        self.assertEqual(parse_response(text, retry_fix=0),
+                         [{"call_type": "prompt", "func_name": "stack_push", "kwargs": {"name": "a"}}])
+        # 修复结果中没有任何调用时不采用，交给 LLM 修复（这里不允许，因此失败）
+        with self.assertRaises(ValueError):
+            parse_response("Plan [step 1] then {step 2}", retry_fix=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import json
+import os
+import tempfile
+import unittest
+
+from llmos_core.Prompts.Windows.meta_cache import MetaFileCache
+
+
+class MetaFileCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "meta.json")
+        self.write({"v": 1})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, data):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_stat_throttled(self):
+        cache = MetaFileCache(check_interval=3600)
+        first = cache.get(self.path)
+        self.write({"v": 2, "padding": "x"})
+        # 检查间隔内不做 stat，直接复用
+        self.assertIs(cache.get(self.path), first)
+
+        cache.check_interval = 0
+        self.assertEqual(cache.get(self.path)["v"], 2)
+        self.assertEqual(cache.loads, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
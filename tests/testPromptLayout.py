@@ -0,0 +1,58 @@
+import re
+import unittest
+
+from llmos_core.Prompts.PromptMainBoard import LAYOUT_PREFIX_STABLE, PromptMainBoard, shared_prefix_length
+from llmos_core.Prompts.Windows.chat_window.chat_window import ChatWindow
+from llmos_core.Prompts.Windows.heap_window.heap_window import HeapPromptWindow
+from llmos_core.Prompts.Windows.stack_window.flowStackWindow import FlowStackPromptWindow
+
+TIMESTAMP_RE = re.compile(r"\[\d{2}:\d{2}:\d{2}\]")
+
+
+def build_board():
+    board = PromptMainBoard()
+    board.register_windows(user_windows=[FlowStackPromptWindow(), HeapPromptWindow(), ChatWindow()])
+    return board
+
+
+def play_turn(board, i):
+    board.handle_call({"call_type": "prompt", "func_name": "heap_set", "kwargs": {"key": f"k{i}", "value": i}})
+
+
+class PromptLayoutTestCase(unittest.TestCase):
+    def test_shared_prefix_length(self):
+        self.assertEqual(shared_prefix_length(b"abcdef", b"abcxyz"), 3)
+        self.assertEqual(shared_prefix_length(b"abc", b"abc"), 3)
+        self.assertEqual(shared_prefix_length(b"", b"abc"), 0)
+
+    def test_prefix_stable_layout(self):
+        board = build_board()
+        board.set_prompt_layout(LAYOUT_PREFIX_STABLE)
+        play_turn(board, 0)
+        messages = board.assemble_messages()
+
+        # 全部 META 在 system 消息中，状态按易变程度排列（对话 < 堆 < 执行栈）
+        self.assertEqual(messages[0].role, "system")
+        self.assertIn("<WINDOW META: FlowStackWindow>", messages[0].content)
+        titles = [re.search(r"<WINDOW STATE: (\w+)>", m.content).group(1) for m in messages[1:]]
+        self.assertEqual(titles, ["ChatWindow", "Heap", "FlowStackWindow"])
+        self.assertFalse(any(TIMESTAMP_RE.search(m.content) for m in messages))
+
+    def test_prefix_reuse(self):
+        ratios = {}
+        for layout in ("windows", LAYOUT_PREFIX_STABLE):
+            board = build_board()
+            board.set_prompt_layout(layout)
+            board.assemble_messages()
+            play_turn(board, 0)
+            board.assemble_messages()
+            ratios[layout] = board.last_prefix_report.ratio
+        self.assertGreater(ratios[LAYOUT_PREFIX_STABLE], ratios["windows"])
+
+    def test_invalid_layout(self):
+        with self.assertRaises(ValueError):
+            build_board().set_prompt_layout("unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from llmos_core.Prompts.PromptMainBoard import PromptMainBoard
+from llmos_core.Prompts.Windows.BaseWindow import BasePromptWindow
+from llmos_core.Prompts.Windows.heap_window.heap_window import HeapPromptWindow
+from llmos_core.schema import ToolDefinition
+
+
+class CountingWindow(BasePromptWindow):
+    """记录状态被渲染的次数"""
+
+    def __init__(self, window_title="Counting"):
+        super().__init__(window_title=window_title)
+        self.renders = 0
+
+    def export_state_prompt(self):
+        self.renders += 1
+        return f"renders={self.renders}"
+
+
+class ToolWindow(BasePromptWindow):
+    """按 meta_data 中的函数名提供外部工具"""
+
+    def __init__(self, names, window_title="Tools"):
+        super().__init__(window_title=window_title)
+        self.meta_data = {"functions": list(names)}
+
+    def get_tool_definitions(self):
+        return [ToolDefinition(name=name, description=name) for name in self.meta_data["functions"]]
+
+
+class RenderCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.board = PromptMainBoard()
+        self.heap = HeapPromptWindow()
+        self.counter = CountingWindow()
+        self.board.register_windows(user_windows=[self.heap, self.counter])
+
+    def test_handler_marks_owner_dirty(self):
+        self.board.assemble_messages()
+        heap_version, counter_version = self.heap.version, self.counter.version
+        self.board.handle_call({"call_type": "prompt", "func_name": "heap_set", "kwargs": {"key": "a", "value": 1}})
+        self.assertGreater(self.heap.version, heap_version)
+        self.assertEqual(self.counter.version, counter_version)
+        self.assertIn('"a": 1', self.board.assemble_messages()[0].content)
+
+    def test_unrelated_window_stays_cached(self):
+        first = self.board.assemble_messages()
+        self.assertEqual(self.counter.renders, 1)
+        self.board.handle_call({"call_type": "prompt", "func_name": "heap_set", "kwargs": {"key": "a", "value": 1}})
+        second = self.board.assemble_messages()
+        self.assertEqual(self.counter.renders, 1)
+        self.assertIs(second[1].content, first[1].content)
+
+        self.counter.mark_dirty()
+        self.board.assemble_messages()
+        self.assertEqual(self.counter.renders, 2)
+
+
+class ToolsCacheTestCase(unittest.TestCase):
+    def test_tools_cache_invalidation(self):
+        board = PromptMainBoard()
+        board.register_windows(user_windows=ToolWindow(["a"]))
+        tools = board.get_all_tools()
+        self.assertIs(board.get_all_tools(), tools)
+
+        # 注册新窗口后重新编译
+        board.register_windows(user_windows=ToolWindow(["b"], window_title="More"))
+        tools = board.get_all_tools()
+        self.assertEqual([tool["function"]["name"] for tool in tools], ["a", "b"])
+
+        # 元数据被重新赋值后重新编译，状态变化（mark_dirty）不影响
+        board.user_windows[0].mark_dirty()
+        self.assertIs(board.get_all_tools(), tools)
+        board.user_windows[0].meta_data = {"functions": ["c"]}
+        self.assertEqual([tool["function"]["name"] for tool in board.get_all_tools()], ["c", "b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
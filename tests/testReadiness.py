@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import NewVirtualEnd
+from llmos_core.Program.BaseProgram import BaseProgram
+from llmos_core.Prompts.Windows.heap_window.heap_window import HeapPromptWindow
+from llmos_core.schema import ProgramRunResult
+
+
+class LightProgram(BaseProgram):
+    """不依赖 alfworld 与模型配置的程序"""
+
+    def __init__(self):
+        super().__init__(windows=[HeapPromptWindow()], llm_client=object())
+
+    def run(self, *args, **kwargs):
+        return ProgramRunResult(raw_response="", parsed_calls=[])
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("condition not met before timeout")
+        time.sleep(0.01)
+
+
+class FailedWarmUpTestCase(unittest.TestCase):
+    def setUp(self):
+        # 不进入 lifespan：不启动后台预热，直接模拟预热失败
+        self.client = TestClient(NewVirtualEnd.app)
+        patches = [
+            mock.patch.dict(NewVirtualEnd.PROGRAM_CLASSES, {"Light": LightProgram}),
+            mock.patch.object(NewVirtualEnd, "readiness", NewVirtualEnd.ServerReadiness()),
+            mock.patch.object(NewVirtualEnd, "session_registry", NewVirtualEnd.SessionRegistry()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        NewVirtualEnd.readiness.error = "ModuleNotFoundError: No module named 'alfworld'"
+
+    def test_failure_is_terminal(self):
+        response = self.client.get("/api/windows/config")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "failed")
+        self.assertNotIn("retry-after", response.headers)
+
+    def test_other_sessions_still_work(self):
+        response = self.client.post("/api/session/create", json={"program_name": "Light"})
+        self.assertEqual(response.status_code, 200)
+        session_id = response.json()["session_id"]
+        self.assertEqual(self.client.get("/api/windows/config", params={"session_id": session_id}).status_code, 200)
+
+    def test_switch_program_recovers(self):
+        response = self.client.post("/api/program/set", json={"program_name": "Light"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(NewVirtualEnd.readiness.ready)
+        self.assertEqual(self.client.get("/api/health/ready").status_code, 200)
+        self.assertEqual(self.client.get("/api/windows/config").status_code, 200)
+
+
+class WarmUpTestCase(unittest.TestCase):
+    """进入 lifespan，由后台 _warm_up 用 Light 程序构建默认会话"""
+
+    def setUp(self):
+        self.env_pool_started = threading.Event()
+        self.release_env_pool = threading.Event()
+        self.env_pool_error = None
+        patches = [
+            mock.patch.dict(NewVirtualEnd.PROGRAM_CLASSES, {"Light": LightProgram}),
+            mock.patch.object(NewVirtualEnd, "DEFAULT_PROGRAM_NAME", "Light"),
+            mock.patch.object(NewVirtualEnd, "readiness", NewVirtualEnd.ServerReadiness()),
+            mock.patch.object(NewVirtualEnd, "session_registry", NewVirtualEnd.SessionRegistry()),
+            mock.patch.object(NewVirtualEnd, "_start_env_pool", self.blocking_env_pool),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        # 测试失败时也要放行后台线程，否则 lifespan 退出会一直等待
+        self.addCleanup(self.release_env_pool.set)
+
+    def blocking_env_pool(self):
+        self.env_pool_started.set()
+        self.release_env_pool.wait(timeout=5)
+        if self.env_pool_error:
+            raise self.env_pool_error
+
+    def test_warming_up_then_ready(self):
+        with TestClient(NewVirtualEnd.app) as client:
+            self.assertTrue(self.env_pool_started.wait(timeout=5))
+            response = client.get("/api/windows/config")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()["status"], "warming_up")
+            self.assertEqual(response.headers["retry-after"], str(NewVirtualEnd.WARMUP_RETRY_AFTER))
+            self.assertEqual(client.get("/api/health/ready").status_code, 503)
+            self.assertEqual(client.get("/api/health/live").status_code, 200)
+
+            self.release_env_pool.set()
+            wait_until(lambda: NewVirtualEnd.readiness.ready)
+            self.assertEqual(client.get("/api/health/ready").status_code, 200)
+            self.assertEqual(client.get("/api/windows/config").status_code, 200)
+
+    def test_failed_warm_up_recovers(self):
+        self.env_pool_error = ModuleNotFoundError("No module named 'alfworld'")
+        with TestClient(NewVirtualEnd.app) as client:
+            self.release_env_pool.set()
+            wait_until(lambda: NewVirtualEnd.readiness.error is not None)
+            response = client.get("/api/windows/config")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()["status"], "failed")
+            self.assertNotIn("retry-after", response.headers)
+
+            # 默认会话已经建好，只是环境池失败：切换程序后恢复就绪
+            self.assertEqual(client.post("/api/program/set", json={"program_name": "Light"}).status_code, 200)
+            self.assertTrue(NewVirtualEnd.readiness.ready)
+            self.assertEqual(client.get("/api/health/ready").status_code, 200)
+            self.assertEqual(client.get("/api/windows/config").status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
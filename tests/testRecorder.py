@@ -0,0 +1,147 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from openai.types.chat import ChatCompletionMessage
+
+from llmos_core.Program.BaseProgram import BaseProgram
+from llmos_core.cache import CacheManager
+from llmos_core.Program.recorder import TurnRecorder, replay_recording, replay_turn
+from llmos_core.Prompts.Windows import PromptWindow
+from llmos_core.schema import ProgramRunResult
+
+
+class ScriptedClient:
+    """按顺序返回预设消息的假 LLMClient"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def chat(self, **kwargs):
+        return self.messages.pop(0)
+
+
+class HeapProgram(BaseProgram):
+    def __init__(self, messages=()):
+        # 注入假的客户端，测试不需要 api_config.yaml
+        super().__init__(windows=[
+            PromptWindow.from_name(PromptWindow.FlowStackPromptWindow),
+            PromptWindow.from_name(PromptWindow.HeapPromptWindow),
+        ], llm_client=ScriptedClient(messages))
+
+    def run(self) -> ProgramRunResult:
+        _, response_text, calls = self._call_llm()
+        return ProgramRunResult(raw_response=response_text, parsed_calls=calls)
+
+    def heap(self):
+        return self.promptMainBoard.user_windows[1].data
+
+
+def tool_call(call_id, name, arguments):
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+class RecorderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.recording = Path(self.tmp.name) / "turns.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self):
+        program = HeapProgram([
+            ChatCompletionMessage.model_validate({"role": "assistant", "content": None, "tool_calls": [
+                tool_call("t1", "heap_set", {"key": "goal", "value": "find apple"}),
+                tool_call("t2", "heap_set", {"key": "room", "value": "kitchen"}),
+            ]}),
+            ChatCompletionMessage(role="assistant", content='{"call_type": "prompt", "func_name": "heap_delete", "kwargs": {"key": "room"}}'),
+        ])
+        program.recorder = TurnRecorder(self.recording)
+        program.run()
+        program.run()
+        program.recorder.close()
+        return program
+
+    def test_record_keeps_tool_calls_and_results(self):
+        self.record()
+        recorder = TurnRecorder(self.recording, clear=False)
+        self.assertEqual(len(recorder), 2)
+        first = recorder.get_turn(0)
+        self.assertIn("messages", first["prompt"])
+        self.assertEqual(len(first["response"]["message"]["tool_calls"]), 2)
+        self.assertEqual([r["status"] for r in first["response"]["results"]], ["success", "success"])
+        recorder.close()
+
+    def test_replay_reproduces_state(self):
+        recorded = self.record()
+        program = HeapProgram()
+        recorder = TurnRecorder(self.recording, clear=False)
+        while (record := recorder.next_turn()) is not None:
+            replay_turn(program.promptMainBoard, record)
+        self.assertEqual(program.heap(), recorded.heap())
+        self.assertEqual(program.heap(), {"goal": "find apple"})
+        recorder.close()
+
+    def test_replay_report(self):
+        self.record()
+        program = HeapProgram()
+        recorder = TurnRecorder(self.recording, clear=False)
+        report = replay_recording(program.promptMainBoard, recorder, verify=True)
+        summary = report.summary()
+        self.assertEqual((summary["turns"], summary["calls"], summary["mismatches"]), (2, 3, 0))
+        self.assertGreaterEqual(summary["total_ms"]["mean"], 0)
+        recorder.close()
+
+    def replay(self):
+        program = HeapProgram()
+        recorder = TurnRecorder(self.recording, clear=False)
+        # 回放不允许调用大模型修复
+        with mock.patch("llmos_core.Prompts.PromptMainBoard.repair_json_with_llm",
+                        side_effect=AssertionError("LLM repair during replay")):
+            report = replay_recording(program.promptMainBoard, recorder, verify=True)
+        recorder.close()
+        return program, report.summary()
+
+    def test_replay_prose_turn(self):
+        program = HeapProgram([ChatCompletionMessage(role="assistant", content="I will look around first.")])
+        program.recorder = TurnRecorder(self.recording)
+        with mock.patch("llmos_core.Prompts.PromptMainBoard.repair_json_with_llm", return_value="not json"):
+            program.run()
+        program.recorder.close()
+
+        replayed, summary = self.replay()
+        self.assertEqual((summary["turns"], summary["calls"], summary["mismatches"]), (1, 0, 0))
+        self.assertEqual(dict(replayed.heap()), {})
+
+    def test_replay_llm_repaired_turn(self):
+        program = HeapProgram([ChatCompletionMessage(role="assistant", content="set the goal to find apple")])
+        program.recorder = TurnRecorder(self.recording)
+        repaired = '{"call_type": "prompt", "func_name": "heap_set", "kwargs": {"key": "goal", "value": "find apple"}}'
+        with mock.patch("llmos_core.Prompts.PromptMainBoard.repair_json_with_llm", return_value=repaired):
+            program.run()
+        program.recorder.close()
+
+        # 回放录制的调用，而不是重新解析（需要大模型修复的）content
+        replayed, summary = self.replay()
+        self.assertEqual((summary["calls"], summary["mismatches"]), (1, 0))
+        self.assertEqual(dict(replayed.heap()), {"goal": "find apple"})
+
+    def test_legacy_unparsable_turn_logged(self):
+        cache = CacheManager(self.recording)
+        cache.append_record("prompt", "I will look around first.")
+        cache.close()
+        program = HeapProgram()
+        recorder = TurnRecorder(self.recording, clear=False)
+        self.assertEqual(replay_turn(program.promptMainBoard, recorder.next_turn()), [])
+        recorder.close()
+        # 与 apply_response 一样作为错误事件写入执行历史
+        history = program.promptMainBoard.user_windows[0].export_state_prompt()
+        self.assertIn("I will look around first.", history)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+import NewVirtualEnd
+from llmos_core.llmos_util import response_cache
+from llmos_core.llmos_util.api_client import LLMClient
+from llmos_core.Program.BaseProgram import LLM_SAMPLING
+from llmos_core.llmos_util.response_cache import ResponseCache, make_cache_key
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "responses.sqlite"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_ignores_timestamps(self):
+        a = {"model": "m", "messages": [{"role": "user", "content": "[10:00:01] [ACTION] look"}]}
+        b = {"model": "m", "messages": [{"role": "user", "content": "[23:59:59] [ACTION] look"}]}
+        c = {"model": "m", "messages": [{"role": "user", "content": "[10:00:01] [ACTION] go north"}]}
+        self.assertEqual(make_cache_key(a), make_cache_key(b))
+        self.assertNotEqual(make_cache_key(a), make_cache_key(c))
+        self.assertNotEqual(make_cache_key(a), make_cache_key({**a, "temperature": 0.2}))
+
+    def test_hit_and_miss(self):
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", {"role": "assistant", "content": "hi"}, model="m")
+        self.assertEqual(cache.get("k")["content"], "hi")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        cache.close()
+
+    def test_lru_eviction_by_size(self):
+        cache = ResponseCache(self.path, max_bytes=400)
+        for key in ("a", "b", "c"):
+            cache.put(key, {"content": key * 100})
+            time.sleep(0.01)
+        # 访问 a 后，最久未访问的是 b
+        cache.get("a")
+        cache.put("d", {"content": "d" * 100})
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertLessEqual(cache.stats()["bytes"], 400)
+        cache.close()
+
+    def test_expired_entries(self):
+        cache = ResponseCache(self.path, max_age=0)
+        cache.put("k", {"content": "old"})
+        time.sleep(0.01)
+        self.assertIsNone(cache.get("k"))
+        cache.close()
+
+
+def stream_chunks(deltas):
+    return [ChatCompletionChunk.model_validate({
+        "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+    }) for delta in deltas]
+
+    def test_stats_endpoint_does_not_create_cache(self):
+        registry = NewVirtualEnd.SessionRegistry()
+        state = registry.add(NewVirtualEnd.BackendState("s1"))
+        readiness = NewVirtualEnd.ServerReadiness()
+        readiness.mark_ready()
+        with mock.patch.object(NewVirtualEnd, "session_registry", registry), \
+                mock.patch.object(NewVirtualEnd, "readiness", readiness), \
+                mock.patch.object(response_cache, "_default_cache", None), \
+                mock.patch.dict(os.environ, {"LLMOS_RESPONSE_CACHE": str(self.path)}):
+            client = TestClient(NewVirtualEnd.app)
+            self.assertEqual(client.get("/api/llm/cacheStats").json(), {"enabled": False})
+            self.assertFalse(self.path.exists())
+
+            state.response_cache = True
+            stats = client.get("/api/llm/cacheStats").json()
+            self.assertTrue(stats["enabled"])
+            self.assertEqual(stats["path"], str(self.path))
+            response_cache._default_cache.close()
+
+
+class StreamedResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        config_dir = Path(self.tmp.name)
+        (config_dir / "api_config.yaml").write_text(
+            "default:\n  name: fake\nfake:\n  api_key: sk-test\n  base_url: http://127.0.0.1:9/v1\n")
+        with mock.patch.dict(os.environ, {"LLMDEV_CONFIG_DIR": str(config_dir)}):
+            self.client = LLMClient(response_cache=ResponseCache(config_dir / "responses.sqlite"))
+
+    def tearDown(self):
+        self.client.response_cache.close()
+        self.tmp.cleanup()
+
+    def stream_once(self, deltas):
+        create = mock.Mock(return_value=stream_chunks(deltas))
+        self.client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        list(self.client.chat_stream(messages="look"))
+        return create
+
+    def test_streamed_tool_call_hit(self):
+        self.stream_once([
+            {"role": "assistant", "tool_calls": [
+                {"index": 0, "id": "call_abc", "type": "function", "function": {"name": "ALF_step", "arguments": ""}}]},
+            {"tool_calls": [{"index": 0, "function": {"arguments": '{"action": "look"}'}}]},
+        ])
+        # 非流式的相同请求命中流式写入的缓存，并能还原为 ChatCompletionMessage
+        self.client.client = None
+        message = self.client.chat(messages="look")
+        self.assertEqual(message.tool_calls[0].id, "call_abc")
+        self.assertEqual(message.tool_calls[0].function.arguments, '{"action": "look"}')
+
+    def test_streamed_usage_requested(self):
+        usage = ChatCompletionChunk.model_validate({
+            "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": "fake", "choices": [],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+        })
+        create = mock.Mock(return_value=stream_chunks([{"role": "assistant", "content": "ok"}]) + [usage])
+        self.client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        list(self.client.chat_stream(messages="look"))
+        self.assertEqual(create.call_args.kwargs["stream_options"], {"include_usage": True})
+        self.assertEqual(self.client.reset_usage(), {"requests": 1, "prompt_tokens": 12, "completion_tokens": 3})
+
+    def test_missing_stream_id_is_filled(self):
+        self.stream_once([
+            {"role": "assistant", "tool_calls": [
+                {"index": 0, "type": "function", "function": {"name": "ALF_step", "arguments": "{}"}}]},
+        ])
+        self.client.client = None
+        self.assertTrue(self.client.chat(messages="look").tool_calls[0].id)
+
+    def test_program_sampling_same_on_sync_and_async(self):
+        completion = ChatCompletion.model_validate({
+            "id": "c", "object": "chat.completion", "created": 0, "model": "fake",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+        })
+        create = mock.Mock(return_value=completion)
+        self.client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        self.client.chat(messages="look", **LLM_SAMPLING)
+        self.assertEqual(create.call_args.kwargs["frequency_penalty"], 1)
+        # Program 显式传入采样参数时，异步路径发送相同的请求（因此命中同步路径写入的缓存）
+        self.client.async_client = None
+        message = asyncio.run(self.client.achat(messages="look", **LLM_SAMPLING))
+        self.assertEqual(message.content, "ok")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import unittest
+
+from NewVirtualEnd import BackendState, SSEFrame, SSESubscriber
+from llmos_core.Prompts.PromptMainBoard import PromptMainBoard
+from llmos_core.Prompts.Windows.heap_window.heap_window import HeapPromptWindow
+
+
+class BoardProgram:
+    """只提供 get_ui_configs() 的最小程序"""
+
+    def __init__(self):
+        self.heap = HeapPromptWindow()
+        self.board = PromptMainBoard()
+        self.board.register_windows(user_windows=self.heap)
+
+    def get_ui_configs(self):
+        return self.board.get_ui_configs()
+
+
+def decode(payload: bytes) -> dict:
+    return json.loads(payload.decode("utf-8").split("data: ", 1)[1])
+
+
+class SSEDeltaTestCase(unittest.TestCase):
+    def setUp(self):
+        self.program = BoardProgram()
+        self.state = BackendState("test", self.program)
+        self.state.commit_state()
+
+    def heap_set(self, key):
+        self.program.heap._heap_set(key=key, value=1)
+        return SSEFrame(self.state.commit_state())
+
+    def test_delta_in_sequence(self):
+        subscriber = SSESubscriber()
+        subscriber.version = self.state.version
+        frame = self.heap_set("a")
+        self.assertIs(subscriber.next_payload(frame, self.state), frame.payload)
+        self.assertEqual(decode(frame.payload)["type"], "delta")
+        # 同一帧不会重复发送
+        self.assertIsNone(subscriber.next_payload(frame, self.state))
+
+    def test_delta_rejected_on_version_gap(self):
+        subscriber = SSESubscriber()
+        subscriber.version = self.state.version
+        self.heap_set("a")
+        frame = self.heap_set("b")
+        payload = subscriber.next_payload(frame, self.state)
+        self.assertEqual(decode(payload)["type"], "full")
+        self.assertEqual(subscriber.version, self.state.version)
+
+    def test_bounded_queue_keeps_latest(self):
+        subscriber = SSESubscriber(maxsize=2)
+        subscriber.version = self.state.version
+        frames = [self.heap_set(f"k{i}") for i in range(3)]
+        for frame in frames:
+            subscriber.offer(frame)
+        # 队列满时丢弃积压，只保留最新一帧；之后因版本不连续改为一次全量同步
+        self.assertEqual(subscriber.queue.qsize(), 1)
+        self.assertEqual(subscriber.dropped, 2)
+        latest = subscriber.queue.get_nowait()
+        self.assertIs(latest, frames[-1])
+        self.assertEqual(decode(subscriber.next_payload(latest, self.state))["type"], "full")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# 冷启动导入预算（秒），主要开销来自 openai SDK
+IMPORT_BUDGET_SECONDS = 3.0
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import llmos_core
+import llmos_core.Prompts
+import llmos_core.Program
+elapsed = time.perf_counter() - start
+print(elapsed)
+print('alfworld' in sys.modules)
+"""
+
+
+class StartupTestCase(unittest.TestCase):
+    def test_import_budget(self):
+        # 在新进程中测量，避免受当前进程已导入模块的影响
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.split()
+        elapsed, alfworld_imported = float(output[-2]), output[-1] == "True"
+        self.assertLess(elapsed, IMPORT_BUDGET_SECONDS)
+        # 窗口类惰性加载：仅导入框架不应导入 alfworld
+        self.assertFalse(alfworld_imported)
+
+    def test_lazy_registry(self):
+        from llmos_core.Prompts.Windows import PromptWindow
+        from llmos_core.Prompts.Windows.Window_register import _get_window_class, get_window_type
+
+        heap_cls = _get_window_class("heap")
+        self.assertIs(heap_cls, _get_window_class(PromptWindow.HeapPromptWindow))
+        self.assertIs(heap_cls, _get_window_class("HeapPromptWindow"))
+        self.assertEqual(get_window_type(heap_cls), "heap")
+        self.assertEqual(get_window_type(object), "text")
+
+
+if __name__ == '__main__':
+    unittest.main()
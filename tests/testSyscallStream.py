@@ -0,0 +1,114 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from llmos_core.Prompts.PromptMainBoard import PromptMainBoard
+from llmos_core.Prompts.syscall_stream import IncrementalJSONScanner, StreamingSyscallDispatcher
+from llmos_core.Prompts.Windows.heap_window.heap_window import HeapPromptWindow
+
+
+def heap_set(key, value):
+    return json.dumps({"call_type": "prompt", "func_name": "heap_set", "kwargs": {"key": key, "value": value}})
+
+
+def tool_delta(index, name=None, arguments=None, call_id=None, content=None):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    return SimpleNamespace(content=content, tool_calls=[SimpleNamespace(index=index, id=call_id, function=function)])
+
+
+def chunks(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class RecordingBoard:
+    """记录调用顺序的假 PromptMainBoard"""
+
+    def __init__(self):
+        self.order = []
+
+    def handle_call(self, call, auto_record=True):
+        self.order.append(call["kwargs"]["key"])
+        return call
+
+    def apply_response(self, response, auto_record=True):
+        self.order.append(("apply_response", response))
+        return []
+
+
+class ScannerTestCase(unittest.TestCase):
+    def test_split_chunks_and_braces_in_strings(self):
+        text = "```json\n[" + heap_set("a", "x}{\"]") + ", " + heap_set("b", {"n": [1, 2]}) + "]\n```"
+        scanner = IncrementalJSONScanner()
+        objects = [obj for part in chunks(text, 3) for obj in scanner.feed(part)]
+        self.assertEqual([obj.value["kwargs"]["key"] for obj in objects], ["a", "b"])
+        self.assertEqual(objects[0].value["kwargs"]["value"], 'x}{"]')
+        self.assertTrue(text.startswith(heap_set("b", {"n": [1, 2]}), objects[1].start))
+        self.assertEqual(scanner.pending, "")
+
+    def test_prose_braces_skipped(self):
+        text = "Plan {step 1}: push a frame { then " + heap_set("a", 1)
+        scanner = IncrementalJSONScanner()
+        objects = [obj for part in chunks(text) for obj in scanner.feed(part)]
+        self.assertEqual(len(objects), 1)
+        self.assertEqual(objects[0].value["func_name"], "heap_set")
+
+    def test_truncated_object_pending(self):
+        scanner = IncrementalJSONScanner()
+        text = heap_set("a", 1)
+        self.assertEqual(scanner.feed("note " + text[:-5]), [])
+        self.assertEqual(scanner.pending_start, 5)
+
+
+class DispatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.board = PromptMainBoard()
+        self.heap = HeapPromptWindow()
+        self.board.register_windows(user_windows=self.heap)
+
+    def feed(self, dispatcher, text):
+        for part in chunks(text):
+            dispatcher.feed_text(part)
+        return dispatcher.finish()
+
+    def test_dispatch_in_order(self):
+        dispatched = []
+        dispatcher = StreamingSyscallDispatcher(self.board, on_call=dispatched.append)
+        text = "I will {remember} this.\n" + heap_set("a", 1) + '\n{"note": "no call"}\n' + heap_set("b", 2)
+        _, calls = self.feed(dispatcher, text)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(dispatched), 2)
+        self.assertEqual(list(self.heap.data), ["a", "b"])
+
+    def test_malformed_middle_object_repaired_in_place(self):
+        board = RecordingBoard()
+        malformed = "{'call_type': 'prompt', 'func_name': 'heap_set', 'kwargs': {'key': 'b', 'value': 2,},}"
+        self.feed(StreamingSyscallDispatcher(board), heap_set("a", 1) + malformed + heap_set("c", 3))
+        self.assertEqual(board.order, ["a", "b", "c"])
+
+    def test_unrepairable_object_defers_the_rest(self):
+        board = RecordingBoard()
+        broken = '{"func_name": heap_set !!}'
+        rest = broken + heap_set("c", 3)
+        with mock.patch("llmos_core.Prompts.syscall_stream.repair_json_locally", return_value=None):
+            self.feed(StreamingSyscallDispatcher(board), heap_set("a", 1) + rest)
+        # c 不会先于损坏的片段执行：二者一起交给 apply_response
+        self.assertEqual(board.order, ["a", ("apply_response", rest)])
+
+    def test_tool_calls_take_precedence_over_content(self):
+        dispatcher = StreamingSyscallDispatcher(self.board)
+        arguments = json.dumps({"key": "t", "value": 1})
+        dispatcher.feed_delta(tool_delta(0, name="heap_set", arguments=arguments[:5], call_id="call_0",
+                                         content="Storing: " + heap_set("same_delta", 0)))
+        dispatcher.feed_delta(tool_delta(0, arguments=arguments[5:]))
+        for part in chunks(heap_set("c", 2)):
+            dispatcher.feed_delta(SimpleNamespace(content=part, tool_calls=None))
+        response_text, calls = dispatcher.finish()
+        # 与非流式路径一致：有原生 tool_calls 时 content 中的 Syscall 不执行
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(list(self.heap.data), ["t"])
+        self.assertIn(heap_set("c", 2), response_text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from llmos_core.Prompts.PromptMainBoard import PromptMainBoard
+from llmos_core.Prompts.Windows.chat_window.chat_window import ChatWindow
+from llmos_core.Prompts.Windows.heap_window.heap_window import HeapPromptWindow
+from llmos_core.Prompts.Windows.stack_window.flowStackWindow import FlowStackPromptWindow
+from llmos_core.Prompts.token_budget import TokenBudget, estimate_tokens
+from llmos_core.logger import LogEvent, RecordType
+
+
+class FakeWindow:
+    def __init__(self, title, sizes, priority=50, min_share=0.0):
+        self.window_title = title
+        self.sizes = sizes  # 各压缩级别的 token 数
+        self.budget_priority = priority
+        self.budget_min_share = min_share
+
+
+def measure(window, level):
+    return window.sizes[level] if level < len(window.sizes) else None
+
+
+class TokenBudgetTestCase(unittest.TestCase):
+    def test_estimate(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertGreater(estimate_tokens("hello world " * 10), estimate_tokens("hello world"))
+
+    def test_lowest_priority_compacted_first(self):
+        low = FakeWindow("low", [500, 200, 50], priority=10)
+        high = FakeWindow("high", [500, 100], priority=90)
+        report = TokenBudget(max_tokens=800).fit([low, high], measure)
+        self.assertTrue(report.within_budget)
+        self.assertEqual(report.compacted, {"low": 1})
+
+        report = TokenBudget(max_tokens=200).fit([low, high], measure)
+        self.assertTrue(report.within_budget)
+        self.assertEqual(report.compacted, {"low": 2, "high": 1})
+
+    def test_min_share(self):
+        low = FakeWindow("low", [500, 300, 100], priority=10, min_share=0.5)
+        high = FakeWindow("high", [500, 400], priority=90)
+        report = TokenBudget(max_tokens=900).fit([low, high], measure)
+        self.assertEqual(report.compacted, {"low": 1})
+        # 低优先级窗口压缩到保底份额（350）后，转而压缩高优先级窗口
+        report = TokenBudget(max_tokens=700).fit([low, high], measure)
+        self.assertEqual(report.compacted, {"low": 1, "high": 1})
+        # 保底份额也放不下时继续压缩
+        report = TokenBudget(max_tokens=600).fit([low, high], measure)
+        self.assertEqual(report.compacted, {"low": 2, "high": 1})
+        self.assertTrue(report.within_budget)
+
+    def test_board_fits_budget(self):
+        board = PromptMainBoard()
+        heap = HeapPromptWindow()
+        stack = FlowStackPromptWindow()
+        chat = ChatWindow()
+        board.register_windows(user_windows=[heap, stack, chat])
+        heap.data.update({f"key_{i}": "x" * 2000 for i in range(5)})
+        for i in range(20):
+            stack.record_event(LogEvent(RecordType.tool_call, func_name="ALF_step", call_kwargs={"action": "look"},
+                                        result="You are in the middle of a room. " * 5))
+        for i in range(30):
+            chat.user_response(f"message {i} " + "text " * 20)
+
+        full = sum(estimate_tokens(m.content) for m in board.assemble_messages())
+        self.assertIsNone(board.last_budget_report)
+
+        budget = full // 2
+        messages = board.assemble_messages(max_tokens=budget)
+        report = board.last_budget_report
+        self.assertTrue(report.within_budget)
+        self.assertLessEqual(sum(estimate_tokens(m.content) for m in messages), budget)
+        # 堆的优先级最低，被压缩得最多
+        self.assertGreater(report.compacted["Heap"], 0)
+        self.assertEqual(len(messages), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()